@@ -5,7 +5,7 @@ from fastapi import Depends, HTTPException, status, Header
 from jose import jwt, JWTError
 from sqlalchemy import text
 
-from .db import engine
+from .db import engine, get_async_engine
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-only-change-me")
 JWT_ALG = "HS256"
@@ -16,7 +16,14 @@ def create_access_token(sub: str) -> str:
     payload = {"sub": sub, "exp": expire}
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
 
-def get_current_user(authorization: str = Header(default="")):
+CURRENT_USER_SQL = text("""
+    SELECT id, email, role, is_active
+    FROM users
+    WHERE email = :email
+    LIMIT 1
+""")
+
+def _token_email(authorization: str) -> str:
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
 
@@ -29,23 +36,27 @@ def get_current_user(authorization: str = Header(default="")):
             raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid/expired token")
+    return email.lower()
 
-    with engine.connect() as conn:
-        user = conn.execute(
-            text("""
-                SELECT id, email, role, is_active
-                FROM users
-                WHERE email = :email
-                LIMIT 1
-            """),
-            {"email": email.lower()},
-        ).mappings().first()
-
+def _active_user(user) -> dict:
     if not user or int(user["is_active"]) != 1:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid/expired token")
 
     return {"id": user["id"], "email": user["email"], "role": user["role"]}
 
+def get_current_user(authorization: str = Header(default="")):
+    email = _token_email(authorization)
+    with engine.connect() as conn:
+        user = conn.execute(CURRENT_USER_SQL, {"email": email}).mappings().first()
+    return _active_user(user)
+
+async def get_current_user_async(authorization: str = Header(default="")):
+    # Same check for async def endpoints, without a threadpool hop
+    email = _token_email(authorization)
+    async with get_async_engine().connect() as conn:
+        user = (await conn.execute(CURRENT_USER_SQL, {"email": email})).mappings().first()
+    return _active_user(user)
+
 def require_admin(user=Depends(get_current_user)):
     if (user.get("role") or "").lower() != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
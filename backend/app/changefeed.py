@@ -0,0 +1,139 @@
+import os
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+
+from app.db import engine
+
+# Compact row-level change records. Writers append inside their own
+# transaction; readers page by id and refresh only the projects named.
+CHANGEFEED_RETENTION_DAYS = int(os.getenv("CHANGEFEED_RETENTION_DAYS", "14"))
+CHANGEFEED_PRUNE_BATCH = 5000
+
+# Ids are assigned at insert but become visible at commit, so a reader that
+# runs ahead could step past a row whose transaction is still open. Readers
+# stay this far behind; sync writes commit in short chunks well inside it.
+CHANGEFEED_READ_LAG_SECONDS = int(os.getenv("CHANGEFEED_READ_LAG_SECONDS", "10"))
+
+CHANGE_FIELDS = ("entity_type", "entity_id", "project_qbo_id", "sync_run_id")
+
+_INSERT_SQL = text("""
+    INSERT INTO changefeed (entity_type, entity_id, project_qbo_id, sync_run_id, created_at)
+    VALUES (:entity_type, :entity_id, :project_qbo_id, :sync_run_id, UTC_TIMESTAMP())
+""")
+
+_table_ready = False
+
+def changefeed_init_table() -> None:
+    # DDL commits implicitly in MySQL, so this runs on its own connection
+    # before any writer opens the transaction it emits from. Emitting also
+    # bumps the data version, so its table is created here too.
+    global _table_ready
+    if _table_ready:
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS changefeed (
+              id BIGINT AUTO_INCREMENT PRIMARY KEY,
+              entity_type VARCHAR(40) NOT NULL,      -- Invoice, Customer, ProjectAssignment, ...
+              entity_id VARCHAR(64) NOT NULL,        -- qbo_id for QBO rows, local id otherwise
+              project_qbo_id VARCHAR(32) NULL,       -- affected project, when known
+              sync_run_id INT NULL,                  -- qbo_sync_runs.id; NULL for app writes
+              created_at DATETIME NOT NULL,          -- UTC, set at insert
+              INDEX idx_changefeed_created (created_at),
+              INDEX idx_changefeed_project (project_qbo_id, id),
+              INDEX idx_changefeed_run (sync_run_id)
+            ) ENGINE=InnoDB
+        """))
+
+    _table_ready = True
+
+    # Lazy: data_version imports this module
+    from app.data_version import data_version_init_table
+    data_version_init_table()
+
+
+def emit_changes(conn, changes: Iterable[tuple]) -> int:
+    """
+    Appends (entity_type, entity_id, project_qbo_id, sync_run_id) tuples
+    using the caller's connection, so they commit or roll back with the
+    write they describe, and bumps the data version in the same
+    transaction (see data_version for why MAX(id) alone is not enough).
+    """
+    from app.data_version import bump_data_version
+
+    rows = [dict(zip(CHANGE_FIELDS, c)) for c in changes]
+    if rows:
+        conn.execute(_INSERT_SQL, rows)
+        bump_data_version(conn)
+    return len(rows)
+
+
+def read_changes(cursor: int = 0, limit: int = 500, project_qbo_id: Optional[str] = None) -> dict:
+    changefeed_init_table()
+    limit = max(1, min(int(limit), 5000))
+
+    where = "id > :cursor AND created_at <= UTC_TIMESTAMP() - INTERVAL :lag SECOND"
+    params = {"cursor": int(cursor or 0), "limit": limit, "lag": CHANGEFEED_READ_LAG_SECONDS}
+    if project_qbo_id:
+        where += " AND project_qbo_id = :project_qbo_id"
+        params["project_qbo_id"] = project_qbo_id
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT id, entity_type, entity_id, project_qbo_id, sync_run_id, created_at
+            FROM changefeed
+            WHERE {where}
+            ORDER BY id
+            LIMIT :limit
+        """), params).mappings().all()
+
+    changes = [dict(r) for r in rows]
+    return {
+        "changes": changes,
+        "cursor": changes[-1]["id"] if changes else int(cursor or 0),
+        "has_more": len(changes) == limit,
+    }
+
+
+def changed_projects_since(cursor: int = 0) -> dict:
+    # Distinct projects touched after cursor, for caches that only need names
+    changefeed_init_table()
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT MAX(id) AS cursor
+            FROM changefeed
+            WHERE created_at <= UTC_TIMESTAMP() - INTERVAL :lag SECOND
+        """), {"lag": CHANGEFEED_READ_LAG_SECONDS}).mappings().first()
+        head = int(row["cursor"] or 0) if row else 0
+
+        rows = conn.execute(text("""
+            SELECT DISTINCT project_qbo_id
+            FROM changefeed
+            WHERE id > :cursor AND id <= :head AND project_qbo_id IS NOT NULL
+        """), {"cursor": int(cursor or 0), "head": head}).all()
+
+    return {
+        "project_qbo_ids": sorted(r[0] for r in rows),
+        "cursor": max(head, int(cursor or 0)),
+    }
+
+
+def prune_changes(retain_days: Optional[int] = None) -> int:
+    changefeed_init_table()
+    days = CHANGEFEED_RETENTION_DAYS if retain_days is None else int(retain_days)
+
+    # Small batches so pruning never holds long locks against writers
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            res = conn.execute(text("""
+                DELETE FROM changefeed
+                WHERE created_at < UTC_TIMESTAMP() - INTERVAL :days DAY
+                ORDER BY id
+                LIMIT :batch
+            """), {"days": days, "batch": CHANGEFEED_PRUNE_BATCH})
+        deleted += res.rowcount or 0
+        if (res.rowcount or 0) < CHANGEFEED_PRUNE_BATCH:
+            return deleted
@@ -0,0 +1,47 @@
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional
+
+# ?format=columns on the tabular endpoints: the row list becomes
+#   {"columns": [...names], "cents": [...money columns], "rows": [[...values]]}
+# so key names are sent once. Money columns go out as integer cents; the
+# rest of the payload (summary, next_cursor, ...) is unchanged.
+FORMATS = ("json", "columns")
+
+MONEY_SUFFIXES = ("_amt", "_bal", "_balance", "_cost", "_income", "_profit")
+
+
+def check_format(format: Optional[str]) -> str:
+    format = (format or "json").lower()
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    return format
+
+
+def is_money_column(name: str) -> bool:
+    return name.endswith(MONEY_SUFFIXES)
+
+
+def to_cents(value) -> Optional[int]:
+    if value is None:
+        return None
+    return int(Decimal(str(value)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_columns(rows: list[dict]) -> dict:
+    columns = list(rows[0].keys()) if rows else []
+    money = {i for i, c in enumerate(columns) if is_money_column(c)}
+    return {
+        "columns": columns,
+        "cents": [columns[i] for i in sorted(money)],
+        "rows": [
+            [to_cents(v) if i in money else v for i, v in enumerate(r.values())]
+            for r in rows
+        ],
+    }
+
+
+def shape(payload: dict, key: str, format: str) -> dict:
+    """Returns `payload` with payload[key] in the requested format."""
+    if format != "columns":
+        return payload
+    return {**payload, key: to_columns(payload[key])}
@@ -0,0 +1,124 @@
+import hashlib
+from datetime import date
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.changefeed import changefeed_init_table
+from app.db import engine, get_async_engine
+from app.streaming import wants_ndjson
+
+# One cheap probe for "has anything the read endpoints show changed?".
+# Every write bumps the counter row below in its own transaction: changefeed
+# writers through emit_changes, other writes (PM/crew edits, file uploads,
+# financial refreshes) directly. MAX(changefeed.id) alone is not enough:
+# ids are handed out at insert, so id 11 can commit before id 10 and a late
+# commit would leave MAX(id) where it was. The counter row is locked until
+# commit, so its value moves in commit order. MAX(id) stays in the version
+# as the changefeed head for incremental readers (the search index).
+DATA_VERSION_SCOPE = "app"
+
+_table_ready = False
+
+def data_version_init_table() -> None:
+    global _table_ready
+    if _table_ready:
+        return
+
+    changefeed_init_table()
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS data_versions (
+              scope VARCHAR(40) NOT NULL PRIMARY KEY,
+              version BIGINT NOT NULL DEFAULT 0,
+              updated_at DATETIME NOT NULL
+            ) ENGINE=InnoDB
+        """))
+
+    _table_ready = True
+
+
+def bump_data_version(conn, scope: str = DATA_VERSION_SCOPE) -> None:
+    # Runs on the caller's connection so it commits with the write
+    conn.execute(text("""
+        INSERT INTO data_versions (scope, version, updated_at)
+        VALUES (:scope, 1, UTC_TIMESTAMP())
+        ON DUPLICATE KEY UPDATE version = version + 1, updated_at = VALUES(updated_at)
+    """), {"scope": scope})
+
+
+DATA_VERSION_SQL = text("""
+    SELECT
+      (SELECT MAX(id) FROM myapp.changefeed) AS change_id,
+      (SELECT version FROM myapp.data_versions WHERE scope = :scope) AS version
+""")
+
+
+def read_data_version(conn, scope: str = DATA_VERSION_SCOPE) -> tuple:
+    row = conn.execute(DATA_VERSION_SQL, {"scope": scope}).first()
+    return (int(row[0] or 0), int(row[1] or 0))
+
+
+async def read_data_version_async(conn, scope: str = DATA_VERSION_SCOPE) -> tuple:
+    row = (await conn.execute(DATA_VERSION_SQL, {"scope": scope})).first()
+    return (int(row[0] or 0), int(row[1] or 0))
+
+
+def current_version() -> tuple:
+    # Today's date is part of it: /schedule defaults to the current week
+    data_version_init_table()
+    with engine.connect() as conn:
+        change_id, version = read_data_version(conn)
+    return (change_id, version, date.today().isoformat())
+
+
+async def current_version_async() -> tuple:
+    if not _table_ready:
+        await run_in_threadpool(data_version_init_table)
+    async with get_async_engine().connect() as conn:
+        change_id, version = await read_data_version_async(conn)
+    return (change_id, version, date.today().isoformat())
+
+
+GZIP_ETAG_SUFFIX = "-gzip"
+
+def _if_none_match(request: Request) -> set[str]:
+    # Gzipped bodies carry their own strong tag; both forms match the version
+    header = request.headers.get("if-none-match") or ""
+    tags = {t.strip() for t in header.split(",") if t.strip()}
+    return {t.replace(f'{GZIP_ETAG_SUFFIX}"', '"') for t in tags}
+
+
+def _conditional(request: Request, response: Response, version: tuple) -> str:
+    key = f"{request.url.path}?{request.url.query}"
+    if wants_ndjson(request):
+        # Same URL, different body: the NDJSON stream needs its own tag
+        key += "#ndjson"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+    etag = f'"v{version[0]}.{version[1]}.{version[2].replace("-", "")}-{digest}"'
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    tags = _if_none_match(request)
+    if etag in tags or "*" in tags:
+        raise HTTPException(status_code=304, headers=headers)
+
+    # For response_cache.cached_json, which builds its own Response
+    request.state.data_version = version
+    request.state.etag_headers = headers
+    response.headers.update(headers)
+    return etag
+
+
+def conditional_get(request: Request, response: Response) -> str:
+    """
+    Dependency for read endpoints whose output only depends on the data
+    version and the request URL. Answers If-None-Match with 304 before the
+    endpoint runs; otherwise stamps the ETag on the response.
+    """
+    return _conditional(request, response, current_version())
+
+
+async def conditional_get_async(request: Request, response: Response) -> str:
+    """conditional_get for async def endpoints; probes on the async engine."""
+    return _conditional(request, response, await current_version_async())
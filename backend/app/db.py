@@ -1,6 +1,8 @@
 import os
 from sqlalchemy import create_engine, text
 
+from app.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument
+
 # In production, we rely on real environment variables (from Docker / Lightsail).
 # If you want dotenv loading locally, set LOAD_DOTENV=1 in your local env and keep a backend/.env file.
 if os.getenv("LOAD_DOTENV", "0") == "1":
@@ -22,8 +24,30 @@ if not all([DB_HOST, DB_NAME, DB_USER, DB_PASSWORD]):
         "Missing DB env vars. Need DB_HOST, DB_NAME, DB_USER, DB_PASSWORD (and optional DB_PORT)."
     )
 
+# Optional read replica for the heavy GET endpoints (see app/replica.py).
+# Port, user and password default to the primary's.
+DB_READ_HOST = os.getenv("DB_READ_HOST")
+DB_READ_PORT = os.getenv("DB_READ_PORT", DB_PORT)
+DB_READ_USER = os.getenv("DB_READ_USER", DB_USER)
+DB_READ_PASSWORD = os.getenv("DB_READ_PASSWORD", DB_PASSWORD)
+
 MYSQL_SSL_MODE = os.getenv("MYSQL_SSL_MODE", "").lower()
 
+# Pool sizing, per engine and per worker process. Size these against MySQL
+# max_connections using GET /api/metrics/pool.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))     # seconds; -1 = never
+# always: ping on every checkout (one extra round trip each time)
+# idle:   ping only connections idle for DB_POOL_PING_IDLE_SECONDS or more
+# off:    no ping; rely on DB_POOL_RECYCLE below the server's wait_timeout
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "always").lower()
+DB_POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", "30"))
+
+if DB_POOL_PRE_PING not in ("always", "idle", "off"):
+    raise RuntimeError("DB_POOL_PRE_PING must be always, idle or off")
+
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 connect_args = {}
@@ -32,19 +56,108 @@ if MYSQL_SSL_MODE in ("require", "required"):
     # This requests TLS without CA verification (good starter setting for managed DBs).
     connect_args["ssl"] = {}
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=connect_args)
+def _pool_options(pool_size: int, max_overflow: int, poolclass) -> dict:
+    return {
+        "poolclass": poolclass,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING == "always",
+    }
+
+def _instrument(name: str, pool) -> None:
+    instrument(name, pool, DB_POOL_PING_IDLE_SECONDS if DB_POOL_PRE_PING == "idle" else None)
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args=connect_args,
+    **_pool_options(DB_POOL_SIZE, DB_MAX_OVERFLOW, InstrumentedQueuePool),
+)
+_instrument("primary", engine.pool)
+
+replica_engine = None
+if DB_READ_HOST:
+    READ_DATABASE_URL = f"mysql+pymysql://{DB_READ_USER}:{DB_READ_PASSWORD}@{DB_READ_HOST}:{DB_READ_PORT}/{DB_NAME}"
+    replica_engine = create_engine(
+        READ_DATABASE_URL,
+        connect_args=connect_args,
+        **_pool_options(DB_POOL_SIZE, DB_MAX_OVERFLOW, InstrumentedQueuePool),
+    )
+    _instrument("replica", replica_engine.pool)
+
+# Async engines for the async def endpoints (aiomysql). Created on first use
+# so scripts and the sync-only paths never open these pools; concurrency on
+# the async endpoints is bounded by this pool, not the threadpool.
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "10"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "20"))
+
+_async_engines: dict = {}
+
+def get_async_engine(replica: bool = False):
+    key = "replica" if replica else "primary"
+    if key in _async_engines:
+        return _async_engines[key]
+
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    if replica:
+        if not DB_READ_HOST:
+            raise RuntimeError("DB_READ_HOST is not set")
+        url = f"mysql+aiomysql://{DB_READ_USER}:{DB_READ_PASSWORD}@{DB_READ_HOST}:{DB_READ_PORT}/{DB_NAME}"
+    else:
+        url = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+    async_connect_args = {}
+    if MYSQL_SSL_MODE in ("require", "required"):
+        # aiomysql wants an SSLContext; same no-verify TLS as the sync engine
+        import ssl
+
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        async_connect_args["ssl"] = ctx
+
+    _async_engines[key] = create_async_engine(
+        url,
+        connect_args=async_connect_args,
+        **_pool_options(DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW, InstrumentedAsyncQueuePool),
+    )
+    _instrument(f"{key}_async", _async_engines[key].sync_engine.pool)
+    return _async_engines[key]
 
 def db_check() -> dict:
     with engine.connect() as conn:
         version = conn.execute(text("SELECT VERSION()")).scalar()
     return {"connected": True, "mysql_version": version}
 
+def ensure_index(conn, table: str, name: str, columns: str) -> bool:
+    """
+    Adds INDEX name (columns) unless the table already has it, or has another
+    index whose leading columns are the same. Returns True when it added one.
+    """
+    wanted = [c.split()[0].lower() for c in columns.split(",")]
+    rows = conn.execute(text("""
+        SELECT INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS cols
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+        GROUP BY INDEX_NAME
+    """), {"table": table}).all()
+    for index_name, cols in rows:
+        existing = [c.lower() for c in (cols or "").split(",")]
+        if index_name == name or existing[:len(wanted)] == wanted:
+            return False
+
+    conn.execute(text(f"ALTER TABLE {table} ADD INDEX {name} ({columns})"))
+    return True
+
 def db_config_safe() -> dict:
     return {
         "db_host": DB_HOST,
         "db_port": DB_PORT,
         "db_name": DB_NAME,
         "db_user": DB_USER,
+        "db_read_host": DB_READ_HOST,
     }
 
 def notes_add_and_list(message: str) -> dict:
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 
 from passlib.context import CryptContext
@@ -9,15 +9,34 @@ from sqlalchemy import text
 import re
 import uuid
 from typing import Optional
+from datetime import date
 
-from .auth import create_access_token, get_current_user, require_admin
+from .auth import create_access_token, get_current_user, get_current_user_async, require_admin
+from app.columnar import check_format, shape
+from app.fast_json import FastJSONResponse
+from app.data_version import bump_data_version, conditional_get, conditional_get_async, data_version_init_table
 from app.qbo.routes import router as qbo_router
+from app.projects.rollup import get_dashboard_kpis_async, get_dashboard_payload, stream_dashboard
+from app.pool_metrics import bind_route, pool_metrics, unbind_route
+from app.projects.search import search_index
+from app.replica import replica_stats
+from app.response_cache import cached_json, cached_json_async, response_cache
+from app.streaming import ndjson_response, wants_ndjson
 from app.projects.routes import router as projects_router
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 app.include_router(qbo_router)
 app.include_router(projects_router)
 
+@app.middleware("http")
+async def pool_route_context(request: Request, call_next):
+    # Lets pool events attribute checkouts to the matched route
+    token = bind_route(request.scope)
+    try:
+        return await call_next(request)
+    finally:
+        unbind_route(token)
+
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 HEX_COLOR = re.compile(r"^#[0-9a-fA-F]{6}$")
@@ -85,8 +104,9 @@ class WorkCrewUpdateRequest(BaseModel):
     sort_order: Optional[int] = None
 
 
+# async: answered on the event loop even when the threadpool is saturated
 @app.get("/api/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 
@@ -133,183 +153,92 @@ def login(req: LoginRequest):
     return {"access_token": token, "token_type": "bearer", "role": user["role"]}
 
 @app.get("/api/me")
-def me(user=Depends(get_current_user)):
+async def me(user=Depends(get_current_user_async)):
     return {"user": user}
 
 
 @app.get("/api/dashboard")
-def dashboard(user=Depends(get_current_user)):
+def dashboard(
+    request: Request,
+    format: Optional[str] = Query(None, description="columns for the compact columnar shape"),
+    user=Depends(get_current_user),
+    _etag=Depends(conditional_get),
+):
     """
     Dashboard KPI endpoint.
     Returns project rollups (same shape as /api/projects) so the frontend can total
     completed project income/cost/profit + margin.
+    Send Accept: application/x-ndjson to stream the rows instead.
     """
-    from .db import engine
-
-    sql = text("""
-    WITH
-    projects AS (
-      SELECT
-        id AS qbo_customer_id,
-        qbo_id,
-        display_name,
-        balance_with_jobs,
-        meta_create_time,
-        meta_last_updated_time
-      FROM myapp.qbo_customers
-      WHERE is_project = 1
-    ),
-    line_totals AS (
-      SELECT
-        transaction_id,
-        line_customer_qbo_id AS project_qbo_id,
-        SUM(amount) AS line_amt
-      FROM myapp.qbo_transaction_lines
-      WHERE line_customer_qbo_id IS NOT NULL
-      GROUP BY transaction_id, line_customer_qbo_id
-    ),
-    txn_rollup AS (
-      SELECT
-        COALESCE(t.customer_qbo_id, lt.project_qbo_id) AS project_qbo_id,
-
-        SUM(CASE WHEN t.entity_type='Estimate' THEN t.total_amt ELSE 0 END) AS estimate_amt,
-        SUM(CASE WHEN t.entity_type='Estimate' THEN 1 ELSE 0 END) AS estimate_ct,
-
-        SUM(CASE WHEN t.entity_type='Invoice' THEN t.total_amt ELSE 0 END) AS invoice_amt,
-        SUM(CASE WHEN t.entity_type='Invoice' THEN t.balance_amt ELSE 0 END) AS invoice_bal,
-        SUM(CASE WHEN t.entity_type='Invoice' THEN 1 ELSE 0 END) AS invoice_ct,
-
-        SUM(CASE WHEN t.entity_type='Bill' THEN COALESCE(lt.line_amt,0) ELSE 0 END) AS bill_amt,
-        SUM(CASE WHEN t.entity_type='Bill' THEN 1 ELSE 0 END) AS bill_ct,
-
-        SUM(CASE WHEN t.entity_type='Purchase' THEN COALESCE(lt.line_amt,0) ELSE 0 END) AS expense_amt,
-        SUM(CASE WHEN t.entity_type='Purchase' THEN 1 ELSE 0 END) AS expense_ct,
-
-        SUM(CASE WHEN t.entity_type='VendorCredit' THEN COALESCE(lt.line_amt,0) ELSE 0 END) AS vendorcredit_amt,
-        SUM(CASE WHEN t.entity_type='VendorCredit' THEN 1 ELSE 0 END) AS vendorcredit_ct,
-
-        SUM(CASE WHEN t.entity_type='CreditMemo' THEN t.total_amt ELSE 0 END) AS creditmemo_amt,
-        SUM(CASE WHEN t.entity_type='CreditMemo' THEN t.balance_amt ELSE 0 END) AS creditmemo_bal,
-        SUM(CASE WHEN t.entity_type='CreditMemo' THEN 1 ELSE 0 END) AS creditmemo_ct,
-
-        COUNT(DISTINCT t.id) AS total_transaction_ct
-
-      FROM myapp.qbo_transactions t
-      LEFT JOIN line_totals lt
-        ON lt.transaction_id = t.id
-        AND t.entity_type IN ('Bill','Purchase','VendorCredit')
-      WHERE t.entity_type IN ('Estimate','Invoice','Bill','Purchase','VendorCredit','CreditMemo')
-      GROUP BY COALESCE(t.customer_qbo_id, lt.project_qbo_id)
-    )
-    SELECT
-      ip.start_date AS start_date,
-      ip.end_date AS end_date,
-      pm.primary_pm_name AS primary_project_manager,
-      wc.primary_crew_name AS primary_work_crew,
-      p.qbo_id AS project_qbo_id,
-      p.display_name AS project_name,
-      p.balance_with_jobs AS project_balance,
-      p.meta_create_time AS project_create_dttm,
-      p.meta_last_updated_time AS project_lastupdate_dttm,
-
-      CASE WHEN ip.id IS NULL THEN 1 ELSE 0 END AS needs_assignment,
-      COALESCE(ip.status, 'not_started') AS project_status,
-
-      COALESCE(r.estimate_amt,0) AS estimate_amt,
-      COALESCE(r.estimate_ct,0) AS estimate_ct,
-      COALESCE(r.invoice_amt,0) AS invoice_amt,
-      COALESCE(r.invoice_bal,0) AS invoice_bal,
-      COALESCE(r.invoice_ct,0) AS invoice_ct,
-      COALESCE(r.bill_amt,0) AS bill_amt,
-      COALESCE(r.bill_ct,0) AS bill_ct,
-      COALESCE(r.expense_amt,0) AS expense_amt,
-      COALESCE(r.expense_ct,0) AS expense_ct,
-      COALESCE(r.vendorcredit_amt,0) AS vendorcredit_amt,
-      COALESCE(r.vendorcredit_ct,0) AS vendorcredit_ct,
-      COALESCE(r.creditmemo_amt,0) AS creditmemo_amt,
-      COALESCE(r.creditmemo_bal,0) AS creditmemo_bal,
-      COALESCE(r.creditmemo_ct,0) AS creditmemo_ct,
-      COALESCE(r.total_transaction_ct, 0) AS total_transaction_ct,
-
-      (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0)) AS total_income,
-      (COALESCE(r.bill_amt,0) + COALESCE(r.expense_amt,0) - COALESCE(r.vendorcredit_amt,0)) AS total_cost,
-
-      (
-        (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0))
-        -
-        (COALESCE(r.bill_amt,0) + COALESCE(r.expense_amt,0) - COALESCE(r.vendorcredit_amt,0))
-      ) AS total_profit,
-
-      CASE
-        WHEN (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0)) = 0 THEN NULL
-        ELSE (
-          (
-            (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0))
-            -
-            (COALESCE(r.bill_amt,0) + COALESCE(r.expense_amt,0) - COALESCE(r.vendorcredit_amt,0))
-          ) / (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0))
+    try:
+        format = check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if wants_ndjson(request):
+        return ndjson_response(request, stream_dashboard())
+    return cached_json(request, "dashboard", lambda: shape(get_dashboard_payload(), "projects", format))
+
+@app.get("/api/dashboard/summary")
+async def dashboard_summary(
+    request: Request,
+    status: Optional[str] = Query(None, description="Comma-separated statuses, e.g. completed"),
+    group_by: Optional[str] = Query(None, description="Comma-separated: status, month, pm, crew"),
+    pm_id: Optional[int] = None,
+    crew_id: Optional[int] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    end_from: Optional[date] = None,
+    end_to: Optional[date] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    user=Depends(get_current_user_async),
+    _etag=Depends(conditional_get_async),
+):
+    """
+    Dashboard KPIs computed in SQL: totals (income, cost, profit, margin,
+    project count, avg age) plus optional breakdowns, instead of shipping
+    every project row to the browser.
+    """
+    filters = {
+        "status": [x.strip() for x in status.split(",")] if status else None,
+        "pm_id": pm_id,
+        "crew_id": crew_id,
+        "start_from": start_from,
+        "start_to": start_to,
+        "end_from": end_from,
+        "end_to": end_to,
+        "created_from": created_from,
+        "created_to": created_to,
+    }
+    groups = [g.strip() for g in group_by.split(",")] if group_by else []
+    try:
+        return await cached_json_async(
+            request,
+            "dashboard_summary",
+            lambda bind: get_dashboard_kpis_async(bind, filters, groups),
         )
-      END AS profit_margin,
-
-      DATEDIFF(p.meta_last_updated_time, p.meta_create_time) AS age_days
-
-    FROM projects p
-    LEFT JOIN myapp.projects ip
-      ON ip.qbo_customer_id = p.qbo_customer_id
-
-    LEFT JOIN (
-      SELECT
-        ppm.project_id,
-        MAX(TRIM(CONCAT(COALESCE(pm.first_name,''), ' ', COALESCE(pm.last_name,'')))) AS primary_pm_name
-      FROM myapp.project_project_managers ppm
-      JOIN myapp.project_managers pm
-        ON pm.id = ppm.project_manager_id
-      WHERE ppm.unassigned_at IS NULL
-        AND ppm.is_primary = 1
-      GROUP BY ppm.project_id
-    ) pm
-      ON pm.project_id = ip.id
-
-    LEFT JOIN (
-      SELECT
-        pwc.project_id,
-        MAX(wc.name) AS primary_crew_name
-      FROM myapp.project_work_crews pwc
-      JOIN myapp.work_crews wc
-        ON wc.id = pwc.work_crew_id
-      WHERE pwc.unassigned_at IS NULL
-        AND pwc.is_primary = 1
-      GROUP BY pwc.project_id
-    ) wc
-      ON wc.project_id = ip.id
-
-    LEFT JOIN txn_rollup r
-      ON r.project_qbo_id = p.qbo_id
-
-    ORDER BY p.meta_last_updated_time DESC
-    """)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/api/cache/stats")
+def cache_stats(_admin=Depends(require_admin)):
+    return {**response_cache.stats(), "replica": replica_stats(), "search": search_index.stats()}
+
+@app.get("/api/metrics/pool")
+def pool_metrics_endpoint(_admin=Depends(require_admin)):
+    """
+    Per-pool checkout waits, overflow, timeouts and invalidations (overall
+    and per route) for this worker, next to the server's connection limits.
+    """
+    from .db import engine
     with engine.connect() as conn:
-        rows = conn.execute(sql).mappings().all()
-
-    projects = [dict(r) for r in rows]
-
-    # avg age (kept for future use; harmless if frontend ignores it)
-    age_sum = 0
-    age_ct = 0
-    for p in projects:
-        if p.get("age_days") is not None:
-            age_sum += int(p["age_days"])
-            age_ct += 1
-    avg_age_days = (age_sum / age_ct) if age_ct else None
-
-    return {
-        "projects": projects[:1000],
-        "summary": {
-            "total_projects": len(projects),
-            "avg_age_days": avg_age_days,
-        },
-    }
+        server = dict(conn.execute(text("""
+            SHOW GLOBAL VARIABLES WHERE Variable_name IN ('max_connections', 'wait_timeout')
+        """)).all())
+        server.update(conn.execute(text("""
+            SHOW GLOBAL STATUS WHERE Variable_name IN ('Threads_connected', 'Max_used_connections')
+        """)).all())
+    return {"pools": pool_metrics(), "mysql": server}
 
 @app.get("/api/users")
 def list_users(_admin=Depends(require_admin)):
@@ -321,7 +250,7 @@ def list_users(_admin=Depends(require_admin)):
             FROM users
             ORDER BY id DESC
         """)).mappings().all()
-    return [dict(r) for r in rows]
+    return FastJSONResponse([dict(r) for r in rows])
 
 
 @app.post("/api/users")
@@ -456,7 +385,7 @@ def list_project_managers(_admin=Depends(require_admin)):
             FROM project_managers
             ORDER BY id DESC
         """)).mappings().all()
-    return [dict(r) for r in rows]
+    return FastJSONResponse([dict(r) for r in rows])
 
 
 @app.post("/api/project-managers")
@@ -469,6 +398,7 @@ def create_project_manager(req: ProjectManagerCreateRequest, _admin=Depends(requ
     phone = (req.phone or "").strip() or None
     color = validate_hex_color(req.color)
     
+    data_version_init_table()
     try:
         with engine.begin() as conn:
             conn.execute(text("""
@@ -482,6 +412,7 @@ def create_project_manager(req: ProjectManagerCreateRequest, _admin=Depends(requ
                 "color": color,
                 "is_active": 1 if req.is_active else 0,
             })
+            bump_data_version(conn)
     except Exception:
         raise HTTPException(status_code=400, detail="Could not create project manager (email may already exist)")
 
@@ -522,6 +453,7 @@ def update_project_manager(pm_id: int, req: ProjectManagerUpdateRequest, _admin=
     if not updates:
         return {"ok": True, "updated": False}
 
+    data_version_init_table()
     try:
         with engine.begin() as conn:
             result = conn.execute(text(f"""
@@ -531,6 +463,7 @@ def update_project_manager(pm_id: int, req: ProjectManagerUpdateRequest, _admin=
             """), params)
             if result.rowcount == 0:
                 raise HTTPException(status_code=404, detail="Project manager not found")
+            bump_data_version(conn)
     except HTTPException:
         raise
     except Exception:
@@ -542,12 +475,14 @@ def update_project_manager(pm_id: int, req: ProjectManagerUpdateRequest, _admin=
 @app.delete("/api/project-managers/{pm_id}")
 def disable_project_manager(pm_id: int, _admin=Depends(require_admin)):
     from .db import engine
+    data_version_init_table()
     with engine.begin() as conn:
         result = conn.execute(text("""
             UPDATE project_managers
             SET is_active = 0
             WHERE id = :id
         """), {"id": pm_id})
+        bump_data_version(conn)
 
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Project manager not found")
@@ -568,7 +503,7 @@ def list_work_crews(_admin=Depends(require_admin)):
             FROM work_crews
             ORDER BY COALESCE(parent_id, id), parent_id IS NOT NULL, sort_order, id
         """)).mappings().all()
-    return [dict(r) for r in rows]
+    return FastJSONResponse([dict(r) for r in rows])
 
 
 @app.post("/api/work-crews")
@@ -591,6 +526,7 @@ def create_work_crew(req: WorkCrewCreateRequest, _admin=Depends(require_admin)):
         if not parent:
             raise HTTPException(status_code=400, detail="Parent crew not found")
 
+    data_version_init_table()
     try:
         with engine.begin() as conn:
             conn.execute(text("""
@@ -604,6 +540,7 @@ def create_work_crew(req: WorkCrewCreateRequest, _admin=Depends(require_admin)):
                 "is_active": 1 if req.is_active else 0,
                 "sort_order": int(req.sort_order or 0),
             })
+            bump_data_version(conn)
     except Exception:
         raise HTTPException(status_code=400, detail="Could not create work crew (code may already exist)")
 
@@ -661,6 +598,7 @@ def update_work_crew(crew_id: int, req: WorkCrewUpdateRequest, _admin=Depends(re
     if not updates:
         return {"ok": True, "updated": False}
 
+    data_version_init_table()
     try:
         with engine.begin() as conn:
             result = conn.execute(text(f"""
@@ -670,6 +608,7 @@ def update_work_crew(crew_id: int, req: WorkCrewUpdateRequest, _admin=Depends(re
             """), params)
             if result.rowcount == 0:
                 raise HTTPException(status_code=404, detail="Work crew not found")
+            bump_data_version(conn)
     except HTTPException:
         raise
     except Exception:
@@ -695,12 +634,14 @@ def disable_work_crew(crew_id: int, _admin=Depends(require_admin)):
     if child:
         raise HTTPException(status_code=400, detail="Cannot disable: crew has active sub crews")
 
+    data_version_init_table()
     with engine.begin() as conn:
         result = conn.execute(text("""
             UPDATE work_crews
             SET is_active = 0
             WHERE id = :id
         """), {"id": crew_id})
+        bump_data_version(conn)
 
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Work crew not found")
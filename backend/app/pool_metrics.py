@@ -0,0 +1,211 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Connection pool instrumentation. Each engine's pool records checkout wait
+# (time spent inside the pool waiting for a connection), overflow checkouts,
+# timeouts and invalidations, overall and per route, for
+# GET /api/metrics/pool. Routes are attributed through the ASGI scope bound
+# by bind_route() in the HTTP middleware; the router fills in scope["route"]
+# before any endpoint or dependency checks out a connection.
+
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 1.0, 5.0)
+
+_route_scope: ContextVar[Optional[dict]] = ContextVar("pool_route_scope", default=None)
+
+
+def bind_route(scope: dict):
+    return _route_scope.set(scope)
+
+
+def unbind_route(token) -> None:
+    _route_scope.reset(token)
+
+
+def _current_route() -> Optional[str]:
+    scope = _route_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path")
+
+
+class _Counters:
+    __slots__ = ("checkouts", "overflow_checkouts", "timeouts", "invalidations", "wait_total", "wait_max", "wait_buckets")
+
+    def __init__(self):
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def add_wait(self, seconds: float) -> None:
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        self.wait_buckets[bisect_left(WAIT_BUCKETS, seconds)] += 1
+
+    def as_dict(self) -> dict:
+        waits = sum(self.wait_buckets)
+        return {
+            "checkouts": self.checkouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "timeouts": self.timeouts,
+            "invalidations": self.invalidations,
+            "wait_ms_avg": (self.wait_total / waits * 1000) if waits else None,
+            "wait_ms_max": self.wait_max * 1000,
+            "wait_ms_buckets": {
+                **{f"le_{int(b * 1000)}": n for b, n in zip(WAIT_BUCKETS, self.wait_buckets)},
+                "inf": self.wait_buckets[-1],
+            },
+        }
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.total = _Counters()
+        self.routes: dict[str, _Counters] = {}
+        self.connects = 0
+        self.in_use_peak = 0
+
+    def _record(self, fn) -> None:
+        route = _current_route()
+        with self._lock:
+            fn(self.total)
+            if route:
+                fn(self.routes.setdefault(route, _Counters()))
+
+    def checkout(self, waited: float, overflow: bool) -> None:
+        def apply(c):
+            c.checkouts += 1
+            c.overflow_checkouts += int(overflow)
+            c.add_wait(waited)
+        self._record(apply)
+        in_use = self.pool.checkedout() if self.pool is not None else 0
+        if in_use > self.in_use_peak:
+            self.in_use_peak = in_use
+
+    def timeout(self, waited: float) -> None:
+        def apply(c):
+            c.timeouts += 1
+            c.add_wait(waited)
+        self._record(apply)
+
+    def invalidated(self) -> None:
+        def apply(c):
+            c.invalidations += 1
+        self._record(apply)
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            return {
+                "pool": {
+                    "size": pool.size(),
+                    "max_overflow": pool._max_overflow,
+                    "timeout_s": pool.timeout(),
+                    "recycle_s": pool._recycle,
+                    "checked_in": pool.checkedin(),
+                    "in_use": pool.checkedout(),
+                    "in_use_peak": self.in_use_peak,
+                    "overflow": max(pool.overflow(), 0),
+                    "connects": self.connects,
+                } if pool is not None else None,
+                **self.total.as_dict(),
+                "routes": {r: c.as_dict() for r, c in sorted(self.routes.items())},
+            }
+
+
+class _TimedGetMixin:
+    """Times QueuePool._do_get, the only place a checkout can block."""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.timeout(time.perf_counter() - started)
+            raise
+        if self.metrics is not None:
+            self.metrics.checkout(time.perf_counter() - started, self.checkedout() > self.size())
+        return conn
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting on it
+        new = super().recreate()
+        new.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = new
+        return new
+
+
+class InstrumentedQueuePool(_TimedGetMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_registry: dict[str, PoolMetrics] = {}
+
+
+def instrument(name: str, pool, ping_idle_seconds: Optional[float] = None) -> PoolMetrics:
+    """
+    Hooks metrics onto an engine's pool (engine.pool, or
+    async_engine.sync_engine.pool). With ping_idle_seconds, connections
+    idle at least that long are pinged on checkout and replaced when the
+    ping fails, instead of pinging every checkout.
+    """
+    metrics = PoolMetrics(name)
+    metrics.pool = pool
+    if isinstance(pool, _TimedGetMixin):
+        pool.metrics = metrics
+    _registry[name] = metrics
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, record):
+        metrics.connects += 1
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, record, exception):
+        metrics.invalidated()
+
+    @event.listens_for(pool, "soft_invalidate")
+    def _on_soft_invalidate(dbapi_connection, record, exception):
+        metrics.invalidated()
+
+    if ping_idle_seconds is not None:
+        @event.listens_for(pool, "checkin")
+        def _on_checkin(dbapi_connection, record):
+            record.info["checked_in_at"] = time.monotonic()
+
+        @event.listens_for(pool, "checkout")
+        def _on_checkout(dbapi_connection, record, proxy):
+            last = record.info.get("checked_in_at")
+            if last is None or time.monotonic() - last < ping_idle_seconds:
+                return
+            try:
+                dbapi_connection.ping(False)
+            except Exception:
+                # The pool discards this connection and retries with another
+                raise exc.DisconnectionError()
+
+    return metrics
+
+
+def pool_metrics() -> dict:
+    return {name: m.snapshot() for name, m in sorted(_registry.items())}
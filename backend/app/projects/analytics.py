@@ -0,0 +1,243 @@
+import threading
+from typing import Optional
+
+import numpy as np
+
+# Portfolio analytics over the shared rollup. The rows are turned into NumPy
+# columns once per data version; every request after that is a handful of
+# vectorized passes (sort, bincount, searchsorted) over those columns.
+
+PERCENTILES = (10, 25, 50, 75, 90)
+AGE_BUCKET_EDGES = (30, 60, 90, 180, 365)          # days; the last bucket is 365+
+MARGIN_BIN_EDGES = np.linspace(-0.5, 1.0, 16)       # 10-point bins, -50% .. 100%
+OUTLIER_Z = 2.5
+OUTLIER_LIMIT = 25
+
+# group name -> rollup column
+GROUP_COLUMNS = {
+    "pm": "primary_project_manager",
+    "crew": "primary_work_crew",
+    "status": "project_status",
+}
+UNASSIGNED = "Unassigned"
+
+
+class PortfolioArrays:
+    """Column arrays for one rollup snapshot. Read-only once built."""
+
+    def __init__(self, rows: list[dict]):
+        n = len(rows)
+
+        def num(key):
+            return np.fromiter((float(r[key] or 0) for r in rows), dtype=float, count=n)
+
+        self.ids = np.fromiter((r["qbo_customer_id"] for r in rows), dtype=np.int64, count=n)
+        self.names = np.array([r["project_name"] for r in rows], dtype=object)
+        self.income = num("total_income")
+        self.cost = num("total_cost")
+        self.profit = num("total_profit")
+        self.estimate = num("estimate_amt")
+        self.age = np.fromiter(
+            (np.nan if r["age_days"] is None else float(r["age_days"]) for r in rows), dtype=float, count=n
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.margin = np.where(self.income != 0, self.profit / self.income, np.nan)
+
+        # Per grouping: sorted labels plus each row's index into them
+        self.labels: dict[str, np.ndarray] = {}
+        self.codes: dict[str, np.ndarray] = {}
+        for name, column in GROUP_COLUMNS.items():
+            values = np.array([r[column] or UNASSIGNED for r in rows], dtype=object)
+            labels, codes = np.unique(values, return_inverse=True)
+            self.labels[name] = labels
+            self.codes[name] = codes.astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _f(x) -> Optional[float]:
+    x = float(x)
+    return None if np.isnan(x) else x
+
+
+def grouped_percentiles(values: np.ndarray, codes: np.ndarray, n_groups: int, qs=PERCENTILES) -> np.ndarray:
+    """
+    (n_groups, len(qs)) percentiles of `values` per group code, with
+    linear interpolation like np.percentile. NaNs are ignored; empty
+    groups come back as NaN. One lexsort for all groups.
+    """
+    ok = ~np.isnan(values)
+    v, g = values[ok], codes[ok]
+    out = np.full((n_groups, len(qs)), np.nan)
+    if v.size == 0:
+        return out
+
+    order = np.lexsort((v, g))
+    v = v[order]
+    counts = np.bincount(g, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    pos = starts[:, None] + (np.asarray(qs, dtype=float) / 100)[None, :] * np.maximum(counts - 1, 0)[:, None]
+    lo = np.minimum(np.floor(pos).astype(np.int64), v.size - 1)
+    hi = np.minimum(np.ceil(pos).astype(np.int64), v.size - 1)
+    frac = pos - np.floor(pos)
+    values_at = v[lo] * (1 - frac) + v[hi] * frac
+
+    has = counts > 0
+    out[has] = values_at[has]
+    return out
+
+
+def _groups(a: PortfolioArrays, mask: np.ndarray, name: str) -> list[dict]:
+    labels = a.labels[name]
+    codes = a.codes[name][mask]
+    n = len(labels)
+
+    count = np.bincount(codes, minlength=n)
+    income = np.bincount(codes, weights=a.income[mask], minlength=n)
+    cost = np.bincount(codes, weights=a.cost[mask], minlength=n)
+    profit = np.bincount(codes, weights=a.profit[mask], minlength=n)
+    pct = grouped_percentiles(a.margin[mask], codes, n)
+
+    out = []
+    for i in np.flatnonzero(count):
+        out.append({
+            "label": labels[i],
+            "project_ct": int(count[i]),
+            "income": float(income[i]),
+            "cost": float(cost[i]),
+            "profit": float(profit[i]),
+            "margin": float(profit[i] / income[i]) if income[i] else None,
+            **{f"margin_p{q}": _f(pct[i, j]) for j, q in enumerate(PERCENTILES)},
+        })
+    out.sort(key=lambda g: -g["profit"])
+    return out
+
+
+def _aging(a: PortfolioArrays, mask: np.ndarray) -> list[dict]:
+    age = a.age[mask]
+    profit = a.profit[mask]
+    ok = ~np.isnan(age)
+    bucket = np.searchsorted(AGE_BUCKET_EDGES, age[ok], side="right")
+    n = len(AGE_BUCKET_EDGES) + 1
+    count = np.bincount(bucket, minlength=n)
+    total = np.bincount(bucket, weights=profit[ok], minlength=n)
+
+    lows = (0,) + AGE_BUCKET_EDGES
+    highs = tuple(e - 1 for e in AGE_BUCKET_EDGES) + (None,)
+    return [
+        {
+            "label": f"{lo}-{hi}" if hi is not None else f"{lo}+",
+            "min_days": lo,
+            "max_days": hi,
+            "project_ct": int(count[i]),
+            "profit": float(total[i]),
+        }
+        for i, (lo, hi) in enumerate(zip(lows, highs))
+    ]
+
+
+def _margin_histogram(margin: np.ndarray) -> dict:
+    m = margin[~np.isnan(margin)]
+    lo, hi = MARGIN_BIN_EDGES[0], MARGIN_BIN_EDGES[-1]
+    counts, _ = np.histogram(m[(m >= lo) & (m <= hi)], bins=MARGIN_BIN_EDGES)
+    return {
+        "edges": [round(float(e), 4) for e in MARGIN_BIN_EDGES],
+        "counts": [int(c) for c in counts],
+        "below": int((m < lo).sum()),
+        "above": int((m > hi).sum()),
+    }
+
+
+def _cost_overruns(a: PortfolioArrays, mask: np.ndarray, z_threshold: float, limit: int) -> dict:
+    # Overrun ratio against the estimate, for projects that have one
+    sel = mask & (a.estimate > 0)
+    ratio = a.cost[sel] / a.estimate[sel] - 1
+    out = {"project_ct": int(ratio.size), "mean": None, "std": None, "z_threshold": z_threshold, "projects": []}
+    if ratio.size < 2:
+        return out
+
+    mean, std = ratio.mean(), ratio.std()
+    out.update(mean=float(mean), std=float(std))
+    if std == 0:
+        return out
+
+    z = (ratio - mean) / std
+    hits = np.flatnonzero(z >= z_threshold)
+    hits = hits[np.argsort(-z[hits])][:limit]
+    idx = np.flatnonzero(sel)[hits]
+    out["projects"] = [
+        {
+            "qbo_customer_id": int(a.ids[i]),
+            "project_name": a.names[i],
+            "primary_project_manager": a.labels["pm"][a.codes["pm"][i]],
+            "estimate_amt": float(a.estimate[i]),
+            "total_cost": float(a.cost[i]),
+            "overrun_ratio": float(r),
+            "z": float(zz),
+        }
+        for i, r, zz in zip(idx, ratio[hits], z[hits])
+    ]
+    return out
+
+
+def portfolio_analytics(
+    a: PortfolioArrays,
+    statuses: Optional[list[str]] = None,
+    z_threshold: float = OUTLIER_Z,
+    outlier_limit: int = OUTLIER_LIMIT,
+) -> dict:
+    mask = np.ones(len(a), dtype=bool)
+    if statuses:
+        wanted = np.flatnonzero(np.isin(a.labels["status"], statuses))
+        mask = np.isin(a.codes["status"], wanted)
+
+    margin = a.margin[mask]
+    overall = grouped_percentiles(margin, np.zeros(margin.size, dtype=np.int64), 1)[0]
+    return {
+        "project_ct": int(mask.sum()),
+        "margin": {
+            **{f"p{q}": _f(overall[j]) for j, q in enumerate(PERCENTILES)},
+            "histogram": _margin_histogram(margin),
+        },
+        "groups": {name: _groups(a, mask, name) for name in GROUP_COLUMNS},
+        "aging": _aging(a, mask),
+        "cost_overruns": _cost_overruns(a, mask, z_threshold, outlier_limit),
+    }
+
+
+_lock = threading.Lock()
+_cached: Optional[tuple] = None      # (data version, PortfolioArrays)
+
+
+def get_portfolio_arrays() -> PortfolioArrays:
+    # Lazy: the rollup pulls in the DB engine, and bench/ uses the math above
+    # without one
+    from app.projects.rollup import get_project_rollup_versioned
+
+    global _cached
+    version, rows = get_project_rollup_versioned()
+    cached = _cached
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with _lock:
+        if _cached is not None and _cached[0] == version:
+            return _cached[1]
+        arrays = PortfolioArrays(rows)
+        _cached = (version, arrays)
+        return arrays
+
+
+def get_portfolio_analytics(
+    statuses: Optional[list[str]] = None,
+    z_threshold: float = OUTLIER_Z,
+    outlier_limit: int = OUTLIER_LIMIT,
+) -> dict:
+    """
+    Margin percentiles and histogram, per PM/crew/status totals with margin
+    percentiles, aging buckets and cost-overrun outliers (z-score of
+    cost / estimate - 1) for all projects, or those with `statuses`.
+    """
+    return portfolio_analytics(get_portfolio_arrays(), statuses, z_threshold, outlier_limit)
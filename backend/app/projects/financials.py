@@ -0,0 +1,228 @@
+from sqlalchemy import bindparam, text
+
+from app.data_version import bump_data_version, data_version_init_table
+from app.db import engine
+from app.qbo.service import qbo_init_tables
+
+# Per-project sums/counts, maintained by the sync instead of recomputed per
+# request. Keyed by project_qbo_id so it needs no customer join to refresh.
+FINANCIAL_ENTITIES = ("Estimate", "Invoice", "Bill", "Purchase", "VendorCredit", "CreditMemo")
+
+REFRESH_BATCH = 500
+
+_table_ready = False
+
+def project_financials_init_table() -> None:
+    global _table_ready
+    if _table_ready:
+        return
+
+    qbo_init_tables()
+    data_version_init_table()
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS project_financials (
+              project_qbo_id VARCHAR(32) NOT NULL PRIMARY KEY,
+
+              estimate_amt DECIMAL(18,2) NOT NULL DEFAULT 0,
+              estimate_ct INT NOT NULL DEFAULT 0,
+              invoice_amt DECIMAL(18,2) NOT NULL DEFAULT 0,
+              invoice_bal DECIMAL(18,2) NOT NULL DEFAULT 0,
+              invoice_ct INT NOT NULL DEFAULT 0,
+              bill_amt DECIMAL(18,2) NOT NULL DEFAULT 0,
+              bill_ct INT NOT NULL DEFAULT 0,
+              expense_amt DECIMAL(18,2) NOT NULL DEFAULT 0,
+              expense_ct INT NOT NULL DEFAULT 0,
+              vendorcredit_amt DECIMAL(18,2) NOT NULL DEFAULT 0,
+              vendorcredit_ct INT NOT NULL DEFAULT 0,
+              creditmemo_amt DECIMAL(18,2) NOT NULL DEFAULT 0,
+              creditmemo_bal DECIMAL(18,2) NOT NULL DEFAULT 0,
+              creditmemo_ct INT NOT NULL DEFAULT 0,
+              total_transaction_ct INT NOT NULL DEFAULT 0,
+
+              labor_hours DECIMAL(12,2) NOT NULL DEFAULT 0,
+              labor_cost DECIMAL(18,2) NOT NULL DEFAULT 0,
+
+              refreshed_at DATETIME NOT NULL
+            ) ENGINE=InnoDB
+        """))
+
+        # (project, month, entity_type) cube for period and trend reports.
+        # TimeActivity rows carry labor cost in amount and hours in hours.
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS project_financials_monthly (
+              project_qbo_id VARCHAR(32) NOT NULL,
+              period_month DATE NOT NULL,              -- first day of the txn_date month
+              entity_type VARCHAR(40) NOT NULL,
+              amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+              balance_amt DECIMAL(18,2) NULL,
+              ct INT NOT NULL DEFAULT 0,
+              hours DECIMAL(12,2) NULL,
+              refreshed_at DATETIME NOT NULL,
+              PRIMARY KEY (project_qbo_id, period_month, entity_type),
+              INDEX idx_pfm_month (period_month, entity_type, project_qbo_id)
+            ) ENGINE=InnoDB
+        """))
+
+        # First deploy: build everything once so readers never see an empty table
+        if not conn.execute(text("SELECT 1 FROM project_financials LIMIT 1")).first():
+            _recompute(conn, "project_qbo_id IS NOT NULL", {})
+        elif not conn.execute(text("SELECT 1 FROM project_financials_monthly LIMIT 1")).first():
+            _recompute_monthly(conn, "project_qbo_id IS NOT NULL", {}, [])
+
+    _table_ready = True
+
+
+def _recompute(conn, scope: str, params: dict) -> None:
+    """
+    Rewrites project_financials and project_financials_monthly rows for
+    projects matching `scope` (a predicate on project_qbo_id) from
+    qbo_project_attributions and qbo_time_activities. Projects that no
+    longer have any rows are dropped.
+    """
+    stmt_params = [bindparam("ids", expanding=True)] if "ids" in params else []
+    entities = ", ".join(f"'{e}'" for e in FINANCIAL_ENTITIES)
+
+    conn.execute(text(f"""
+        DELETE FROM project_financials
+        WHERE {scope}
+    """).bindparams(*stmt_params), params)
+
+    conn.execute(text(f"""
+        INSERT INTO project_financials (
+          project_qbo_id,
+          estimate_amt, estimate_ct,
+          invoice_amt, invoice_bal, invoice_ct,
+          bill_amt, bill_ct,
+          expense_amt, expense_ct,
+          vendorcredit_amt, vendorcredit_ct,
+          creditmemo_amt, creditmemo_bal, creditmemo_ct,
+          total_transaction_ct,
+          labor_hours, labor_cost,
+          refreshed_at
+        )
+        SELECT
+          ids.project_qbo_id,
+          COALESCE(r.estimate_amt,0), COALESCE(r.estimate_ct,0),
+          COALESCE(r.invoice_amt,0), COALESCE(r.invoice_bal,0), COALESCE(r.invoice_ct,0),
+          COALESCE(r.bill_amt,0), COALESCE(r.bill_ct,0),
+          COALESCE(r.expense_amt,0), COALESCE(r.expense_ct,0),
+          COALESCE(r.vendorcredit_amt,0), COALESCE(r.vendorcredit_ct,0),
+          COALESCE(r.creditmemo_amt,0), COALESCE(r.creditmemo_bal,0), COALESCE(r.creditmemo_ct,0),
+          COALESCE(r.total_transaction_ct,0),
+          COALESCE(lr.labor_hours,0), COALESCE(lr.labor_cost,0),
+          UTC_TIMESTAMP()
+        FROM (
+          SELECT project_qbo_id FROM qbo_project_attributions
+          WHERE {scope} AND entity_type IN ({entities})
+          UNION
+          SELECT project_qbo_id FROM qbo_time_activities
+          WHERE {scope}
+        ) ids
+        LEFT JOIN (
+          SELECT
+            a.project_qbo_id,
+
+            SUM(CASE WHEN a.entity_type='Estimate' THEN a.amount ELSE 0 END) AS estimate_amt,
+            SUM(CASE WHEN a.entity_type='Estimate' THEN 1 ELSE 0 END) AS estimate_ct,
+
+            SUM(CASE WHEN a.entity_type='Invoice' THEN a.amount ELSE 0 END) AS invoice_amt,
+            SUM(CASE WHEN a.entity_type='Invoice' THEN a.balance_amt ELSE 0 END) AS invoice_bal,
+            SUM(CASE WHEN a.entity_type='Invoice' THEN 1 ELSE 0 END) AS invoice_ct,
+
+            SUM(CASE WHEN a.entity_type='Bill' THEN a.amount ELSE 0 END) AS bill_amt,
+            SUM(CASE WHEN a.entity_type='Bill' THEN 1 ELSE 0 END) AS bill_ct,
+
+            SUM(CASE WHEN a.entity_type='Purchase' THEN a.amount ELSE 0 END) AS expense_amt,
+            SUM(CASE WHEN a.entity_type='Purchase' THEN 1 ELSE 0 END) AS expense_ct,
+
+            SUM(CASE WHEN a.entity_type='VendorCredit' THEN a.amount ELSE 0 END) AS vendorcredit_amt,
+            SUM(CASE WHEN a.entity_type='VendorCredit' THEN 1 ELSE 0 END) AS vendorcredit_ct,
+
+            SUM(CASE WHEN a.entity_type='CreditMemo' THEN a.amount ELSE 0 END) AS creditmemo_amt,
+            SUM(CASE WHEN a.entity_type='CreditMemo' THEN a.balance_amt ELSE 0 END) AS creditmemo_bal,
+            SUM(CASE WHEN a.entity_type='CreditMemo' THEN 1 ELSE 0 END) AS creditmemo_ct,
+
+            -- one attribution row per (transaction, project)
+            COUNT(*) AS total_transaction_ct
+          FROM qbo_project_attributions a
+          WHERE {scope} AND a.entity_type IN ({entities})
+          GROUP BY a.project_qbo_id
+        ) r
+          ON r.project_qbo_id = ids.project_qbo_id
+        LEFT JOIN (
+          SELECT
+            project_qbo_id,
+            SUM(COALESCE(hours,0)) AS labor_hours,
+            SUM(COALESCE(labor_cost,0)) AS labor_cost
+          FROM qbo_time_activities
+          WHERE {scope}
+          GROUP BY project_qbo_id
+        ) lr
+          ON lr.project_qbo_id = ids.project_qbo_id
+    """).bindparams(*stmt_params), params)
+
+    _recompute_monthly(conn, scope, params, stmt_params)
+    bump_data_version(conn)
+
+
+def _recompute_monthly(conn, scope: str, params: dict, stmt_params: list) -> None:
+    # Undated documents have no month and stay out of the cube
+    entities = ", ".join(f"'{e}'" for e in FINANCIAL_ENTITIES)
+    month = "DATE_SUB(txn_date, INTERVAL DAYOFMONTH(txn_date) - 1 DAY)"
+
+    conn.execute(text(f"""
+        DELETE FROM project_financials_monthly
+        WHERE {scope}
+    """).bindparams(*stmt_params), params)
+
+    conn.execute(text(f"""
+        INSERT INTO project_financials_monthly (
+          project_qbo_id, period_month, entity_type, amount, balance_amt, ct, hours, refreshed_at
+        )
+        SELECT project_qbo_id, {month}, entity_type, SUM(amount), SUM(balance_amt), COUNT(*), NULL, UTC_TIMESTAMP()
+        FROM qbo_project_attributions
+        WHERE {scope} AND entity_type IN ({entities}) AND txn_date IS NOT NULL
+        GROUP BY project_qbo_id, {month}, entity_type
+
+        UNION ALL
+
+        SELECT project_qbo_id, {month}, 'TimeActivity', SUM(COALESCE(labor_cost,0)), NULL, COUNT(*),
+               SUM(COALESCE(hours,0)), UTC_TIMESTAMP()
+        FROM qbo_time_activities
+        WHERE {scope} AND txn_date IS NOT NULL
+        GROUP BY project_qbo_id, {month}
+    """).bindparams(*stmt_params), params)
+
+
+def refresh_project_financials(project_qbo_ids) -> int:
+    project_financials_init_table()
+    ids = sorted({str(i) for i in project_qbo_ids if i})
+
+    # Short transactions so readers and the next sync chunk aren't blocked
+    for offset in range(0, len(ids), REFRESH_BATCH):
+        batch = ids[offset:offset + REFRESH_BATCH]
+        with engine.begin() as conn:
+            _recompute(conn, "project_qbo_id IN :ids", {"ids": batch})
+    return len(ids)
+
+
+def refresh_project_financials_for_run(run_id: int) -> int:
+    # Projects a sync run touched, straight from its changefeed records
+    project_financials_init_table()
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT DISTINCT project_qbo_id
+            FROM changefeed
+            WHERE sync_run_id = :run_id AND project_qbo_id IS NOT NULL
+        """), {"run_id": int(run_id)}).all()
+    return refresh_project_financials(r[0] for r in rows)
+
+
+def rebuild_project_financials() -> dict:
+    project_financials_init_table()
+    with engine.begin() as conn:
+        _recompute(conn, "project_qbo_id IS NOT NULL", {})
+        total = conn.execute(text("SELECT COUNT(*) FROM project_financials")).scalar()
+        cells = conn.execute(text("SELECT COUNT(*) FROM project_financials_monthly")).scalar()
+    return {"project_financials": int(total or 0), "project_financials_monthly": int(cells or 0)}
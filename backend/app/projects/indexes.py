@@ -0,0 +1,54 @@
+from app.db import engine, ensure_index
+
+# Index set for the hot read paths: the project rollup and its filters,
+# the dashboard aggregates, the assignment table/bundle, the schedule and
+# the per-project files/events lists. These tables predate the app's DDL,
+# so indexes are added on first use if nothing equivalent exists yet.
+# bench/explain_plans.py checks the plans they are meant to produce.
+PROJECT_INDEXES = (
+    # rollup default order and the assignment table's order
+    ("qbo_customers", "idx_qbo_customers_project_updated", "is_project, meta_last_updated_time, id"),
+    ("qbo_customers", "idx_qbo_customers_project_created", "is_project, meta_create_time DESC, display_name"),
+    ("qbo_customers", "idx_qbo_customers_project_name", "is_project, display_name"),
+
+    # every rollup joins projects on qbo_customer_id; covering for the
+    # status/date columns it reads
+    ("projects", "idx_projects_customer", "qbo_customer_id, status, start_date, end_date"),
+    ("projects", "idx_projects_status", "status"),
+    ("projects", "idx_projects_dates", "start_date, end_date"),
+    ("projects", "idx_projects_end_date", "end_date"),
+
+    # active/primary assignment lookups per project (covering), and the
+    # PM/crew filters going the other way
+    ("project_project_managers", "idx_ppm_project_active", "project_id, unassigned_at, is_primary, project_manager_id"),
+    ("project_project_managers", "idx_ppm_manager_active", "project_manager_id, unassigned_at, project_id"),
+    ("project_work_crews", "idx_pwc_project_active", "project_id, unassigned_at, is_primary, work_crew_id"),
+    ("project_work_crews", "idx_pwc_crew_active", "work_crew_id, unassigned_at, project_id"),
+
+    # file counts per project and the newest-first lists
+    ("project_files", "idx_project_files_customer", "qbo_customer_id, created_at, id"),
+    ("project_events", "idx_project_events_project", "project_id, created_at"),
+)
+
+_indexes_ready = False
+
+def project_indexes_init() -> None:
+    global _indexes_ready
+    if _indexes_ready:
+        return
+
+    apply_project_indexes()
+    _indexes_ready = True
+
+
+def apply_project_indexes() -> list[str]:
+    added = []
+    with engine.begin() as conn:
+        for table, name, columns in PROJECT_INDEXES:
+            if ensure_index(conn, table, name, columns):
+                added.append(f"{table}.{name}")
+    return added
+
+
+if __name__ == "__main__":
+    print({"indexes_added": apply_project_indexes()})
@@ -0,0 +1,5 @@
+from app.projects.financials import rebuild_project_financials
+
+if __name__ == "__main__":
+    result = rebuild_project_financials()
+    print(result)
@@ -0,0 +1,950 @@
+import base64
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+from sqlalchemy import bindparam, text
+from starlette.concurrency import run_in_threadpool
+
+from app.columnar import shape
+from app.data_version import current_version, data_version_init_table, read_data_version
+from app.db import engine
+from app.projects.financials import project_financials_init_table
+from app.projects.indexes import project_indexes_init
+from app.projects.search import refresh_search_index
+from app.replica import read_engine
+from app.response_cache import response_cache, warm
+from app.streaming import stream_rows
+
+# /api/projects and /api/dashboard both shape their responses from one
+# computed rollup. It is recomputed only when the data version moves (or the
+# TTL lapses, as a backstop for writes made outside the app).
+ROLLUP_CACHE_TTL_SECONDS = int(os.getenv("ROLLUP_CACHE_TTL_SECONDS", "60"))
+
+# Columns computed from project_financials (r) used by the output and,
+# later, by sorting/filtering
+INCOME_SQL = "(COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0))"
+COST_SQL = "(COALESCE(r.bill_amt,0) + COALESCE(r.expense_amt,0) - COALESCE(r.vendorcredit_amt,0))"
+
+
+DEFAULT_ORDER_BY = "p.meta_last_updated_time DESC, p.id DESC"
+
+def build_rollup_sql(
+    where: str = "",
+    order_by: str = DEFAULT_ORDER_BY,
+    limit: Optional[int] = None,
+    sort_key: Optional[str] = None,
+):
+    """
+    One project row per QBO project with assignment, file and financial
+    columns. `where` is extra SQL ANDed onto the project filter; callers
+    pass their values as bind params. `sort_key` adds that expression as
+    a _sort_key column for building keyset cursors.
+    """
+    return text(f"""
+    SELECT
+      {f"{sort_key} AS _sort_key," if sort_key else ""}
+      p.id AS qbo_customer_id,
+      ip.start_date AS start_date,
+      ip.end_date AS end_date,
+      pm.primary_pm_name AS primary_project_manager,
+      wc.primary_crew_name AS primary_work_crew,
+      p.qbo_id AS project_qbo_id,
+      p.display_name AS project_name,
+      p.balance_with_jobs AS project_balance,
+      p.meta_create_time AS project_create_dttm,
+      p.meta_last_updated_time AS project_lastupdate_dttm,
+      COALESCE(pf.file_count, 0) AS file_count,
+
+      CASE WHEN ip.id IS NULL THEN 1 ELSE 0 END AS needs_assignment,
+      COALESCE(ip.status, 'not_started') AS project_status,
+
+      COALESCE(r.estimate_amt,0) AS estimate_amt,
+      COALESCE(r.estimate_ct,0) AS estimate_ct,
+      COALESCE(r.invoice_amt,0) AS invoice_amt,
+      COALESCE(r.invoice_bal,0) AS invoice_bal,
+      COALESCE(r.invoice_ct,0) AS invoice_ct,
+      COALESCE(r.bill_amt,0) AS bill_amt,
+      COALESCE(r.bill_ct,0) AS bill_ct,
+      COALESCE(r.expense_amt,0) AS expense_amt,
+      COALESCE(r.expense_ct,0) AS expense_ct,
+      COALESCE(r.vendorcredit_amt,0) AS vendorcredit_amt,
+      COALESCE(r.vendorcredit_ct,0) AS vendorcredit_ct,
+      COALESCE(r.creditmemo_amt,0) AS creditmemo_amt,
+      COALESCE(r.creditmemo_bal,0) AS creditmemo_bal,
+      COALESCE(r.creditmemo_ct,0) AS creditmemo_ct,
+      COALESCE(r.total_transaction_ct, 0) AS total_transaction_ct,
+      COALESCE(r.labor_hours,0) AS labor_hours,
+      COALESCE(r.labor_cost,0) AS labor_cost,
+
+      {INCOME_SQL} AS total_income,
+      {COST_SQL} AS total_cost,
+      ({INCOME_SQL} - {COST_SQL}) AS total_profit,
+      CASE
+        WHEN {INCOME_SQL} = 0 THEN NULL
+        ELSE ({INCOME_SQL} - {COST_SQL}) / {INCOME_SQL}
+      END AS profit_margin,
+
+      DATEDIFF(p.meta_last_updated_time, p.meta_create_time) AS age_days
+
+    FROM myapp.qbo_customers p
+    LEFT JOIN myapp.projects ip
+      ON ip.qbo_customer_id = p.id
+    LEFT JOIN (
+      SELECT
+        ppm.project_id,
+        MAX(TRIM(CONCAT(COALESCE(pm.first_name,''), ' ', COALESCE(pm.last_name,'')))) AS primary_pm_name
+      FROM myapp.project_project_managers ppm
+      JOIN myapp.project_managers pm
+        ON pm.id = ppm.project_manager_id
+      WHERE ppm.unassigned_at IS NULL
+        AND ppm.is_primary = 1
+      GROUP BY ppm.project_id
+    ) pm
+      ON pm.project_id = ip.id
+    LEFT JOIN (
+      SELECT
+        pwc.project_id,
+        MAX(wc.name) AS primary_crew_name
+      FROM myapp.project_work_crews pwc
+      JOIN myapp.work_crews wc
+        ON wc.id = pwc.work_crew_id
+      WHERE pwc.unassigned_at IS NULL
+        AND pwc.is_primary = 1
+      GROUP BY pwc.project_id
+    ) wc
+      ON wc.project_id = ip.id
+    LEFT JOIN myapp.project_financials r
+      ON r.project_qbo_id = p.qbo_id
+    LEFT JOIN (
+      SELECT
+        qbo_customer_id,
+        COUNT(*) AS file_count
+      FROM myapp.project_files
+      GROUP BY qbo_customer_id
+    ) pf
+      ON pf.qbo_customer_id = p.id
+    WHERE p.is_project = 1
+      {f"AND ({where})" if where else ""}
+    ORDER BY {order_by}
+    {f"LIMIT {int(limit)}" if limit else ""}
+    """)
+
+
+# -----------------------------
+# Paged / sorted / filtered queries
+# -----------------------------
+
+PAGE_SIZE_MAX = 1000
+
+# Sortable columns -> NULL-free SQL expressions (NULLs sort as the lowest
+# value), so a keyset cursor can compare against them directly. QBO always
+# sets DisplayName and MetaData times, so those stay bare columns and the
+# (is_project, ...) indexes can serve the ORDER BY ... LIMIT.
+SORT_COLUMNS = {
+    "project_name": "p.display_name",
+    "project_lastupdate_dttm": "p.meta_last_updated_time",
+    "project_create_dttm": "p.meta_create_time",
+    "start_date": "COALESCE(ip.start_date, '1000-01-01')",
+    "end_date": "COALESCE(ip.end_date, '1000-01-01')",
+    "project_status": "COALESCE(ip.status, 'not_started')",
+    "project_balance": "COALESCE(p.balance_with_jobs, 0)",
+    "age_days": "COALESCE(DATEDIFF(p.meta_last_updated_time, p.meta_create_time), -1)",
+    "file_count": "COALESCE(pf.file_count, 0)",
+    "total_income": INCOME_SQL,
+    "total_cost": COST_SQL,
+    "total_profit": f"({INCOME_SQL} - {COST_SQL})",
+    "profit_margin": f"COALESCE(({INCOME_SQL} - {COST_SQL}) / NULLIF({INCOME_SQL}, 0), -999999)",
+}
+for _col in (
+    "estimate_amt", "estimate_ct", "invoice_amt", "invoice_bal", "invoice_ct",
+    "bill_amt", "bill_ct", "expense_amt", "expense_ct",
+    "vendorcredit_amt", "vendorcredit_ct", "creditmemo_amt", "creditmemo_bal", "creditmemo_ct",
+    "total_transaction_ct", "labor_hours", "labor_cost",
+):
+    SORT_COLUMNS[_col] = f"COALESCE(r.{_col}, 0)"
+
+DEFAULT_SORT = ("project_lastupdate_dttm", "desc")
+
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    if isinstance(value, (date, datetime, Decimal)):
+        value = str(value)
+    raw = json.dumps([value, int(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return value, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _filter_sql(filters: dict) -> tuple[list[str], dict, list]:
+    """
+    Filters only touch p (qbo_customers) and ip (projects); PM/crew use
+    EXISTS so the aggregate can skip the display joins.
+    """
+    conds: list[str] = []
+    params: dict = {}
+    expanding: list = []
+
+    statuses = [x for x in (filters.get("status") or []) if x]
+    if statuses:
+        conds.append("COALESCE(ip.status, 'not_started') IN :statuses")
+        params["statuses"] = statuses
+        expanding.append(bindparam("statuses", expanding=True))
+
+    if filters.get("pm_id") is not None:
+        conds.append("""EXISTS (
+          SELECT 1 FROM myapp.project_project_managers fpm
+          WHERE fpm.project_id = ip.id AND fpm.unassigned_at IS NULL AND fpm.project_manager_id = :pm_id
+        )""")
+        params["pm_id"] = int(filters["pm_id"])
+
+    if filters.get("crew_id") is not None:
+        conds.append("""EXISTS (
+          SELECT 1 FROM myapp.project_work_crews fwc
+          WHERE fwc.project_id = ip.id AND fwc.unassigned_at IS NULL AND fwc.work_crew_id = :crew_id
+        )""")
+        params["crew_id"] = int(filters["crew_id"])
+
+    if filters.get("needs_assignment") is not None:
+        conds.append("ip.id IS NULL" if filters["needs_assignment"] else "ip.id IS NOT NULL")
+
+    ranges = (
+        ("start", "ip.start_date"),
+        ("end", "ip.end_date"),
+        ("created", "p.meta_create_time"),
+        ("updated", "p.meta_last_updated_time"),
+    )
+    for name, column in ranges:
+        if filters.get(f"{name}_from"):
+            conds.append(f"{column} >= :{name}_from")
+            params[f"{name}_from"] = filters[f"{name}_from"]
+        if filters.get(f"{name}_to"):
+            # inclusive of the whole "to" day
+            conds.append(f"{column} < DATE_ADD(:{name}_to, INTERVAL 1 DAY)")
+            params[f"{name}_to"] = filters[f"{name}_to"]
+
+    return conds, params, expanding
+
+
+def _check_sort(sort: Optional[str], direction: Optional[str]) -> tuple[str, str]:
+    sort = sort or DEFAULT_SORT[0]
+    direction = (direction or DEFAULT_SORT[1]).lower()
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort column: {sort}")
+    if direction not in ("asc", "desc"):
+        raise ValueError("direction must be asc or desc")
+    return sort, direction
+
+
+def build_page_query(
+    filters: dict,
+    sort: Optional[str] = None,
+    direction: Optional[str] = None,
+    limit: int = PAGE_SIZE_MAX,
+    cursor: Optional[str] = None,
+):
+    """(statement, params) for one keyset page; rows carry a _sort_key column."""
+    sort, direction = _check_sort(sort, direction)
+    conds, params, expanding = _filter_sql(filters)
+    expr = SORT_COLUMNS[sort]
+    op = "<" if direction == "desc" else ">"
+
+    if cursor:
+        value, row_id = decode_cursor(cursor)
+        conds.append(f"({expr} {op} :cursor_value OR ({expr} = :cursor_value AND p.id {op} :cursor_id))")
+        params.update(cursor_value=value, cursor_id=row_id)
+
+    stmt = build_rollup_sql(
+        where=" AND ".join(conds),
+        order_by=f"{expr} {direction.upper()}, p.id {direction.upper()}",
+        limit=limit,
+        sort_key=expr,
+    ).bindparams(*expanding)
+    return stmt, params
+
+
+def build_aggregate_query(filters: dict):
+    """(statement, params) for the COUNT/AVG summary over the filtered set."""
+    conds, params, expanding = _filter_sql(filters)
+    stmt = text(f"""
+        SELECT
+          COUNT(*) AS total_projects,
+          AVG(DATEDIFF(p.meta_last_updated_time, p.meta_create_time)) AS avg_age_days
+        FROM myapp.qbo_customers p
+        LEFT JOIN myapp.projects ip
+          ON ip.qbo_customer_id = p.id
+        WHERE p.is_project = 1
+          {"".join(f" AND {c}" for c in conds)}
+    """).bindparams(*expanding)
+    return stmt, params
+
+
+def query_projects(
+    filters: Optional[dict] = None,
+    sort: Optional[str] = None,
+    direction: Optional[str] = None,
+    limit: int = PAGE_SIZE_MAX,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    One page of project rows plus an aggregate over the whole filtered set.
+    Keyset pagination on (sort expression, qbo_customer_id); pass back
+    next_cursor with the same sort and filters to get the following page.
+    """
+    filters = filters or {}
+    sort, direction = _check_sort(sort, direction)
+    limit = max(1, min(int(limit or PAGE_SIZE_MAX), PAGE_SIZE_MAX))
+
+    # Unfiltered first page in the default order: reuse the shared rollup
+    if _is_default_page(filters, sort, direction, cursor):
+        return _rollup_page(get_project_rollup(), limit)
+
+    project_financials_init_table()
+    project_indexes_init()
+
+    page_sql, page_params = build_page_query(filters, sort, direction, limit + 1, cursor)
+    agg_sql, agg_params = build_aggregate_query(filters)
+
+    with read_engine().connect() as conn:
+        rows = [dict(r) for r in conn.execute(page_sql, page_params).mappings().all()]
+        agg = conn.execute(agg_sql, agg_params).mappings().first()
+
+    return _page_result(rows, agg, limit)
+
+
+async def query_projects_async(
+    bind,
+    filters: Optional[dict] = None,
+    sort: Optional[str] = None,
+    direction: Optional[str] = None,
+    limit: int = PAGE_SIZE_MAX,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    query_projects on an AsyncEngine. The default first page still comes
+    from the shared rollup (one build per data version), loaded off the loop.
+    """
+    filters = filters or {}
+    sort, direction = _check_sort(sort, direction)
+    limit = max(1, min(int(limit or PAGE_SIZE_MAX), PAGE_SIZE_MAX))
+
+    if _is_default_page(filters, sort, direction, cursor):
+        _, rows = await run_in_threadpool(get_project_rollup_versioned)
+        return _rollup_page(rows, limit)
+
+    await _ensure_report_tables()
+
+    page_sql, page_params = build_page_query(filters, sort, direction, limit + 1, cursor)
+    agg_sql, agg_params = build_aggregate_query(filters)
+
+    async with bind.connect() as conn:
+        rows = [dict(r) for r in (await conn.execute(page_sql, page_params)).mappings().all()]
+        agg = (await conn.execute(agg_sql, agg_params)).mappings().first()
+
+    return _page_result(rows, agg, limit)
+
+
+def _is_default_page(filters: dict, sort: str, direction: str, cursor: Optional[str]) -> bool:
+    return (
+        not any(v not in (None, [], "") for v in filters.values())
+        and (sort, direction) == DEFAULT_SORT
+        and not cursor
+    )
+
+
+def _rollup_page(rows: list[dict], limit: int) -> dict:
+    # Same shape and cursor as the SQL path, so page two continues from here
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last["project_lastupdate_dttm"] or "1000-01-01", last["qbo_customer_id"])
+    return {"summary": summarize(rows), "projects": page, "next_cursor": next_cursor}
+
+
+def _page_result(rows: list[dict], agg, limit: int) -> dict:
+    # rows were fetched with limit + 1 to tell whether another page exists
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["_sort_key"], rows[-1]["qbo_customer_id"])
+    for r in rows:
+        r.pop("_sort_key", None)
+
+    return {"summary": _aggregate_summary(agg), "projects": rows, "next_cursor": next_cursor}
+
+
+_report_tables_ready = False
+
+async def _ensure_report_tables() -> None:
+    # The DDL helpers are sync and memoized; only the first call needs a thread
+    global _report_tables_ready
+    if _report_tables_ready:
+        return
+    await run_in_threadpool(project_financials_init_table)
+    await run_in_threadpool(project_indexes_init)
+    _report_tables_ready = True
+
+
+def _aggregate_summary(agg) -> dict:
+    avg = agg["avg_age_days"]
+    return {
+        "total_projects": int(agg["total_projects"] or 0),
+        "avg_age_days": float(avg) if avg is not None else None,
+    }
+
+
+def stream_projects(
+    filters: Optional[dict] = None,
+    sort: Optional[str] = None,
+    direction: Optional[str] = None,
+    limit: int = PAGE_SIZE_MAX,
+    cursor: Optional[str] = None,
+):
+    """
+    NDJSON flavour of query_projects: same page, read through a server-side
+    cursor, then a {"_meta": {...}} line with summary and next_cursor. Bad
+    sort/cursor input raises ValueError here, before anything is sent.
+    """
+    filters = filters or {}
+    sort, direction = _check_sort(sort, direction)
+    limit = max(1, min(int(limit or PAGE_SIZE_MAX), PAGE_SIZE_MAX))
+
+    project_financials_init_table()
+    project_indexes_init()
+
+    page_sql, page_params = build_page_query(filters, sort, direction, limit + 1, cursor)
+    agg_sql, agg_params = build_aggregate_query(filters)
+
+    def lines(conn):
+        n = 0
+        last = None
+        next_cursor = None
+        for row in stream_rows(conn, page_sql, page_params):
+            if n == limit:
+                # The lookahead row: there is another page after this one
+                next_cursor = encode_cursor(*last)
+                continue
+            last = (row.pop("_sort_key", None), row["qbo_customer_id"])
+            n += 1
+            yield row
+
+        agg = conn.execute(agg_sql, agg_params).mappings().first()
+        yield {"_meta": {"row_count": n, "summary": _aggregate_summary(agg), "next_cursor": next_cursor}}
+
+    return lines
+
+
+# -----------------------------
+# Dashboard KPIs
+# -----------------------------
+
+# group_by name -> (key expression, label expression, extra joins)
+KPI_GROUPS = {
+    "status": ("COALESCE(ip.status, 'not_started')", "COALESCE(ip.status, 'not_started')", ""),
+    "month": ("DATE_FORMAT(ip.end_date, '%Y-%m')", "DATE_FORMAT(ip.end_date, '%Y-%m')", ""),
+    "pm": (
+        "gpm.project_manager_id",
+        "TRIM(CONCAT(COALESCE(gpm_pm.first_name,''), ' ', COALESCE(gpm_pm.last_name,'')))",
+        """
+        LEFT JOIN (
+          SELECT project_id, MIN(project_manager_id) AS project_manager_id
+          FROM myapp.project_project_managers
+          WHERE unassigned_at IS NULL AND is_primary = 1
+          GROUP BY project_id
+        ) gpm
+          ON gpm.project_id = ip.id
+        LEFT JOIN myapp.project_managers gpm_pm
+          ON gpm_pm.id = gpm.project_manager_id
+        """,
+    ),
+    "crew": (
+        "gwc.work_crew_id",
+        "gwc_wc.name",
+        """
+        LEFT JOIN (
+          SELECT project_id, MIN(work_crew_id) AS work_crew_id
+          FROM myapp.project_work_crews
+          WHERE unassigned_at IS NULL AND is_primary = 1
+          GROUP BY project_id
+        ) gwc
+          ON gwc.project_id = ip.id
+        LEFT JOIN myapp.work_crews gwc_wc
+          ON gwc_wc.id = gwc.work_crew_id
+        """,
+    ),
+}
+
+# Project names returned per month group (the dashboard chart tooltip)
+KPI_MONTH_PROJECT_NAMES = 8
+
+_KPI_METRICS = f"""
+          COUNT(*) AS project_ct,
+          SUM({INCOME_SQL}) AS income,
+          SUM({COST_SQL}) AS cost,
+          AVG(DATEDIFF(p.meta_last_updated_time, p.meta_create_time)) AS avg_age_days
+"""
+
+_KPI_FROM = """
+        FROM myapp.qbo_customers p
+        LEFT JOIN myapp.projects ip
+          ON ip.qbo_customer_id = p.id
+        LEFT JOIN myapp.project_financials r
+          ON r.project_qbo_id = p.qbo_id
+"""
+
+
+def _kpi_row(row) -> dict:
+    income = float(row["income"] or 0)
+    cost = float(row["cost"] or 0)
+    avg = row["avg_age_days"]
+    return {
+        "project_ct": int(row["project_ct"] or 0),
+        "income": income,
+        "cost": cost,
+        "profit": income - cost,
+        # income-weighted, same as summing profit/income over projects
+        "margin": (income - cost) / income if income else None,
+        "avg_age_days": float(avg) if avg is not None else None,
+    }
+
+
+def _kpi_where(filters: dict, group: Optional[str]) -> tuple[str, dict, list]:
+    conds, params, expanding = _filter_sql(filters)
+    if group == "month":
+        conds.append("ip.end_date IS NOT NULL")
+    return "WHERE p.is_project = 1" + "".join(f" AND {c}" for c in conds), params, expanding
+
+
+def build_kpi_query(filters: dict, group: Optional[str] = None):
+    """(statement, params) for the KPI totals, or one row per group."""
+    if group is not None and group not in KPI_GROUPS:
+        raise ValueError(f"Unknown group_by: {group}")
+    where, params, expanding = _kpi_where(filters, group)
+
+    if group is None:
+        return text(f"""
+            SELECT {_KPI_METRICS}
+            {_KPI_FROM}
+            {where}
+        """).bindparams(*expanding), params
+
+    key_sql, label_sql, joins = KPI_GROUPS[group]
+    return text(f"""
+        SELECT
+          {key_sql} AS group_key,
+          MAX({label_sql}) AS label,
+          {_KPI_METRICS}
+        {_KPI_FROM}
+        {joins}
+        {where}
+        GROUP BY {key_sql}
+        ORDER BY {key_sql}
+    """).bindparams(*expanding), params
+
+
+def build_kpi_month_names_query(filters: dict):
+    """(statement, params) for the first few project names per end-date month."""
+    where, params, expanding = _kpi_where(filters, "month")
+    return text(f"""
+        SELECT month, project_name
+        FROM (
+          SELECT
+            DATE_FORMAT(ip.end_date, '%Y-%m') AS month,
+            p.display_name AS project_name,
+            ROW_NUMBER() OVER (
+              PARTITION BY DATE_FORMAT(ip.end_date, '%Y-%m')
+              ORDER BY p.display_name
+            ) AS rn
+          {_KPI_FROM}
+          {where}
+        ) x
+        WHERE rn <= :name_limit
+        ORDER BY month, rn
+    """).bindparams(*expanding), {**params, "name_limit": KPI_MONTH_PROJECT_NAMES}
+
+
+def get_dashboard_kpis(filters: Optional[dict] = None, group_by: Optional[list[str]] = None) -> dict:
+    """
+    KPI totals for projects matching `filters` (same keys as
+    query_projects), optionally broken down by status, month (of end_date),
+    pm or crew (primary assignment). Computed in SQL from project_financials.
+    """
+    filters = filters or {}
+    group_by = _kpi_group_names(group_by)
+
+    project_financials_init_table()
+    project_indexes_init()
+
+    out: dict = {"groups": {}}
+    with read_engine().connect() as conn:
+        row = conn.execute(*build_kpi_query(filters)).mappings().first()
+        out["totals"] = _kpi_row(row)
+
+        for name in group_by:
+            rows = conn.execute(*build_kpi_query(filters, name)).mappings().all()
+            names = None
+            if name == "month" and rows:
+                names = conn.execute(*build_kpi_month_names_query(filters)).all()
+            out["groups"][name] = _kpi_groups(rows, names)
+
+    return out
+
+
+async def get_dashboard_kpis_async(
+    bind,
+    filters: Optional[dict] = None,
+    group_by: Optional[list[str]] = None,
+) -> dict:
+    """get_dashboard_kpis on an AsyncEngine."""
+    filters = filters or {}
+    group_by = _kpi_group_names(group_by)
+
+    await _ensure_report_tables()
+
+    out: dict = {"groups": {}}
+    async with bind.connect() as conn:
+        row = (await conn.execute(*build_kpi_query(filters))).mappings().first()
+        out["totals"] = _kpi_row(row)
+
+        for name in group_by:
+            rows = (await conn.execute(*build_kpi_query(filters, name))).mappings().all()
+            names = None
+            if name == "month" and rows:
+                names = (await conn.execute(*build_kpi_month_names_query(filters))).all()
+            out["groups"][name] = _kpi_groups(rows, names)
+
+    return out
+
+
+def _kpi_group_names(group_by: Optional[list[str]]) -> list[str]:
+    group_by = [g for g in (group_by or []) if g]
+    unknown = [g for g in group_by if g not in KPI_GROUPS]
+    if unknown:
+        raise ValueError(f"Unknown group_by: {', '.join(unknown)}")
+    return group_by
+
+
+def _kpi_groups(rows, month_names=None) -> list[dict]:
+    # month_names: (month, project_name) rows from build_kpi_month_names_query
+    groups = [{"key": r["group_key"], "label": r["label"], **_kpi_row(r)} for r in rows]
+    if month_names is not None:
+        by_month: dict = {}
+        for month, project_name in month_names:
+            by_month.setdefault(month, []).append(project_name)
+        for g in groups:
+            g["projects"] = by_month.get(g["key"], [])
+    return groups
+
+
+# -----------------------------
+# Period / trend reports (monthly cube)
+# -----------------------------
+
+_CUBE_METRICS = """
+          SUM(CASE WHEN c.entity_type = 'Invoice' THEN c.amount
+                   WHEN c.entity_type = 'CreditMemo' THEN -c.amount ELSE 0 END) AS income,
+          SUM(CASE WHEN c.entity_type IN ('Bill', 'Purchase') THEN c.amount
+                   WHEN c.entity_type = 'VendorCredit' THEN -c.amount ELSE 0 END) AS cost,
+          SUM(CASE WHEN c.entity_type = 'Estimate' THEN c.amount ELSE 0 END) AS estimate_amt,
+          SUM(CASE WHEN c.entity_type = 'TimeActivity' THEN c.amount ELSE 0 END) AS labor_cost,
+          SUM(COALESCE(c.hours, 0)) AS labor_hours,
+          SUM(CASE WHEN c.entity_type <> 'TimeActivity' THEN c.ct ELSE 0 END) AS transaction_ct
+"""
+
+_CUBE_FROM = """
+        FROM myapp.project_financials_monthly c
+        JOIN myapp.qbo_customers p
+          ON p.qbo_id = c.project_qbo_id AND p.is_project = 1
+        LEFT JOIN myapp.projects ip
+          ON ip.qbo_customer_id = p.id
+"""
+
+MONTHLY_SERIES_BY = ("all", "project", "pm", "crew")
+MONTHLY_SERIES_MAX_MONTHS = 120
+
+
+def parse_month(value: str) -> date:
+    """'YYYY-MM' (or a full date) -> first day of that month."""
+    try:
+        return datetime.strptime(value[:7], "%Y-%m").date()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid month: {value!r} (expected YYYY-MM)")
+
+
+def _month_range(month_from: Optional[str], month_to: Optional[str]) -> tuple[date, date]:
+    # Defaults to the trailing 12 months, current month included
+    today = date.today().replace(day=1)
+    end = parse_month(month_to) if month_to else today
+    start = parse_month(month_from) if month_from else date(end.year - 1, end.month, 1)
+    if start > end:
+        raise ValueError("month_from must not be after month_to")
+    return start, end
+
+
+def _cube_row(row) -> dict:
+    income = float(row["income"] or 0)
+    cost = float(row["cost"] or 0)
+    return {
+        "income": income,
+        "cost": cost,
+        "profit": income - cost,
+        "margin": (income - cost) / income if income else None,
+        "estimate_amt": float(row["estimate_amt"] or 0),
+        "labor_cost": float(row["labor_cost"] or 0),
+        "labor_hours": float(row["labor_hours"] or 0),
+        "transaction_ct": int(row["transaction_ct"] or 0),
+    }
+
+
+def _cube_where(filters: dict, start: date, end: date) -> tuple[str, dict, list]:
+    conds, params, expanding = _filter_sql(filters)
+    params.update(month_from=start, month_to=end)
+    where = "WHERE c.period_month BETWEEN :month_from AND :month_to"
+    return where + "".join(f" AND {c}" for c in conds), params, expanding
+
+
+def get_period_financials(
+    filters: Optional[dict] = None,
+    month_from: Optional[str] = None,
+    month_to: Optional[str] = None,
+) -> dict:
+    """
+    Per-project income/cost/labor for transactions dated in
+    [month_from, month_to], plus totals. Same filters as query_projects.
+    """
+    start, end = _month_range(month_from, month_to)
+    project_financials_init_table()
+    project_indexes_init()
+
+    where, params, expanding = _cube_where(filters or {}, start, end)
+    with read_engine().connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT
+              p.id AS qbo_customer_id,
+              p.qbo_id AS project_qbo_id,
+              p.display_name AS project_name,
+              COALESCE(ip.status, 'not_started') AS project_status,
+              {_CUBE_METRICS}
+            {_CUBE_FROM}
+            {where}
+            GROUP BY p.id, p.qbo_id, p.display_name, ip.status
+            ORDER BY p.display_name, p.id
+        """).bindparams(*expanding), params).mappings().all()
+
+    projects = [
+        {k: r[k] for k in ("qbo_customer_id", "project_qbo_id", "project_name", "project_status")} | _cube_row(r)
+        for r in rows
+    ]
+    totals = {k: sum(p[k] for p in projects) for k in (
+        "income", "cost", "profit", "estimate_amt", "labor_cost", "labor_hours", "transaction_ct",
+    )}
+    totals["margin"] = totals["profit"] / totals["income"] if totals["income"] else None
+    totals["project_ct"] = len(projects)
+
+    return {
+        "month_from": start.strftime("%Y-%m"),
+        "month_to": end.strftime("%Y-%m"),
+        "totals": totals,
+        "projects": projects,
+    }
+
+
+def get_monthly_series(
+    by: str = "all",
+    id: Optional[int] = None,
+    month_from: Optional[str] = None,
+    month_to: Optional[str] = None,
+    filters: Optional[dict] = None,
+) -> dict:
+    """
+    Monthly income/cost/labor series for one project (by qbo_customer_id),
+    the projects a PM or crew is actively assigned to, or everything.
+    Months without activity are returned as zeros.
+    """
+    if by not in MONTHLY_SERIES_BY:
+        raise ValueError(f"by must be one of: {', '.join(MONTHLY_SERIES_BY)}")
+    if by != "all" and id is None:
+        raise ValueError(f"id is required when by={by}")
+    start, end = _month_range(month_from, month_to)
+    if (end.year - start.year) * 12 + end.month - start.month >= MONTHLY_SERIES_MAX_MONTHS:
+        raise ValueError(f"At most {MONTHLY_SERIES_MAX_MONTHS} months per series")
+
+    filters = dict(filters or {})
+    if by == "pm":
+        filters["pm_id"] = id
+    elif by == "crew":
+        filters["crew_id"] = id
+
+    project_financials_init_table()
+    project_indexes_init()
+
+    where, params, expanding = _cube_where(filters, start, end)
+    if by == "project":
+        where += " AND p.id = :series_project_id"
+        params["series_project_id"] = int(id)
+
+    with read_engine().connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT
+              c.period_month,
+              {_CUBE_METRICS}
+            {_CUBE_FROM}
+            {where}
+            GROUP BY c.period_month
+            ORDER BY c.period_month
+        """).bindparams(*expanding), params).mappings().all()
+
+    by_month = {r["period_month"]: _cube_row(r) for r in rows}
+    zero = _cube_row({k: 0 for k in ("income", "cost", "estimate_amt", "labor_cost", "labor_hours", "transaction_ct")})
+
+    months = []
+    m = start
+    while m <= end:
+        months.append({"month": m.strftime("%Y-%m"), **by_month.get(m, zero)})
+        m = date(m.year + (m.month == 12), m.month % 12 + 1, 1)
+
+    return {"by": by, "id": id, "months": months}
+
+
+def summarize(projects: list[dict]) -> dict:
+    ages = [int(p["age_days"]) for p in projects if p.get("age_days") is not None]
+    return {
+        "total_projects": len(projects),
+        "avg_age_days": (sum(ages) / len(ages)) if ages else None,
+    }
+
+
+class _RollupCache:
+    """
+    Holds the last computed rollup with the data version it was computed at.
+    Concurrent callers that find it stale queue on one lock, so only the
+    first recomputes and the rest reuse its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._computed_at = 0.0
+        # (version, rows), swapped as one so readers never mix the two
+        self._snapshot: tuple[Optional[tuple], list[dict]] = (None, [])
+
+    def _fresh(self, snapshot: tuple, version: tuple) -> bool:
+        return (
+            snapshot[0] == version
+            and time.monotonic() - self._computed_at < ROLLUP_CACHE_TTL_SECONDS
+        )
+
+    def get(self) -> tuple[tuple, list[dict]]:
+        data_version_init_table()
+        project_financials_init_table()
+
+        with engine.connect() as conn:
+            version = read_data_version(conn)
+        snapshot = self._snapshot
+        if self._fresh(snapshot, version):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if self._fresh(snapshot, version):
+                return snapshot
+
+            with read_engine().connect() as conn:
+                # Read the version in the same snapshot as the rows so a write
+                # landing in between forces the next caller to recompute
+                conn.execute(text("START TRANSACTION WITH CONSISTENT SNAPSHOT"))
+                version = read_data_version(conn)
+                rows = conn.execute(build_rollup_sql()).mappings().all()
+                conn.rollback()
+
+            self._snapshot = (version, [dict(r) for r in rows])
+            self._computed_at = time.monotonic()
+            return self._snapshot
+
+
+_cache = _RollupCache()
+
+
+def get_project_rollup() -> list[dict]:
+    """Shared, read-only list of project rows; callers must not mutate it."""
+    return _cache.get()[1]
+
+
+def get_project_rollup_versioned() -> tuple[tuple, list[dict]]:
+    """(data version, rows) of the shared rollup, for caches keyed on it."""
+    return _cache.get()
+
+
+# /api/dashboard leaves out the projects-page-only columns
+DASHBOARD_OMIT = {"qbo_customer_id", "file_count", "labor_hours", "labor_cost"}
+
+def get_dashboard_payload() -> dict:
+    projects = [
+        {k: v for k, v in p.items() if k not in DASHBOARD_OMIT}
+        for p in get_project_rollup()
+    ]
+    return {
+        "projects": projects[:1000],
+        "summary": summarize(projects),
+    }
+
+
+def stream_dashboard():
+    """
+    NDJSON flavour of get_dashboard_payload, straight from the database
+    rather than the shared rollup. Rows past the first 1000 are still read
+    for the summary but not sent.
+    """
+    data_version_init_table()
+    project_financials_init_table()
+
+    def lines(conn):
+        n = 0
+        age_sum = age_ct = 0
+        for row in stream_rows(conn, build_rollup_sql()):
+            n += 1
+            if row.get("age_days") is not None:
+                age_sum += int(row["age_days"])
+                age_ct += 1
+            if n <= 1000:
+                yield {k: v for k, v in row.items() if k not in DASHBOARD_OMIT}
+
+        summary = {
+            "total_projects": n,
+            "avg_age_days": (age_sum / age_ct) if age_ct else None,
+        }
+        yield {"_meta": {"row_count": min(n, 1000), "summary": summary}}
+
+    return lines
+
+
+def warm_read_caches() -> dict:
+    """
+    Drops cached responses and rebuilds the ones every page load asks for
+    (the default /api/projects, /api/dashboard and the dashboard summary),
+    then brings the search index up to date. The query strings match what
+    the frontend sends.
+    """
+    response_cache.clear()
+    version = current_version()
+    warm("projects", "format=columns", version, lambda: shape(query_projects(), "projects", "columns"))
+    warm("dashboard", "", version, get_dashboard_payload)
+    warm(
+        "dashboard_summary",
+        "status=completed&group_by=month",
+        version,
+        lambda: get_dashboard_kpis({"status": ["completed"]}, ["month"]),
+    )
+    refresh_search_index()
+    return response_cache.stats()
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File, Form
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, List
 from sqlalchemy import text
 from app.db import engine
@@ -7,13 +8,33 @@ from datetime import date, datetime, timedelta
 
 import json
 
-from app.auth import get_current_user
+from app.auth import get_current_user, get_current_user_async, require_admin
+from app.columnar import check_format, shape
+from app.fast_json import FastJSONResponse
+from app.data_version import bump_data_version, conditional_get, conditional_get_async, data_version_init_table
+from app.projects.analytics import OUTLIER_LIMIT, OUTLIER_Z, get_portfolio_analytics
+from app.projects.financials import rebuild_project_financials
+from app.projects.rollup import (
+    PAGE_SIZE_MAX,
+    get_monthly_series,
+    get_period_financials,
+    query_projects_async,
+    stream_projects,
+)
+from app.projects.search import SEARCH_KINDS, SEARCH_LIMIT, SEARCH_LIMIT_MAX, search_projects
+from app.replica import read_engine
+from app.response_cache import cached_json, cached_json_async
+from app.streaming import ndjson_response, stream_table, wants_ndjson
 from .service import (
     list_assignable_projects,
     get_assignment_bundle,
     save_project_assignment,
     list_project_events,
     ensure_project_row_for_qbo_customer,
+    get_project_labor,
+    get_project_transactions,
+    TRANSACTIONS_PAGE_MAX,
+    TRANSACTIONS_PAGE_SIZE,
 )
 from app.s3 import s3_client, AWS_BUCKET, build_project_file_key, signed_file_url
 
@@ -32,7 +53,7 @@ class AssignmentSaveRequest(BaseModel):
 @router.get("/assignment/projects")
 def assignment_projects(user=Depends(get_current_user)):
     # List QBO projects for the dropdown/search
-    return list_assignable_projects()
+    return FastJSONResponse(list_assignable_projects())
 
 @router.get("/assignment/bundle")
 def assignment_bundle(qbo_customer_id: int, user=Depends(get_current_user)):
@@ -42,7 +63,7 @@ def assignment_bundle(qbo_customer_id: int, user=Depends(get_current_user)):
     # - active crew assignments
     # - list of all PMs
     # - list of all crews
-    return get_assignment_bundle(qbo_customer_id=qbo_customer_id)
+    return FastJSONResponse(get_assignment_bundle(qbo_customer_id=qbo_customer_id))
 
 @router.post("/assignment/save")
 def assignment_save(req: AssignmentSaveRequest, user=Depends(get_current_user)):
@@ -51,9 +72,7 @@ def assignment_save(req: AssignmentSaveRequest, user=Depends(get_current_user)):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/assignment/table")
-def assignment_table(user=Depends(get_current_user)):
-    sql = text("""
+ASSIGNMENT_TABLE_SQL = text("""
     SELECT
       p.id AS qbo_customer_id,
       p.display_name AS project_name,
@@ -125,219 +144,216 @@ def assignment_table(user=Depends(get_current_user)):
 
     WHERE p.is_project = 1
     ORDER BY p.meta_create_time DESC, p.display_name
-    """)
+""")
 
-    with engine.connect() as conn:
-        rows = conn.execute(sql).mappings().all()
-
-    return {"projects": [dict(r) for r in rows]}
+@router.get("/assignment/table")
+def assignment_table(
+    request: Request,
+    format: Optional[str] = Query(None, description="columns for the compact columnar shape"),
+    user=Depends(get_current_user),
+    _etag=Depends(conditional_get),
+):
+    try:
+        format = check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if wants_ndjson(request):
+        return ndjson_response(request, stream_table(ASSIGNMENT_TABLE_SQL))
+
+    def build():
+        with read_engine().connect() as conn:
+            rows = conn.execute(ASSIGNMENT_TABLE_SQL).mappings().all()
+        return shape({"projects": [dict(r) for r in rows]}, "projects", format)
+
+    return cached_json(request, "assignment_table", build)
+
+@router.get("/search/projects")
+def projects_search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: str = Query("project", description=", ".join(SEARCH_KINDS)),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=SEARCH_LIMIT_MAX),
+    inactive: bool = Query(False, description="Include inactive customers/projects"),
+    user=Depends(get_current_user),
+    _etag=Depends(conditional_get),
+):
+    # Typeahead: ranked matches on project, customer, PM and crew names from the in-memory index
+    try:
+        return search_projects(
+            q, kind=kind, limit=limit, include_inactive=inactive, version=request.state.data_version,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/projects/{qbo_customer_id}/events")
 def project_events(qbo_customer_id: int, user=Depends(get_current_user)):
-    return list_project_events(qbo_customer_id=qbo_customer_id)
-
-@router.get("/projects")
-def projects(user=Depends(get_current_user)):
+    return FastJSONResponse(list_project_events(qbo_customer_id=qbo_customer_id))
 
-    sql = text("""
-    WITH
-    projects AS (
-      SELECT
-        id AS qbo_customer_id,
-        qbo_id,
-        display_name,
-        balance_with_jobs,
-        meta_create_time,
-        meta_last_updated_time
-      FROM myapp.qbo_customers
-      WHERE is_project = 1
-    ),
-    line_totals AS (
-      SELECT
-        transaction_id,
-        line_customer_qbo_id AS project_qbo_id,
-        SUM(amount) AS line_amt
-      FROM myapp.qbo_transaction_lines
-      WHERE line_customer_qbo_id IS NOT NULL
-      GROUP BY transaction_id, line_customer_qbo_id
-    ),
-    txn_rollup AS (
-      SELECT
-        COALESCE(t.customer_qbo_id, lt.project_qbo_id) AS project_qbo_id,
-
-        SUM(CASE WHEN t.entity_type='Estimate' THEN t.total_amt ELSE 0 END) AS estimate_amt,
-        SUM(CASE WHEN t.entity_type='Estimate' THEN 1 ELSE 0 END) AS estimate_ct,
-
-        SUM(CASE WHEN t.entity_type='Invoice' THEN t.total_amt ELSE 0 END) AS invoice_amt,
-        SUM(CASE WHEN t.entity_type='Invoice' THEN t.balance_amt ELSE 0 END) AS invoice_bal,
-        SUM(CASE WHEN t.entity_type='Invoice' THEN 1 ELSE 0 END) AS invoice_ct,
-
-        SUM(CASE WHEN t.entity_type='Bill' THEN COALESCE(lt.line_amt,0) ELSE 0 END) AS bill_amt,
-        SUM(CASE WHEN t.entity_type='Bill' THEN 1 ELSE 0 END) AS bill_ct,
-
-        SUM(CASE WHEN t.entity_type='Purchase' THEN COALESCE(lt.line_amt,0) ELSE 0 END) AS expense_amt,
-        SUM(CASE WHEN t.entity_type='Purchase' THEN 1 ELSE 0 END) AS expense_ct,
-
-        SUM(CASE WHEN t.entity_type='VendorCredit' THEN COALESCE(lt.line_amt,0) ELSE 0 END) AS vendorcredit_amt,
-        SUM(CASE WHEN t.entity_type='VendorCredit' THEN 1 ELSE 0 END) AS vendorcredit_ct,
-
-        SUM(CASE WHEN t.entity_type='CreditMemo' THEN t.total_amt ELSE 0 END) AS creditmemo_amt,
-        SUM(CASE WHEN t.entity_type='CreditMemo' THEN t.balance_amt ELSE 0 END) AS creditmemo_bal,
-        SUM(CASE WHEN t.entity_type='CreditMemo' THEN 1 ELSE 0 END) AS creditmemo_ct,
+@router.get("/projects/{qbo_customer_id}/labor")
+def project_labor(qbo_customer_id: int, user=Depends(get_current_user)):
+    try:
+        return FastJSONResponse(get_project_labor(qbo_customer_id=qbo_customer_id))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
-        COUNT(DISTINCT t.id) AS total_transaction_ct
-        
-      FROM myapp.qbo_transactions t
-      LEFT JOIN line_totals lt
-        ON lt.transaction_id = t.id
-        AND t.entity_type IN ('Bill','Purchase','VendorCredit')
-      WHERE t.entity_type IN ('Estimate','Invoice','Bill','Purchase','VendorCredit','CreditMemo')
-      GROUP BY COALESCE(t.customer_qbo_id, lt.project_qbo_id)
-    )
-    SELECT
-      p.qbo_customer_id AS qbo_customer_id,
-      ip.start_date AS start_date,
-      ip.end_date AS end_date,
-      pm.primary_pm_name AS primary_project_manager,
-      wc.primary_crew_name AS primary_work_crew,
-      p.qbo_id AS project_qbo_id,
-      p.display_name AS project_name,
-      p.balance_with_jobs AS project_balance,
-      p.meta_create_time AS project_create_dttm,
-      p.meta_last_updated_time AS project_lastupdate_dttm,
-      COALESCE(pf.file_count, 0) AS file_count,
-               
-      CASE WHEN ip.id IS NULL THEN 1 ELSE 0 END AS needs_assignment,
-      COALESCE(ip.status, 'not_started') AS project_status,
-
-      COALESCE(r.estimate_amt,0) AS estimate_amt,
-      COALESCE(r.estimate_ct,0) AS estimate_ct,
-      COALESCE(r.invoice_amt,0) AS invoice_amt,
-      COALESCE(r.invoice_bal,0) AS invoice_bal,
-      COALESCE(r.invoice_ct,0) AS invoice_ct,
-      COALESCE(r.bill_amt,0) AS bill_amt,
-      COALESCE(r.bill_ct,0) AS bill_ct,
-      COALESCE(r.expense_amt,0) AS expense_amt,
-      COALESCE(r.expense_ct,0) AS expense_ct,
-      COALESCE(r.vendorcredit_amt,0) AS vendorcredit_amt,
-      COALESCE(r.vendorcredit_ct,0) AS vendorcredit_ct,
-      COALESCE(r.creditmemo_amt,0) AS creditmemo_amt,
-      COALESCE(r.creditmemo_bal,0) AS creditmemo_bal,
-      COALESCE(r.creditmemo_ct,0) AS creditmemo_ct,
-      COALESCE(r.total_transaction_ct, 0) AS total_transaction_ct,
-
-      (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0)) AS total_income,
-      (COALESCE(r.bill_amt,0) + COALESCE(r.expense_amt,0) - COALESCE(r.vendorcredit_amt,0)) AS total_cost,
-
-      (
-        (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0))
-        -
-        (COALESCE(r.bill_amt,0) + COALESCE(r.expense_amt,0) - COALESCE(r.vendorcredit_amt,0))
-      ) AS total_profit,
-
-      CASE
-        WHEN (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0)) = 0 THEN NULL
-        ELSE (
-          (
-            (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0))
-            -
-            (COALESCE(r.bill_amt,0) + COALESCE(r.expense_amt,0) - COALESCE(r.vendorcredit_amt,0))
-          ) / (COALESCE(r.invoice_amt,0) - COALESCE(r.creditmemo_amt,0))
+@router.get("/projects/{qbo_customer_id}/transactions")
+def project_transactions(
+    request: Request,
+    qbo_customer_id: int,
+    entity_type: Optional[str] = Query(None, description="Comma-separated, e.g. Invoice,Bill"),
+    date_from: Optional[date] = Query(None, description="YYYY-MM-DD, inclusive"),
+    date_to: Optional[date] = Query(None, description="YYYY-MM-DD, inclusive"),
+    limit: int = Query(TRANSACTIONS_PAGE_SIZE, ge=1, le=TRANSACTIONS_PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    lines: bool = Query(True, description="Include each document's lines for this project"),
+    user=Depends(get_current_user),
+    _etag=Depends(conditional_get),
+):
+    # Drilldown behind the rollup numbers: documents newest first, amounts as attributed
+    entity_types = [x.strip() for x in entity_type.split(",")] if entity_type else None
+    try:
+        return cached_json(
+            request,
+            f"project_transactions:{qbo_customer_id}",
+            lambda: get_project_transactions(
+                qbo_customer_id,
+                entity_types=entity_types,
+                date_from=date_from,
+                date_to=date_to,
+                limit=limit,
+                cursor=cursor,
+                include_lines=lines,
+            ),
         )
-      END AS profit_margin,
-
-      DATEDIFF(p.meta_last_updated_time, p.meta_create_time) AS age_days
-
-    FROM projects p
-    LEFT JOIN myapp.projects ip
-      ON ip.qbo_customer_id = p.qbo_customer_id 
-    LEFT JOIN (
-      SELECT
-        ppm.project_id,
-        MAX(TRIM(CONCAT(COALESCE(pm.first_name,''), ' ', COALESCE(pm.last_name,'')))) AS primary_pm_name
-      FROM myapp.project_project_managers ppm
-      JOIN myapp.project_managers pm
-        ON pm.id = ppm.project_manager_id
-      WHERE ppm.unassigned_at IS NULL
-        AND ppm.is_primary = 1
-      GROUP BY ppm.project_id
-    ) pm
-      ON pm.project_id = ip.id
-
-    LEFT JOIN (
-      SELECT
-        pwc.project_id,
-        MAX(wc.name) AS primary_crew_name
-      FROM myapp.project_work_crews pwc
-      JOIN myapp.work_crews wc
-        ON wc.id = pwc.work_crew_id
-      WHERE pwc.unassigned_at IS NULL
-        AND pwc.is_primary = 1
-      GROUP BY pwc.project_id
-    ) wc
-      ON wc.project_id = ip.id
-    LEFT JOIN txn_rollup r
-      ON r.project_qbo_id = p.qbo_id
-    LEFT JOIN (
-      SELECT
-        qbo_customer_id,
-        COUNT(*) AS file_count
-      FROM myapp.project_files
-      GROUP BY qbo_customer_id
-    ) pf
-      ON pf.qbo_customer_id = p.qbo_customer_id
-    ORDER BY p.meta_last_updated_time DESC
-    """)
-
-    with engine.connect() as conn:
-        rows = conn.execute(sql).mappings().all()
-
-    projects = [dict(r) for r in rows]
-
-    # avg age
-    age_sum = 0
-    age_ct = 0
-
-    for p in projects:
-        if p.get("age_days") is not None:
-            age_sum += int(p["age_days"])
-            age_ct += 1
-
-    avg_age_days = (age_sum / age_ct) if age_ct else None
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {
-        "summary": {
-            "total_projects": len(projects),
-            "avg_age_days": avg_age_days,
-        },
-        "projects": projects[:1000],  # keep UI snappy; raise later or paginate
+@router.post("/projects/financials/rebuild")
+def projects_financials_rebuild(_admin=Depends(require_admin)):
+    # Full recompute; the sync keeps the table current between rebuilds
+    return rebuild_project_financials()
+
+@router.get("/projects/financials/period")
+def projects_financials_period(
+    request: Request,
+    month_from: Optional[str] = Query(None, description="YYYY-MM, defaults to 11 months before month_to"),
+    month_to: Optional[str] = Query(None, description="YYYY-MM, defaults to the current month"),
+    status: Optional[str] = Query(None, description="Comma-separated statuses"),
+    pm_id: Optional[int] = None,
+    crew_id: Optional[int] = None,
+    user=Depends(get_current_user),
+    _etag=Depends(conditional_get),
+):
+    # Income/cost by transaction date, answered from project_financials_monthly
+    filters = {
+        "status": [x.strip() for x in status.split(",")] if status else None,
+        "pm_id": pm_id,
+        "crew_id": crew_id,
     }
+    try:
+        return cached_json(
+            request,
+            "financials_period",
+            lambda: get_period_financials(filters, month_from=month_from, month_to=month_to),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/schedule")
-def schedule(
-    week_start: Optional[str] = Query(None, description="YYYY-MM-DD (Monday preferred)"),
+@router.get("/projects/financials/monthly")
+def projects_financials_monthly(
+    request: Request,
+    by: str = Query("all", description="all, project, pm or crew"),
+    id: Optional[int] = Query(None, description="qbo_customer_id, project manager id or crew id"),
+    month_from: Optional[str] = Query(None, description="YYYY-MM"),
+    month_to: Optional[str] = Query(None, description="YYYY-MM"),
     user=Depends(get_current_user),
+    _etag=Depends(conditional_get),
 ):
-    """
-    Returns:
-      - active work crews
-      - project assignments (primary crew + primary PM) that overlap the requested week
-    Frontend expands each assignment across days between start_date/end_date.
-    """
+    try:
+        return cached_json(
+            request,
+            "financials_monthly",
+            lambda: get_monthly_series(by=by, id=id, month_from=month_from, month_to=month_to),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    def parse_ymd(s: str) -> date:
-        return datetime.strptime(s, "%Y-%m-%d").date()
+@router.get("/projects/analytics")
+def projects_analytics(
+    request: Request,
+    status: Optional[str] = Query(None, description="Comma-separated statuses"),
+    z: float = Query(OUTLIER_Z, gt=0, description="z-score cutoff for cost overrun outliers"),
+    outliers: int = Query(OUTLIER_LIMIT, ge=0, le=500, description="Max outliers returned"),
+    user=Depends(get_current_user),
+    _etag=Depends(conditional_get),
+):
+    # Portfolio distributions from NumPy columns cached per data version
+    statuses = [x.strip() for x in status.split(",")] if status else None
+    return cached_json(
+        request,
+        "projects_analytics",
+        lambda: get_portfolio_analytics(statuses, z_threshold=z, outlier_limit=outliers),
+    )
 
-    def monday_of(d: date) -> date:
-        return d - timedelta(days=d.weekday())  # Monday=0
+@router.get("/projects")
+async def projects(
+    request: Request,
+    sort: Optional[str] = Query(None, description="Column to sort by, e.g. total_profit"),
+    direction: Optional[str] = Query(None, description="asc or desc"),
+    limit: int = Query(PAGE_SIZE_MAX, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    status: Optional[str] = Query(None, description="Comma-separated statuses"),
+    pm_id: Optional[int] = None,
+    crew_id: Optional[int] = None,
+    needs_assignment: Optional[bool] = None,
+    start_from: Optional[date] = None,
+    start_to: Optional[date] = None,
+    end_from: Optional[date] = None,
+    end_to: Optional[date] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    updated_from: Optional[date] = None,
+    updated_to: Optional[date] = None,
+    format: Optional[str] = Query(None, description="columns for the compact columnar shape"),
+    user=Depends(get_current_user_async),
+    _etag=Depends(conditional_get_async),
+):
+    # summary covers every project matching the filters, not just this page.
+    # Accept: application/x-ndjson streams the page row by row instead.
+    filters = {
+        "status": [x.strip() for x in status.split(",")] if status else None,
+        "pm_id": pm_id,
+        "crew_id": crew_id,
+        "needs_assignment": needs_assignment,
+        "start_from": start_from,
+        "start_to": start_to,
+        "end_from": end_from,
+        "end_to": end_to,
+        "created_from": created_from,
+        "created_to": created_to,
+        "updated_from": updated_from,
+        "updated_to": updated_to,
+    }
+    async def build(bind):
+        page = await query_projects_async(bind, filters, sort=sort, direction=direction, limit=limit, cursor=cursor)
+        return shape(page, "projects", format)
 
-    # Determine week start (Monday)
-    today = date.today()
-    ws = monday_of(today) if not week_start else monday_of(parse_ymd(week_start))
-    we = ws + timedelta(days=6)
+    try:
+        format = check_format(format)
+        if wants_ndjson(request):
+            # The stream itself is sync (server-side cursor); set it up off the loop
+            lines = await run_in_threadpool(
+                stream_projects, filters, sort=sort, direction=direction, limit=limit, cursor=cursor
+            )
+            return await run_in_threadpool(ndjson_response, request, lines)
+        return await cached_json_async(request, "projects", build)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # 1) Load crews (active) in a stable order
-    crews_sql = text("""
+# Schedule: active crews in a stable order
+SCHEDULE_CREWS_SQL = text("""
       SELECT id, name, code, parent_id, is_active, sort_order
       FROM myapp.work_crews
       WHERE is_active = 1
@@ -346,14 +362,14 @@ def schedule(
         parent_id IS NOT NULL,
         sort_order,
         id
-    """)
-
-    # 2) Load assignments that overlap the week
-    # - projects table has: start_date, end_date, status, qbo_customer_id
-    # - primary crew from project_work_crews
-    # - primary pm from project_project_managers
-    # - project name from qbo_customers.display_name
-    assignments_sql = text("""
+""")
+
+# Schedule: assignments that overlap the week
+# - projects table has: start_date, end_date, status, qbo_customer_id
+# - primary crew from project_work_crews
+# - primary pm from project_project_managers
+# - project name from qbo_customers.display_name
+SCHEDULE_ASSIGNMENTS_SQL = text("""
       SELECT
         p.id AS project_id,
         p.start_date,
@@ -397,47 +413,75 @@ def schedule(
         AND p.end_date >= :week_start
 
       ORDER BY p.start_date, p.id
-    """)
+""")
 
-    with engine.connect() as conn:
-        crews_rows = conn.execute(crews_sql).mappings().all()
-        assignment_rows = conn.execute(
-            assignments_sql,
-            {"week_start": ws.isoformat(), "week_end": we.isoformat()},
-        ).mappings().all()
-
-    crews = [dict(r) for r in crews_rows]
-
-    assignments = []
-    for r in assignment_rows:
-        row = dict(r)
-        # parse arrays
-        for k in ("work_crew_codes", "pm_initials"):
-            v = row.get(k)
-            if v is None:
-                row[k] = []
-            elif isinstance(v, (list, tuple)):
-                row[k] = list(v)
-            elif isinstance(v, (bytes, bytearray)):
-                try:
-                    row[k] = json.loads(v.decode("utf-8"))
-                except Exception:
+@router.get("/schedule")
+def schedule(
+    request: Request,
+    week_start: Optional[str] = Query(None, description="YYYY-MM-DD (Monday preferred)"),
+    user=Depends(get_current_user),
+    _etag=Depends(conditional_get),
+):
+    """
+    Returns:
+      - active work crews
+      - project assignments (primary crew + primary PM) that overlap the requested week
+    Frontend expands each assignment across days between start_date/end_date.
+    """
+
+    def parse_ymd(s: str) -> date:
+        return datetime.strptime(s, "%Y-%m-%d").date()
+
+    def monday_of(d: date) -> date:
+        return d - timedelta(days=d.weekday())  # Monday=0
+
+    # Determine week start (Monday)
+    today = date.today()
+    ws = monday_of(today) if not week_start else monday_of(parse_ymd(week_start))
+    we = ws + timedelta(days=6)
+
+    def build():
+        with read_engine().connect() as conn:
+            crews_rows = conn.execute(SCHEDULE_CREWS_SQL).mappings().all()
+            assignment_rows = conn.execute(
+                SCHEDULE_ASSIGNMENTS_SQL,
+                {"week_start": ws.isoformat(), "week_end": we.isoformat()},
+            ).mappings().all()
+
+        crews = [dict(r) for r in crews_rows]
+
+        assignments = []
+        for r in assignment_rows:
+            row = dict(r)
+            # parse arrays
+            for k in ("work_crew_codes", "pm_initials"):
+                v = row.get(k)
+                if v is None:
                     row[k] = []
-            elif isinstance(v, str):
-                try:
-                    row[k] = json.loads(v)
-                except Exception:
+                elif isinstance(v, (list, tuple)):
+                    row[k] = list(v)
+                elif isinstance(v, (bytes, bytearray)):
+                    try:
+                        row[k] = json.loads(v.decode("utf-8"))
+                    except Exception:
+                        row[k] = []
+                elif isinstance(v, str):
+                    try:
+                        row[k] = json.loads(v)
+                    except Exception:
+                        row[k] = []
+                else:
                     row[k] = []
-            else:
-                row[k] = []
-        assignments.append(row)
+            assignments.append(row)
 
-    return {
-        "week_start": ws.isoformat(),
-        "week_end": we.isoformat(),
-        "crews": crews,
-        "assignments": assignments,
-    }
+        return {
+            "week_start": ws.isoformat(),
+            "week_end": we.isoformat(),
+            "crews": crews,
+            "assignments": assignments,
+        }
+
+    return cached_json(request, "schedule", build)
 
 @router.post("/projects/{qbo_customer_id}/files")
 async def upload_project_file(
@@ -466,6 +510,7 @@ async def upload_project_file(
         raise HTTPException(status_code=400, detail="File too large (max 10 MB)")
 
     from app.db import engine
+    data_version_init_table()
     with engine.begin() as conn:
         project_id = ensure_project_row_for_qbo_customer(conn, qbo_customer_id)
 
@@ -511,6 +556,7 @@ async def upload_project_file(
         })
 
         file_id = conn.execute(text("SELECT LAST_INSERT_ID()")).scalar()
+        bump_data_version(conn)
 
     return {
         "ok": True,
@@ -528,7 +574,16 @@ async def upload_project_file(
 
 
 @router.get("/projects/{qbo_customer_id}/files")
-def list_project_files(qbo_customer_id: int, user=Depends(get_current_user)):
+def list_project_files(
+    qbo_customer_id: int,
+    format: Optional[str] = Query(None, description="columns for the compact columnar shape"),
+    user=Depends(get_current_user),
+):
+    try:
+        format = check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     with engine.connect() as conn:
         rows = conn.execute(text("""
             SELECT
@@ -553,4 +608,4 @@ def list_project_files(qbo_customer_id: int, user=Depends(get_current_user)):
         d["url"] = signed_file_url(d["s3_key"])
         files.append(d)
 
-    return {"files": files}
+    return FastJSONResponse(shape({"files": files}, "files", format))
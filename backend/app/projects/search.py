@@ -0,0 +1,562 @@
+import heapq
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import bindparam, text
+
+from app.changefeed import CHANGEFEED_READ_LAG_SECONDS
+from app.data_version import data_version_init_table, read_data_version
+from app.db import engine
+from app.qbo.service import qbo_init_tables
+
+# Typeahead search over projects and customers. The index lives in memory:
+# name words post to the entries that contain them, and each word's 1- and
+# 2-character prefixes and trigrams post to the word, so a query token is
+# matched against the vocabulary and only the hits' entries are ranked. It
+# follows the data version: changefeed rows for customers and assignment
+# saves refresh just those entries, a bump of the app counter rechecks the
+# PM/crew names, and a full rebuild runs at most every
+# SEARCH_INDEX_TTL_SECONDS as a backstop.
+SEARCH_INDEX_TTL_SECONDS = float(os.getenv("SEARCH_INDEX_TTL_SECONDS", "3600"))
+SEARCH_RECHECK_SECONDS = 1.0
+SEARCH_LIMIT = 10
+SEARCH_LIMIT_MAX = 50
+SEARCH_KINDS = ("project", "customer", "all")
+
+# field -> weight; a hit on the project's own name beats its customer's,
+# which beats a PM or crew name
+FIELD_WEIGHTS = {"name": 4, "customer": 2, "pm": 1, "crew": 1}
+
+# Change types that can alter what the index shows
+_INDEXED_CHANGES = ("Customer", "ProjectAssignment")
+
+_WORD_SPLIT = re.compile(r"[\W_]+")
+
+
+def normalize(value) -> tuple[str, ...]:
+    """Lowercase, accent-free words: 'Café-Renovación #2' -> ('cafe', 'renovacion', '2')."""
+    value = str(value or "")
+    if value.isascii():
+        value = value.lower()
+    else:
+        value = unicodedata.normalize("NFKD", value)
+        value = "".join(ch for ch in value if not unicodedata.combining(ch)).casefold()
+    return tuple(w for w in _WORD_SPLIT.split(value) if w)
+
+
+# Customer, PM and crew names repeat across many entries
+_normalize_shared = lru_cache(maxsize=8192)(normalize)
+
+
+@lru_cache(maxsize=65536)
+def _word_keys(word: str) -> frozenset[str]:
+    keys = {"^" + word[:1], "^" + word[:2]}
+    keys.update(word[i:i + 3] for i in range(len(word) - 2))
+    return frozenset(keys)
+
+
+def _token_keys(token: str) -> list[str]:
+    # Short tokens match word prefixes only; longer ones match anywhere
+    if len(token) <= 2:
+        return ["^" + token]
+    return [token[i:i + 3] for i in range(len(token) - 2)]
+
+
+# -----------------------------
+# Loading
+# -----------------------------
+
+_DOCS_SQL = """
+    SELECT
+      c.id,
+      c.qbo_id,
+      c.display_name,
+      c.active,
+      c.is_project,
+      parent.display_name AS customer_name,
+      ip.status
+    FROM myapp.qbo_customers c
+    LEFT JOIN myapp.qbo_customers parent
+      ON parent.qbo_id = c.parent_qbo_id
+    LEFT JOIN myapp.projects ip
+      ON ip.qbo_customer_id = c.id
+    {where}
+"""
+
+_PMS_SQL = """
+    SELECT ip.qbo_customer_id, ppm.project_manager_id
+    FROM myapp.project_project_managers ppm
+    JOIN myapp.projects ip
+      ON ip.id = ppm.project_id
+    WHERE ppm.unassigned_at IS NULL {filter}
+    ORDER BY ppm.is_primary DESC, ppm.project_manager_id
+"""
+
+_CREWS_SQL = """
+    SELECT ip.qbo_customer_id, pwc.work_crew_id
+    FROM myapp.project_work_crews pwc
+    JOIN myapp.projects ip
+      ON ip.id = pwc.project_id
+    WHERE pwc.unassigned_at IS NULL {filter}
+    ORDER BY pwc.is_primary DESC, pwc.work_crew_id
+"""
+
+_PM_NAMES_SQL = text("""
+    SELECT id, TRIM(CONCAT(COALESCE(first_name,''), ' ', COALESCE(last_name,''))) AS name
+    FROM myapp.project_managers
+""")
+
+_CREW_NAMES_SQL = text("""
+    SELECT id, name FROM myapp.work_crews
+""")
+
+_CHANGED_SQL = text("""
+    SELECT DISTINCT
+      CASE WHEN entity_type = 'Customer' THEN entity_id ELSE project_qbo_id END AS qbo_id
+    FROM myapp.changefeed
+    WHERE id > :cursor
+      AND id <= :head
+      AND entity_type IN :types
+""").bindparams(bindparam("types", expanding=True))
+
+_SAFE_CURSOR_SQL = text("""
+    SELECT MAX(id)
+    FROM myapp.changefeed
+    WHERE id <= :head
+      AND created_at <= UTC_TIMESTAMP() - INTERVAL :lag SECOND
+""")
+
+
+def _load_docs(conn, qbo_ids: Optional[list[str]] = None) -> list[dict]:
+    """
+    Customer rows with their active PM/crew ids (primary first). With
+    qbo_ids, only those customers and the projects under them, since a
+    renamed customer shows up in its projects' entries.
+    """
+    if qbo_ids is None:
+        docs_stmt = text(_DOCS_SQL.format(where=""))
+        docs_params: dict = {}
+    else:
+        docs_stmt = text(_DOCS_SQL.format(
+            where="WHERE c.qbo_id IN :qbo_ids OR c.parent_qbo_id IN :qbo_ids",
+        )).bindparams(bindparam("qbo_ids", expanding=True))
+        docs_params = {"qbo_ids": qbo_ids}
+
+    rows = [dict(r) for r in conn.execute(docs_stmt, docs_params).mappings().all()]
+    by_id = {r["id"]: r for r in rows}
+    for r in rows:
+        r["pm_ids"], r["crew_ids"] = [], []
+    if not rows:
+        return rows
+
+    for sql, key in ((_PMS_SQL, "pm_ids"), (_CREWS_SQL, "crew_ids")):
+        if qbo_ids is None:
+            stmt, params = text(sql.format(filter="")), {}
+        else:
+            stmt = text(sql.format(filter="AND ip.qbo_customer_id IN :cids")).bindparams(
+                bindparam("cids", expanding=True),
+            )
+            params = {"cids": list(by_id)}
+        for cid, member_id in conn.execute(stmt, params).all():
+            if cid in by_id:
+                by_id[cid][key].append(member_id)
+    return rows
+
+
+def _load_names(conn) -> tuple[dict, dict]:
+    pms = {r[0]: r[1] or "" for r in conn.execute(_PM_NAMES_SQL).all()}
+    crews = {r[0]: r[1] or "" for r in conn.execute(_CREW_NAMES_SQL).all()}
+    return pms, crews
+
+
+# -----------------------------
+# Index
+# -----------------------------
+
+class _Doc:
+    __slots__ = (
+        "id", "qbo_id", "kind", "name", "customer_name", "active", "status",
+        "pm_ids", "crew_ids", "name_text", "terms",
+    )
+
+    def __init__(self, row: dict, pm_names: dict, crew_names: dict):
+        self.id = int(row["id"])
+        self.qbo_id = row["qbo_id"]
+        self.kind = "project" if row["is_project"] else "customer"
+        self.name = row["display_name"] or ""
+        self.customer_name = row["customer_name"]
+        self.active = bool(row["active"])
+        self.status = row["status"]
+        self.pm_ids = list(row["pm_ids"])
+        self.crew_ids = list(row["crew_ids"])
+
+        name_words = normalize(self.name)
+        self.name_text = " ".join(name_words)
+        fields = [("name", name_words), ("customer", _normalize_shared(self.customer_name))]
+        fields += [("pm", _normalize_shared(pm_names.get(i))) for i in self.pm_ids]
+        fields += [("crew", _normalize_shared(crew_names.get(i))) for i in self.crew_ids]
+
+        # word -> (weight, field) of the heaviest field it appears in
+        self.terms: dict[str, tuple[int, str]] = {}
+        for field, words in fields:
+            weight = FIELD_WEIGHTS[field]
+            for w in words:
+                if w not in self.terms or self.terms[w][0] < weight:
+                    self.terms[w] = (weight, field)
+
+    def row(self) -> dict:
+        return {
+            "id": self.id,
+            "qbo_id": self.qbo_id,
+            "display_name": self.name,
+            "active": self.active,
+            "is_project": self.kind == "project",
+            "customer_name": self.customer_name,
+            "status": self.status,
+            "pm_ids": self.pm_ids,
+            "crew_ids": self.crew_ids,
+        }
+
+
+class SearchSnapshot:
+    """
+    One consistent index. Words post to the entries that contain them;
+    prefix and trigram keys post to the words, so a query token is matched
+    against the (small) vocabulary first. Never mutated once published;
+    replace() copies what it changes.
+    """
+
+    __slots__ = ("docs", "words", "keys", "by_qbo_id", "pm_names", "crew_names")
+
+    def __init__(self, docs, words, keys, by_qbo_id, pm_names, crew_names):
+        self.docs: dict[int, _Doc] = docs
+        self.words: dict[str, dict[int, tuple[int, str]]] = words
+        self.keys: dict[str, frozenset] = keys
+        self.by_qbo_id: dict[str, int] = by_qbo_id
+        self.pm_names: dict[int, str] = pm_names
+        self.crew_names: dict[int, str] = crew_names
+
+    @classmethod
+    def build(cls, rows: list[dict], pm_names: dict, crew_names: dict) -> "SearchSnapshot":
+        docs, by_qbo_id = {}, {}
+        words = defaultdict(dict)
+        for row in rows:
+            doc = _Doc(row, pm_names, crew_names)
+            docs[doc.id] = doc
+            by_qbo_id[doc.qbo_id] = doc.id
+            for w, hit in doc.terms.items():
+                words[w][doc.id] = hit
+
+        keys = defaultdict(set)
+        for w in words:
+            for k in _word_keys(w):
+                keys[k].add(w)
+        return cls(docs, dict(words), {k: frozenset(v) for k, v in keys.items()}, by_qbo_id, pm_names, crew_names)
+
+    def replace(self, rows: list[dict], removed_ids: set, pm_names: dict, crew_names: dict) -> "SearchSnapshot":
+        """New snapshot with `rows` (re)indexed and `removed_ids` dropped."""
+        docs = dict(self.docs)
+        by_qbo_id = dict(self.by_qbo_id)
+        touched: dict[str, dict] = {}
+
+        def posting(w: str) -> dict:
+            if w not in touched:
+                touched[w] = dict(self.words.get(w, {}))
+            return touched[w]
+
+        for doc_id in set(removed_ids) | {int(r["id"]) for r in rows}:
+            old = docs.pop(doc_id, None)
+            if old is not None:
+                by_qbo_id.pop(old.qbo_id, None)
+                for w in old.terms:
+                    posting(w).pop(doc_id, None)
+
+        for row in rows:
+            doc = _Doc(row, pm_names, crew_names)
+            docs[doc.id] = doc
+            by_qbo_id[doc.qbo_id] = doc.id
+            for w, hit in doc.terms.items():
+                posting(w)[doc.id] = hit
+
+        words = dict(self.words)
+        new_words, gone_words = set(), set()
+        for w, ids in touched.items():
+            if ids:
+                if w not in words:
+                    new_words.add(w)
+                words[w] = ids
+            elif words.pop(w, None) is not None:
+                gone_words.add(w)
+
+        keys = self.keys
+        if new_words or gone_words:
+            keys = dict(keys)
+            changed = defaultdict(lambda: (set(), set()))
+            for w in new_words:
+                for k in _word_keys(w):
+                    changed[k][0].add(w)
+            for w in gone_words:
+                for k in _word_keys(w):
+                    changed[k][1].add(w)
+            for k, (add, drop) in changed.items():
+                ws = (keys.get(k, frozenset()) - drop) | add
+                if ws:
+                    keys[k] = frozenset(ws)
+                else:
+                    keys.pop(k, None)
+        return SearchSnapshot(docs, words, keys, by_qbo_id, pm_names, crew_names)
+
+    def _token_hits(self, token: str) -> dict[int, tuple[int, str]]:
+        """
+        doc id -> (score, field) for one query token: exact word 3, word
+        prefix 2, inside a word 1 (3+ characters only), times the field
+        weight; the best hit per entry counts.
+        """
+        lists = sorted((self.keys.get(k, frozenset()) for k in _token_keys(token)), key=len)
+        vocab = set(lists[0])
+        for ws in lists[1:]:
+            vocab &= ws
+
+        hits: dict[int, tuple[int, str]] = {}
+        for w in vocab:
+            if w == token:
+                q = 3
+            elif w.startswith(token):
+                q = 2
+            elif len(token) >= 3 and token in w:
+                q = 1
+            else:
+                continue
+            for doc_id, (weight, field) in self.words[w].items():
+                score = q * weight
+                prev = hits.get(doc_id)
+                if prev is None or prev[0] < score:
+                    hits[doc_id] = (score, field)
+        return hits
+
+    def search(self, q: str, kind: str = "project", limit: int = SEARCH_LIMIT, include_inactive: bool = False) -> dict:
+        limit = max(1, min(int(limit), SEARCH_LIMIT_MAX))
+        tokens = normalize(q)
+        if not tokens:
+            return {"q": q, "results": [], "total_matches": 0}
+
+        # Every token must hit; intersect from the rarest
+        per_token = [self._token_hits(t) for t in dict.fromkeys(tokens)]
+        ids = set(min(per_token, key=len))
+        for hits in per_token:
+            ids.intersection_update(hits)
+            if not ids:
+                break
+
+        phrase = " ".join(tokens)
+        name_bonus = FIELD_WEIGHTS["name"] * 2
+        scored = []
+        for doc_id in ids:
+            doc = self.docs[doc_id]
+            if kind != "all" and doc.kind != kind:
+                continue
+            if not include_inactive and not doc.active:
+                continue
+            score = sum(hits[doc_id][0] for hits in per_token) + doc.active
+            if doc.name_text.startswith(phrase):
+                score += name_bonus
+            scored.append((-score, len(doc.name), doc.name.casefold(), doc_id))
+
+        results = []
+        for neg_score, _, _, doc_id in heapq.nsmallest(limit, scored):
+            doc = self.docs[doc_id]
+            results.append({
+                "qbo_customer_id": doc.id,
+                "qbo_id": doc.qbo_id,
+                "kind": doc.kind,
+                "display_name": doc.name,
+                "customer_name": doc.customer_name,
+                "active": doc.active,
+                "status": doc.status,
+                "project_managers": [self.pm_names[i] for i in doc.pm_ids if self.pm_names.get(i)],
+                "work_crews": [self.crew_names[i] for i in doc.crew_ids if self.crew_names.get(i)],
+                "matched": list(dict.fromkeys(hits[doc_id][1] for hits in per_token)),
+                "score": -neg_score,
+            })
+        return {"q": q, "results": results, "total_matches": len(scored)}
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snap: Optional[SearchSnapshot] = None
+        self.version: Optional[tuple] = None   # (change_id, counter) the index reflects
+        self.cursor = 0                        # changefeed rows up to here are applied for good
+        self.built_at = 0.0
+        self.checked_at = 0.0
+        self.full_builds = 0
+        self.incremental_updates = 0
+        self.docs_refreshed = 0
+
+    # --- freshness ---
+
+    def _fresh(self, version: Optional[tuple]) -> bool:
+        now = time.monotonic()
+        if self._snap is None or now - self.built_at >= SEARCH_INDEX_TTL_SECONDS:
+            return False
+        if version is not None and tuple(version[:2]) != self.version:
+            return False
+        # Changefeed rows inside the read lag may have a lower-id neighbour
+        # that commits late; re-read that window until it ages out
+        if self.cursor < self.version[0] and now - self.checked_at >= SEARCH_RECHECK_SECONDS:
+            return False
+        return True
+
+    def ensure_current(self, version: Optional[tuple] = None, force: bool = False) -> SearchSnapshot:
+        """
+        Brings the index up to the database. `version` (the request's
+        current_version()) skips the version probe when it already matches;
+        `force` always probes.
+        """
+        if not force and self._fresh(version):
+            return self._snap
+
+        with self._lock:
+            data_version_init_table()
+            qbo_init_tables()
+            with engine.connect() as conn:
+                version = read_data_version(conn)
+            if self._snap is not None and self.version == version and self._fresh(None):
+                return self._snap
+
+            with engine.connect() as conn:
+                if self._snap is None or time.monotonic() - self.built_at >= SEARCH_INDEX_TTL_SECONDS:
+                    self._full_build(conn)
+                else:
+                    self._catch_up(conn, version)
+            return self._snap
+
+    def refresh(self) -> Optional[dict]:
+        """Catches up after a write (sync, assignment save) if the index is in use."""
+        if self._snap is None:
+            return None
+        self.ensure_current(force=True)
+        return self.stats()
+
+    # --- updates (caller holds the lock) ---
+
+    def _full_build(self, conn) -> None:
+        # Read the version in the same snapshot as the rows, as the rollup does
+        conn.execute(text("START TRANSACTION WITH CONSISTENT SNAPSHOT"))
+        version = read_data_version(conn)
+        pm_names, crew_names = _load_names(conn)
+        rows = _load_docs(conn)
+        cursor = self._safe_cursor(conn, version[0])
+        conn.rollback()
+
+        self._snap = SearchSnapshot.build(rows, pm_names, crew_names)
+        self.version = version
+        self.cursor = cursor
+        self.built_at = self.checked_at = time.monotonic()
+        self.full_builds += 1
+
+    def _catch_up(self, conn, version: tuple) -> None:
+        snap = self._snap
+        pm_names, crew_names = snap.pm_names, snap.crew_names
+        names_changed = False
+        doc_ids: set = set()
+
+        # Counter moved (any write, PM/crew edits included): names may have changed
+        if version[1] != self.version[1]:
+            new_pms, new_crews = _load_names(conn)
+            changed_pms = {i for i in set(new_pms) | set(pm_names) if new_pms.get(i) != pm_names.get(i)}
+            changed_crews = {i for i in set(new_crews) | set(crew_names) if new_crews.get(i) != crew_names.get(i)}
+            if changed_pms or changed_crews:
+                names_changed = True
+                pm_names, crew_names = new_pms, new_crews
+                doc_ids.update(
+                    d.id for d in snap.docs.values()
+                    if changed_pms.intersection(d.pm_ids) or changed_crews.intersection(d.crew_ids)
+                )
+
+        qbo_ids = [
+            r[0] for r in conn.execute(_CHANGED_SQL, {
+                "cursor": self.cursor, "head": version[0], "types": list(_INDEXED_CHANGES),
+            }).all()
+            if r[0]
+        ]
+        cursor = self._safe_cursor(conn, version[0])
+
+        rows: list[dict] = []
+        removed: set = set()
+        if qbo_ids:
+            rows = _load_docs(conn, qbo_ids)
+            found = {r["qbo_id"] for r in rows}
+            removed = {snap.by_qbo_id[q] for q in qbo_ids if q not in found and q in snap.by_qbo_id}
+        # Name-only refreshes reuse the indexed rows; no need to re-read them
+        loaded = {r["id"] for r in rows}
+        rows += [snap.docs[i].row() for i in doc_ids - loaded if i in snap.docs]
+
+        if rows or removed or names_changed:
+            self._snap = snap.replace(rows, removed, pm_names, crew_names)
+            self.incremental_updates += 1
+            self.docs_refreshed += len(rows) + len(removed)
+        self.version = version
+        self.cursor = max(self.cursor, cursor)
+        self.checked_at = time.monotonic()
+
+    def _safe_cursor(self, conn, head: int) -> int:
+        row = conn.execute(_SAFE_CURSOR_SQL, {"head": head, "lag": CHANGEFEED_READ_LAG_SECONDS}).first()
+        return int(row[0] or 0) if row else 0
+
+    # --- queries ---
+
+    def search(
+        self,
+        q: str,
+        kind: str = "project",
+        limit: int = SEARCH_LIMIT,
+        include_inactive: bool = False,
+        version: Optional[tuple] = None,
+    ) -> dict:
+        if kind not in SEARCH_KINDS:
+            raise ValueError(f"kind must be one of: {', '.join(SEARCH_KINDS)}")
+        if not normalize(q):
+            return {"q": q, "results": [], "total_matches": 0}
+        return self.ensure_current(version).search(q, kind, limit, include_inactive)
+
+    def stats(self) -> dict:
+        snap = self._snap
+        return {
+            "built": snap is not None,
+            "docs": len(snap.docs) if snap else 0,
+            "words": len(snap.words) if snap else 0,
+            "version": list(self.version) if self.version else None,
+            "cursor": self.cursor,
+            "full_builds": self.full_builds,
+            "incremental_updates": self.incremental_updates,
+            "docs_refreshed": self.docs_refreshed,
+        }
+
+
+search_index = SearchIndex()
+
+
+def search_projects(
+    q: str,
+    kind: str = "project",
+    limit: int = SEARCH_LIMIT,
+    include_inactive: bool = False,
+    version: Optional[tuple] = None,
+) -> dict:
+    """Top `limit` ranked matches for a typeahead query; see SearchIndex.search."""
+    return search_index.search(q, kind=kind, limit=limit, include_inactive=include_inactive, version=version)
+
+
+def refresh_search_index() -> Optional[dict]:
+    # Best effort: searches catch up on their own when this fails
+    try:
+        return search_index.refresh()
+    except Exception:
+        return None
@@ -1,7 +1,14 @@
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 from app.db import engine
-from datetime import datetime
-from typing import Any, Dict
+from app.changefeed import changefeed_init_table, emit_changes
+from app.response_cache import response_cache
+from app.qbo.service import qbo_init_tables
+from app.projects.financials import FINANCIAL_ENTITIES
+from app.projects.rollup import decode_cursor, encode_cursor
+from app.projects.search import refresh_search_index
+from app.replica import read_engine
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 
 ALLOWED_STATUS = {"not_started", "in_progress", "completed"}
 
@@ -32,6 +39,33 @@ def ensure_project_row_for_qbo_customer(conn, qbo_customer_id: int) -> int:
     new_id = conn.execute(text("SELECT LAST_INSERT_ID()")).scalar()
     return int(new_id)
 
+# Per-project lookups behind the assignment bundle
+BUNDLE_PROJECT_SQL = text("""
+    SELECT id, qbo_customer_id, start_date, end_date, status
+    FROM projects
+    WHERE qbo_customer_id = :cid
+    LIMIT 1
+""")
+
+BUNDLE_ACTIVE_PMS_SQL = text("""
+    SELECT project_manager_id, is_primary
+    FROM project_project_managers
+    WHERE project_id = :pid AND unassigned_at IS NULL
+    ORDER BY is_primary DESC, project_manager_id
+""")
+
+BUNDLE_ACTIVE_CREWS_SQL = text("""
+    SELECT pwc.work_crew_id, pwc.is_primary
+    FROM project_work_crews pwc
+    JOIN work_crews wc
+      ON wc.id = pwc.work_crew_id
+    WHERE pwc.project_id = :pid
+      AND pwc.unassigned_at IS NULL
+      AND wc.is_active = 1
+      AND wc.parent_id IS NOT NULL
+    ORDER BY pwc.is_primary DESC, pwc.work_crew_id
+""")
+
 def get_assignment_bundle(qbo_customer_id: int):
     with engine.connect() as conn:
         # QBO project info
@@ -45,12 +79,7 @@ def get_assignment_bundle(qbo_customer_id: int):
             raise ValueError("Unknown qbo_customer_id")
 
         # Project layer (may not exist yet)
-        proj = conn.execute(text("""
-            SELECT id, qbo_customer_id, start_date, end_date, status
-            FROM projects
-            WHERE qbo_customer_id = :cid
-            LIMIT 1
-        """), {"cid": qbo_customer_id}).mappings().first()
+        proj = conn.execute(BUNDLE_PROJECT_SQL, {"cid": qbo_customer_id}).mappings().first()
 
         project_id = int(proj["id"]) if proj else None
 
@@ -58,24 +87,9 @@ def get_assignment_bundle(qbo_customer_id: int):
         pms_active = []
         crews_active = []
         if project_id:
-            pms_active = conn.execute(text("""
-                SELECT project_manager_id, is_primary
-                FROM project_project_managers
-                WHERE project_id = :pid AND unassigned_at IS NULL
-                ORDER BY is_primary DESC, project_manager_id
-            """), {"pid": project_id}).mappings().all()
-
-            crews_active = conn.execute(text("""
-                SELECT pwc.work_crew_id, pwc.is_primary
-                FROM project_work_crews pwc
-                JOIN work_crews wc
-                  ON wc.id = pwc.work_crew_id
-                WHERE pwc.project_id = :pid
-                  AND pwc.unassigned_at IS NULL
-                  AND wc.is_active = 1
-                  AND wc.parent_id IS NOT NULL
-                ORDER BY pwc.is_primary DESC, pwc.work_crew_id
-            """), {"pid": project_id}).mappings().all()
+            pms_active = conn.execute(BUNDLE_ACTIVE_PMS_SQL, {"pid": project_id}).mappings().all()
+
+            crews_active = conn.execute(BUNDLE_ACTIVE_CREWS_SQL, {"pid": project_id}).mappings().all()
 
         # Options lists
         pms = conn.execute(text("""
@@ -134,6 +148,7 @@ def save_project_assignment(req, actor_user_id: int) -> Dict[str, Any]:
     start_date = (req.start_date or "").strip() or None
     end_date = (req.end_date or "").strip() or None
 
+    changefeed_init_table()
     with engine.begin() as conn:
         project_id = ensure_project_row_for_qbo_customer(conn, int(req.qbo_customer_id))
 
@@ -260,6 +275,13 @@ def save_project_assignment(req, actor_user_id: int) -> Dict[str, Any]:
                 WHERE project_id = :pid AND unassigned_at IS NULL AND work_crew_id = :cid
             """), {"pid": project_id, "cid": primary_crew})
 
+        project_qbo_id = conn.execute(text("""
+            SELECT qbo_id FROM qbo_customers WHERE id = :cid LIMIT 1
+        """), {"cid": int(req.qbo_customer_id)}).scalar()
+        emit_changes(conn, [("ProjectAssignment", str(project_id), project_qbo_id, None)])
+
+    response_cache.clear()
+    refresh_search_index()
     return {"ok": True, "project_id": project_id}
 
 def list_project_events(qbo_customer_id: int):
@@ -278,4 +300,228 @@ def list_project_events(qbo_customer_id: int):
             LIMIT 200
         """), {"pid": int(proj["id"])}).mappings().all()
 
-    return [dict(r) for r in rows]
\ No newline at end of file
+    return [dict(r) for r in rows]
+def get_project_labor(qbo_customer_id: int):
+    # Weekly labor from qbo_time_activities only (no raw_json scans)
+    qbo_init_tables()
+    with engine.connect() as conn:
+        qbo = conn.execute(text("""
+            SELECT qbo_id FROM qbo_customers WHERE id = :cid LIMIT 1
+        """), {"cid": qbo_customer_id}).mappings().first()
+        if not qbo:
+            raise ValueError("Unknown qbo_customer_id")
+
+        weeks = conn.execute(text("""
+            SELECT
+              DATE_SUB(txn_date, INTERVAL WEEKDAY(txn_date) DAY) AS week_start,
+              SUM(COALESCE(hours, 0)) AS hours,
+              SUM(COALESCE(labor_cost, 0)) AS labor_cost,
+              SUM(COALESCE(billable_amount, 0)) AS billable_amount,
+              COUNT(DISTINCT COALESCE(employee_qbo_id, vendor_qbo_id)) AS worker_ct,
+              COUNT(*) AS entry_ct
+            FROM qbo_time_activities
+            WHERE project_qbo_id = :pqid
+              AND txn_date IS NOT NULL
+            GROUP BY week_start
+            ORDER BY week_start
+        """), {"pqid": qbo["qbo_id"]}).mappings().all()
+
+    weeks = [dict(r) for r in weeks]
+    return {
+        "project_qbo_id": qbo["qbo_id"],
+        "totals": {
+            "hours": sum((w["hours"] for w in weeks), 0),
+            "labor_cost": sum((w["labor_cost"] for w in weeks), 0),
+            "billable_amount": sum((w["billable_amount"] for w in weeks), 0),
+        },
+        "weeks": weeks,
+    }
+
+TRANSACTIONS_PAGE_SIZE = 100
+TRANSACTIONS_PAGE_MAX = 500
+
+def _transactions_filter(project_qbo_id: str, entity_types, date_from, date_to):
+    conds = ["a.project_qbo_id = :pqid"]
+    params: Dict[str, Any] = {"pqid": project_qbo_id}
+    expanding = []
+    if entity_types:
+        conds.append("a.entity_type IN :entity_types")
+        params["entity_types"] = list(entity_types)
+        expanding.append(bindparam("entity_types", expanding=True))
+    if date_from:
+        conds.append("a.txn_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        conds.append("a.txn_date <= :date_to")
+        params["date_to"] = date_to
+    return conds, params, expanding
+
+def build_transactions_totals_query(project_qbo_id: str, entity_types=None, date_from=None, date_to=None):
+    conds, params, expanding = _transactions_filter(project_qbo_id, entity_types, date_from, date_to)
+    stmt = text(f"""
+        SELECT a.entity_type,
+               COUNT(*) AS document_ct,
+               SUM(a.amount) AS amount,
+               SUM(a.balance_amt) AS balance_amt
+        FROM qbo_project_attributions a
+        WHERE {" AND ".join(conds)}
+        GROUP BY a.entity_type
+        ORDER BY a.entity_type
+    """).bindparams(*expanding)
+    return stmt, params
+
+def build_transactions_page_query(
+    project_qbo_id: str,
+    entity_types=None,
+    date_from=None,
+    date_to=None,
+    after: Optional[tuple] = None,
+    limit: int = TRANSACTIONS_PAGE_SIZE,
+):
+    """
+    One page of the project's documents, newest first, starting after the
+    (txn_date, transaction_id) key `after`. Served by idx_attr_project_date
+    (or idx_attr_project_type_date for one entity type) read backwards.
+    """
+    conds, params, expanding = _transactions_filter(project_qbo_id, entity_types, date_from, date_to)
+    if after is not None:
+        # DESC order puts undated documents last
+        after_date, params["after_id"] = after
+        if after_date is None:
+            conds.append("(a.txn_date IS NULL AND a.transaction_id < :after_id)")
+        else:
+            conds.append("""(
+                a.txn_date < :after_date
+                OR (a.txn_date = :after_date AND a.transaction_id < :after_id)
+                OR a.txn_date IS NULL
+            )""")
+            params["after_date"] = after_date
+    params["limit"] = int(limit)
+
+    stmt = text(f"""
+        SELECT
+          a.transaction_id,
+          a.entity_type,
+          t.qbo_id,
+          t.doc_number,
+          a.txn_date,
+          t.due_date,
+          t.currency_code,
+          a.amount,
+          a.balance_amt,
+          t.total_amt,
+          t.customer_qbo_id,
+          t.vendor_qbo_id,
+          v.name AS vendor_name,
+          CASE WHEN t.customer_qbo_id = a.project_qbo_id THEN 'header' ELSE 'lines' END AS attributed_by
+        FROM qbo_project_attributions a
+        JOIN qbo_transactions t ON t.id = a.transaction_id
+        LEFT JOIN qbo_vendors v ON v.realm_id = t.realm_id AND v.qbo_id = t.vendor_qbo_id
+        WHERE {" AND ".join(conds)}
+        ORDER BY a.txn_date DESC, a.transaction_id DESC
+        LIMIT :limit
+    """).bindparams(*expanding)
+    return stmt, params
+
+PROJECT_TRANSACTION_LINES_SQL = text("""
+    SELECT
+      l.transaction_id,
+      l.line_key,
+      l.detail_type,
+      l.description,
+      l.qty,
+      l.unit_price,
+      l.amount,
+      l.billable_status,
+      l.line_customer_qbo_id,
+      i.name AS item_name,
+      ac.name AS account_name
+    FROM qbo_transaction_lines l
+    LEFT JOIN qbo_items i ON i.realm_id = l.realm_id AND i.qbo_id = l.item_qbo_id
+    LEFT JOIN qbo_accounts ac ON ac.realm_id = l.realm_id AND ac.qbo_id = l.account_qbo_id
+    WHERE l.transaction_id IN :txn_ids
+      AND (l.line_customer_qbo_id = :pqid OR l.transaction_id IN :header_ids)
+    ORDER BY l.transaction_id, l.id
+""").bindparams(
+    bindparam("txn_ids", expanding=True),
+    bindparam("header_ids", expanding=True),
+)
+
+def get_project_transactions(
+    qbo_customer_id: int,
+    entity_types: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = TRANSACTIONS_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    include_lines: bool = True,
+):
+    """
+    A page of the documents behind a project's rollup with the same
+    per-project amounts (qbo_project_attributions) and, optionally, the
+    lines that make them up. Keyset pages, so deep pages cost the same as
+    the first; totals per entity type cover the whole filtered set.
+    """
+    entity_types = [e for e in (entity_types or []) if e]
+    unknown = sorted(set(entity_types) - set(FINANCIAL_ENTITIES))
+    if unknown:
+        raise ValueError(f"Unknown entity_type: {', '.join(unknown)}")
+    if date_from and date_to and date_from > date_to:
+        raise ValueError("date_from must be on or before date_to")
+    limit = max(1, min(int(limit), TRANSACTIONS_PAGE_MAX))
+
+    after = None
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        if after_date is not None:
+            try:
+                after_date = date.fromisoformat(after_date)
+            except (TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+        after = (after_date, after_id)
+
+    qbo_init_tables()
+    with read_engine().connect() as conn:
+        qbo = conn.execute(text("""
+            SELECT qbo_id FROM qbo_customers WHERE id = :cid LIMIT 1
+        """), {"cid": qbo_customer_id}).mappings().first()
+        if not qbo:
+            raise LookupError("Unknown qbo_customer_id")
+        pqid = qbo["qbo_id"]
+
+        totals = conn.execute(
+            *build_transactions_totals_query(pqid, entity_types, date_from, date_to)
+        ).mappings().all()
+
+        docs = conn.execute(
+            *build_transactions_page_query(pqid, entity_types, date_from, date_to, after, limit + 1)
+        ).mappings().all()
+        docs = [dict(r) for r in docs]
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor(docs[-1]["txn_date"], docs[-1]["transaction_id"])
+
+        if include_lines:
+            by_txn = {}
+            for d in docs:
+                d["lines"] = []
+                by_txn[d["transaction_id"]] = d
+            if docs:
+                # Header-attributed documents belong to the project whole;
+                # otherwise only its own lines count, as in the rollup
+                lines = conn.execute(PROJECT_TRANSACTION_LINES_SQL, {
+                    "pqid": pqid,
+                    "txn_ids": list(by_txn),
+                    "header_ids": [d["transaction_id"] for d in docs if d["attributed_by"] == "header"],
+                }).mappings().all()
+                for line in lines:
+                    by_txn[line["transaction_id"]]["lines"].append(dict(line))
+
+    return {
+        "project_qbo_id": pqid,
+        "totals": [dict(r) for r in totals],
+        "documents": docs,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,5 @@
+from app.qbo.service import rebuild_project_attributions
+
+if __name__ == "__main__":
+    result = rebuild_project_attributions()
+    print(result)
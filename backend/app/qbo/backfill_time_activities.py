@@ -0,0 +1,5 @@
+from app.qbo.service import backfill_time_activities_from_existing
+
+if __name__ == "__main__":
+    result = backfill_time_activities_from_existing()
+    print(result)
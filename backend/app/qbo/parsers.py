@@ -0,0 +1,477 @@
+"""
+Pure QBO payload parsers.
+
+Nothing in here touches the database: each function turns one QBO JSON
+document into row tuples whose order matches the *_FIELDS constants, so
+the sync writer can bind them and bench/bench_parsers.py can time them
+on recorded payloads.
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+SALES_TRANSACTION_ENTITIES = {
+    "Estimate",
+    "Invoice",
+    "SalesReceipt",
+    "CreditMemo",
+    "RefundReceipt",
+}
+
+CUSTOMER_FIELDS = (
+    "qbo_id", "display_name", "email",
+    "job", "active", "is_project", "parent_qbo_id",
+    "balance_with_jobs", "meta_create_time", "meta_last_updated_time",
+    "raw",
+)
+
+TRANSACTION_FIELDS = (
+    "realm_id", "entity_type", "qbo_id",
+    "customer_qbo_id", "vendor_qbo_id",
+    "txn_date", "due_date", "doc_number", "currency_code", "total_amt", "balance_amt",
+    "sales_term_name",
+    "sync_token", "meta_create_time", "meta_last_updated_time",
+    "raw",
+)
+
+TRANSACTION_LINE_FIELDS = (
+    "realm_id",
+    "line_key",
+    "detail_type", "description", "amount", "cost_amount",
+    "line_customer_qbo_id", "account_qbo_id", "item_qbo_id",
+    "class_qbo_id", "department_qbo_id", "vendor_qbo_id",
+    "qty", "unit_price", "billable_status",
+    "raw",
+)
+
+SALES_LINE_FIELDS = (
+    "realm_id",
+    "transaction_entity_type", "transaction_qbo_id", "project_customer_qbo_id",
+    "line_num", "line_key", "parent_line_key", "line_level",
+    "detail_type", "description",
+    "group_item_qbo_id", "group_item_name",
+    "item_qbo_id", "item_name", "account_qbo_id",
+    "qty", "unit_price", "amount", "cost_amount", "service_date",
+    "linked_txn_qbo_id", "linked_txn_type", "linked_txn_line_key",
+    "raw",
+)
+
+TIME_ACTIVITY_FIELDS = (
+    "realm_id", "qbo_id", "txn_date", "name_of",
+    "employee_qbo_id", "vendor_qbo_id", "project_qbo_id",
+    "item_qbo_id", "class_qbo_id", "billable_status",
+    "hours", "hourly_rate", "cost_rate", "labor_cost", "billable_amount",
+    "description", "meta_last_updated_time",
+)
+
+# Name-list entities referenced by line item/account/class/department/vendor ids.
+# Every row starts with the common columns and ends with the meta/raw tail.
+REFERENCE_ENTITIES = ("Item", "Account", "Vendor", "Class", "Department")
+
+_REFERENCE_HEAD = ("qbo_id", "name", "fully_qualified_name", "active", "parent_qbo_id")
+_REFERENCE_TAIL = ("meta_create_time", "meta_last_updated_time", "raw")
+
+_REFERENCE_EXTRAS = {
+    "Item": ("item_type", "income_account_qbo_id", "expense_account_qbo_id", "unit_price", "purchase_cost"),
+    "Account": ("account_type", "account_sub_type", "classification", "acct_num"),
+    "Vendor": ("company_name", "email", "vendor_1099"),
+    "Class": (),
+    "Department": (),
+}
+
+REFERENCE_FIELDS = {
+    entity: _REFERENCE_HEAD + extras + _REFERENCE_TAIL
+    for entity, extras in _REFERENCE_EXTRAS.items()
+}
+
+# Index lookups used when a caller needs one field back out of a tuple
+TXN_QBO_ID = TRANSACTION_FIELDS.index("qbo_id")
+TXN_CUSTOMER_QBO_ID = TRANSACTION_FIELDS.index("customer_qbo_id")
+
+
+def parse_bool(v: Any) -> Optional[int]:
+    if v is None:
+        return None
+    return 1 if bool(v) else 0
+
+
+def parse_decimal(v: Any) -> Optional[Decimal]:
+    if v is None:
+        return None
+    try:
+        return Decimal(str(v))
+    except Exception:
+        return None
+
+
+def parse_qbo_dt(s: Any) -> Optional[datetime]:
+    # QBO returns ISO with timezone, e.g. "2026-02-05T22:39:07-08:00"
+    if not s or not isinstance(s, str):
+        return None
+    try:
+        # Python 3.11+ handles offset with fromisoformat
+        return datetime.fromisoformat(s)
+    except Exception:
+        return None
+
+
+def ref_value(obj: Any) -> Optional[str]:
+    if isinstance(obj, dict) and obj.get("value"):
+        return str(obj.get("value"))
+    return None
+
+
+def ref_name(obj: Any) -> Optional[str]:
+    if isinstance(obj, dict) and obj.get("name"):
+        return str(obj.get("name"))
+    return None
+
+
+def first_linked_txn(line: dict) -> tuple[Optional[str], Optional[str], Optional[str]]:
+    linked = line.get("LinkedTxn") or []
+    if isinstance(linked, list) and linked:
+        first = linked[0]
+        if isinstance(first, dict):
+            return (
+                str(first.get("TxnId")) if first.get("TxnId") else None,
+                str(first.get("TxnType")) if first.get("TxnType") else None,
+                str(first.get("TxnLineId")) if first.get("TxnLineId") else None,
+            )
+    return None, None, None
+
+
+def _meta_times(doc: dict) -> tuple[Optional[datetime], Optional[datetime]]:
+    md = doc.get("MetaData") or {}
+    if not isinstance(md, dict):
+        return None, None
+    return parse_qbo_dt(md.get("CreateTime")), parse_qbo_dt(md.get("LastUpdatedTime"))
+
+
+def parse_customer(c: dict) -> Optional[tuple]:
+    qbo_id = str(c.get("Id") or "")
+    if not qbo_id:
+        return None
+
+    pe = c.get("PrimaryEmailAddr") or {}
+    email = pe.get("Address") if isinstance(pe, dict) else None
+    meta_create_time, meta_last_updated_time = _meta_times(c)
+
+    return (
+        qbo_id,
+        c.get("DisplayName"),
+        email,
+        parse_bool(c.get("Job")),
+        parse_bool(c.get("Active")),
+        parse_bool(c.get("IsProject")),
+        ref_value(c.get("ParentRef")),
+        parse_decimal(c.get("BalanceWithJobs")),
+        meta_create_time,
+        meta_last_updated_time,
+        json.dumps(c),
+    )
+
+
+def _reference_extras(entity: str, d: dict) -> tuple:
+    if entity == "Item":
+        return (
+            d.get("Type"),
+            ref_value(d.get("IncomeAccountRef")),
+            ref_value(d.get("ExpenseAccountRef")),
+            parse_decimal(d.get("UnitPrice")),
+            parse_decimal(d.get("PurchaseCost")),
+        )
+    if entity == "Account":
+        return (
+            d.get("AccountType"),
+            d.get("AccountSubType"),
+            d.get("Classification"),
+            d.get("AcctNum"),
+        )
+    if entity == "Vendor":
+        pe = d.get("PrimaryEmailAddr") or {}
+        return (
+            d.get("CompanyName"),
+            pe.get("Address") if isinstance(pe, dict) else None,
+            parse_bool(d.get("Vendor1099")),
+        )
+    return ()
+
+
+def parse_reference(entity: str, d: dict) -> Optional[tuple]:
+    qbo_id = str(d.get("Id") or "")
+    if not qbo_id or entity not in REFERENCE_FIELDS:
+        return None
+
+    # Vendors carry DisplayName instead of Name and have no hierarchy
+    name = d.get("Name") if entity != "Vendor" else d.get("DisplayName")
+    meta_create_time, meta_last_updated_time = _meta_times(d)
+
+    return (
+        qbo_id,
+        name,
+        d.get("FullyQualifiedName"),
+        parse_bool(d.get("Active")),
+        ref_value(d.get("ParentRef")),
+    ) + _reference_extras(entity, d) + (
+        meta_create_time,
+        meta_last_updated_time,
+        json.dumps(d),
+    )
+
+
+def parse_transaction(realm_id: str, entity: str, t: dict) -> Optional[tuple]:
+    qbo_id = str(t.get("Id") or "")
+    if not qbo_id:
+        return None
+
+    sales_term_name = None
+    st = t.get("SalesTermRef") or {}
+    if isinstance(st, dict):
+        sales_term_name = st.get("name")
+
+    currency_code = None
+    cur = t.get("CurrencyRef") or {}
+    if isinstance(cur, dict):
+        currency_code = cur.get("value")
+
+    meta_create_time, meta_last_updated_time = _meta_times(t)
+
+    return (
+        realm_id,
+        entity,
+        qbo_id,
+        ref_value(t.get("CustomerRef")),   # header linkage; may be absent on cost docs
+        ref_value(t.get("VendorRef")),
+        t.get("TxnDate"),
+        t.get("DueDate"),                  # "YYYY-MM-DD" or None
+        t.get("DocNumber"),
+        currency_code,
+        parse_decimal(t.get("TotalAmt")),
+        parse_decimal(t.get("Balance")),
+        sales_term_name,
+        t.get("SyncToken"),
+        meta_create_time,
+        meta_last_updated_time,
+        json.dumps(t),
+    )
+
+
+def parse_transaction_lines(realm_id: str, lines: list[dict]) -> list[tuple]:
+    rows: list[tuple] = []
+    for idx, line in enumerate(lines):
+        if not isinstance(line, dict):
+            continue
+
+        detail_type = line.get("DetailType")
+        detail_obj = None
+        if isinstance(detail_type, str) and detail_type:
+            detail_obj = line.get(detail_type) or {}
+        if not isinstance(detail_obj, dict):
+            detail_obj = {}
+
+        rows.append((
+            realm_id,
+            str(line.get("Id") or f"idx:{idx}"),
+            detail_type,
+            line.get("Description"),
+            parse_decimal(line.get("Amount")),
+            parse_decimal(line.get("CostAmount")),
+            ref_value(detail_obj.get("CustomerRef")),
+            ref_value(detail_obj.get("AccountRef")),
+            ref_value(detail_obj.get("ItemRef")),
+            ref_value(detail_obj.get("ClassRef")),
+            ref_value(detail_obj.get("DepartmentRef")),
+            ref_value(detail_obj.get("VendorRef")),
+            parse_decimal(detail_obj.get("Qty")),
+            parse_decimal(detail_obj.get("UnitPrice")),
+            detail_obj.get("BillableStatus"),
+            json.dumps(line),
+        ))
+
+    return rows
+
+
+_CENTS = Decimal("0.01")
+
+
+def _time_activity_hours(t: dict) -> Optional[Decimal]:
+    # Either Hours/Minutes, or StartTime/EndTime less any break
+    if t.get("Hours") is not None or t.get("Minutes") is not None:
+        hours = parse_decimal(t.get("Hours")) or Decimal(0)
+        minutes = parse_decimal(t.get("Minutes")) or Decimal(0)
+        return (hours + minutes / 60).quantize(_CENTS)
+
+    start = parse_qbo_dt(t.get("StartTime"))
+    end = parse_qbo_dt(t.get("EndTime"))
+    if not start or not end:
+        return None
+    break_minutes = int(t.get("BreakHours") or 0) * 60 + int(t.get("BreakMinutes") or 0)
+    minutes = max(0, int((end - start).total_seconds() // 60) - break_minutes)
+    return (Decimal(minutes) / 60).quantize(_CENTS)
+
+
+def parse_time_activity(realm_id: str, t: dict) -> Optional[tuple]:
+    qbo_id = str(t.get("Id") or "")
+    if not qbo_id:
+        return None
+
+    hours = _time_activity_hours(t)
+    hourly_rate = parse_decimal(t.get("HourlyRate"))
+    cost_rate = parse_decimal(t.get("CostRate"))
+    billable_status = t.get("BillableStatus")
+
+    labor_cost = (hours * cost_rate).quantize(_CENTS) if hours is not None and cost_rate is not None else None
+    billable_amount = None
+    if billable_status in ("Billable", "HasBeenBilled") and hours is not None and hourly_rate is not None:
+        billable_amount = (hours * hourly_rate).quantize(_CENTS)
+
+    _, meta_last_updated_time = _meta_times(t)
+
+    return (
+        realm_id,
+        qbo_id,
+        t.get("TxnDate"),
+        t.get("NameOf"),                    # "Employee" or "Vendor"
+        ref_value(t.get("EmployeeRef")),
+        ref_value(t.get("VendorRef")),
+        ref_value(t.get("CustomerRef")),
+        ref_value(t.get("ItemRef")),
+        ref_value(t.get("ClassRef")),
+        billable_status,
+        hours,
+        hourly_rate,
+        cost_rate,
+        labor_cost,
+        billable_amount,
+        t.get("Description"),
+        meta_last_updated_time,
+    )
+
+
+def _sales_line(
+    realm_id: str,
+    entity: str,
+    transaction_qbo_id: str,
+    project_customer_qbo_id: Optional[str],
+    line: dict,
+    line_key: str,
+    parent_line_key: Optional[str],
+    group_item_qbo_id: Optional[str],
+    group_item_name: Optional[str],
+) -> tuple:
+    detail_type = line.get("DetailType")
+    linked_txn_qbo_id, linked_txn_type, linked_txn_line_key = first_linked_txn(line)
+
+    item_qbo_id = None
+    item_name = None
+    account_qbo_id = None
+    qty = None
+    unit_price = None
+    service_date = None
+
+    # top-level detail object, when present
+    detail_obj = None
+    if isinstance(detail_type, str) and detail_type:
+        detail_obj = line.get(detail_type) or {}
+
+    if detail_type == "SalesItemLineDetail" and isinstance(detail_obj, dict):
+        item_qbo_id = ref_value(detail_obj.get("ItemRef"))
+        item_name = ref_name(detail_obj.get("ItemRef"))
+        account_qbo_id = ref_value(detail_obj.get("ItemAccountRef"))
+        qty = parse_decimal(detail_obj.get("Qty"))
+        unit_price = parse_decimal(detail_obj.get("UnitPrice"))
+        service_date = detail_obj.get("ServiceDate")
+
+    elif detail_type == "GroupLineDetail" and isinstance(detail_obj, dict) and parent_line_key is None:
+        group_item_qbo_id = ref_value(detail_obj.get("GroupItemRef"))
+        group_item_name = ref_name(detail_obj.get("GroupItemRef"))
+        qty = parse_decimal(detail_obj.get("Quantity"))
+
+    return (
+        realm_id,
+        entity,
+        transaction_qbo_id,
+        project_customer_qbo_id,
+        line.get("LineNum"),
+        line_key,
+        parent_line_key,
+        "parent" if parent_line_key is None else "child",
+        detail_type,
+        line.get("Description"),
+        group_item_qbo_id,
+        group_item_name,
+        item_qbo_id,
+        item_name,
+        account_qbo_id,
+        qty,
+        unit_price,
+        parse_decimal(line.get("Amount")),
+        parse_decimal(line.get("CostAmount")),
+        service_date,
+        linked_txn_qbo_id,
+        linked_txn_type,
+        linked_txn_line_key,
+        json.dumps(line),
+    )
+
+
+_GROUP_ITEM_QBO_ID = SALES_LINE_FIELDS.index("group_item_qbo_id")
+_GROUP_ITEM_NAME = SALES_LINE_FIELDS.index("group_item_name")
+
+
+def parse_sales_lines(
+    realm_id: str,
+    entity: str,
+    transaction_qbo_id: str,
+    project_customer_qbo_id: Optional[str],
+    lines: list[dict],
+) -> list[tuple]:
+    if entity not in SALES_TRANSACTION_ENTITIES:
+        return []
+
+    rows: list[tuple] = []
+    for idx, line in enumerate(lines):
+        if not isinstance(line, dict):
+            continue
+
+        line_key = str(line.get("Id") or f"idx:{idx}")
+        parent = _sales_line(
+            realm_id, entity, transaction_qbo_id, project_customer_qbo_id,
+            line, line_key, None, None, None,
+        )
+        rows.append(parent)
+
+        # Flatten child lines under GroupLineDetail.Line[]
+        detail_obj = line.get("GroupLineDetail") if line.get("DetailType") == "GroupLineDetail" else None
+        if isinstance(detail_obj, dict):
+            child_lines = detail_obj.get("Line") or []
+            for child_idx, child in enumerate(child_lines):
+                if not isinstance(child, dict):
+                    continue
+
+                child_key = str(child.get("Id") or f"{line_key}:child:{child_idx}")
+                rows.append(_sales_line(
+                    realm_id, entity, transaction_qbo_id, project_customer_qbo_id,
+                    child, child_key, line_key,
+                    parent[_GROUP_ITEM_QBO_ID], parent[_GROUP_ITEM_NAME],
+                ))
+
+    return rows
+
+
+def parse_document(realm_id: str, entity: str, t: dict) -> Optional[tuple[tuple, list[tuple], list[tuple]]]:
+    """
+    Header row plus (cost lines, sales lines) for one transaction document.
+    Sales-side entities only produce sales lines and vice versa.
+    """
+    header = parse_transaction(realm_id, entity, t)
+    if header is None:
+        return None
+
+    lines = t.get("Line", []) or []
+    if entity in SALES_TRANSACTION_ENTITIES:
+        return header, [], parse_sales_lines(
+            realm_id, entity, header[TXN_QBO_ID], header[TXN_CUSTOMER_QBO_ID], lines
+        )
+    return header, parse_transaction_lines(realm_id, lines), []
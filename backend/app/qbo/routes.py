@@ -1,6 +1,9 @@
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy import text
 
+from app import changefeed
 from app.db import engine
 from app.qbo import service
 
@@ -37,14 +40,65 @@ def sync_customers(_admin=Depends(require_admin)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/sync/reference")
+def sync_reference(_admin=Depends(require_admin)):
+    try:
+        return service.run_reference_sync(triggered_by="manual")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/reference/{entity}/names")
+def reference_names(entity: str, ids: str = "", _admin=Depends(require_admin)):
+    if entity not in service.REFERENCE_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown reference entity: {entity}")
+    qbo_ids = [x.strip() for x in ids.split(",") if x.strip()]
+    return service.resolve_reference_names(entity, qbo_ids)
+
+
 @router.post("/sync/transactions")
-def sync_transactions(_admin=Depends(require_admin)):
+def sync_transactions(mode: Optional[str] = None, _admin=Depends(require_admin)):
     try:
-        return service.run_transactions_sync(triggered_by="manual")
+        return service.run_transactions_sync(triggered_by="manual", ingest_mode=mode)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/sync/transactions/backfill")
+def sync_transactions_backfill(resume: bool = True, mode: Optional[str] = None, _admin=Depends(require_admin)):
+    try:
+        return service.run_transactions_backfill(triggered_by="manual", resume=resume, ingest_mode=mode)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/backfill/status")
+def qbo_backfill_status(_admin=Depends(require_admin)):
+    conn_row = service.get_connection()
+    status = service.backfill_status(conn_row["realm_id"]) if conn_row else None
+    return status or {"backfill_id": None, "shards": []}
+
+
+@router.get("/changes")
+def qbo_changes(
+    cursor: int = 0,
+    limit: int = 500,
+    project_qbo_id: Optional[str] = None,
+    _admin=Depends(require_admin),
+):
+    return changefeed.read_changes(cursor=cursor, limit=limit, project_qbo_id=project_qbo_id)
+
+
+@router.get("/changes/projects")
+def qbo_changed_projects(cursor: int = 0, _admin=Depends(require_admin)):
+    return changefeed.changed_projects_since(cursor=cursor)
+
+
+@router.post("/changes/prune")
+def qbo_changes_prune(retain_days: Optional[int] = None, _admin=Depends(require_admin)):
+    return {"deleted": changefeed.prune_changes(retain_days=retain_days)}
+
+
 @router.get("/status")
 def qbo_status(_admin=Depends(require_admin)):
     service.qbo_init_tables()
@@ -54,7 +108,8 @@ def qbo_status(_admin=Depends(require_admin)):
     with engine.connect() as conn:
         last_customers = conn.execute(text("""
             SELECT id, sync_type, triggered_by, started_at, finished_at, success,
-                   fetched_count, upserted_count, error_message
+                   fetched_count, upserted_count, write_chunks, lock_retries, lock_wait_ms,
+                   error_message
             FROM qbo_sync_runs
             WHERE sync_type = 'customers'
             ORDER BY id DESC
@@ -63,19 +118,31 @@ def qbo_status(_admin=Depends(require_admin)):
 
         last_transactions = conn.execute(text("""
             SELECT id, sync_type, triggered_by, started_at, finished_at, success,
-                   fetched_count, upserted_count, error_message
+                   fetched_count, upserted_count, write_chunks, lock_retries, lock_wait_ms,
+                   error_message
             FROM qbo_sync_runs
             WHERE sync_type = 'transactions'
             ORDER BY id DESC
             LIMIT 1
         """)).mappings().first()
 
+        last_reference = conn.execute(text("""
+            SELECT id, sync_type, triggered_by, started_at, finished_at, success,
+                   fetched_count, upserted_count, write_chunks, lock_retries, lock_wait_ms,
+                   error_message
+            FROM qbo_sync_runs
+            WHERE sync_type = 'reference'
+            ORDER BY id DESC
+            LIMIT 1
+        """)).mappings().first()
+
     return {
         "connected": bool(conn_row),
         "realm_id": conn_row["realm_id"] if conn_row else None,
         "token_expires_at": str(conn_row["expires_at"]) if conn_row else None,
         "last_customers_sync": dict(last_customers) if last_customers else None,
         "last_transactions_sync": dict(last_transactions) if last_transactions else None,
+        "last_reference_sync": dict(last_reference) if last_reference else None,
     }
 
 
@@ -3,14 +3,36 @@ import base64
 import urllib.parse
 import secrets
 import json
-from datetime import datetime, timedelta
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 import time
 import httpx
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import DBAPIError
+
+from app.changefeed import changefeed_init_table, emit_changes, prune_changes
+from app.data_version import bump_data_version
+from app.db import engine, ensure_index
+from app.qbo.parsers import (
+    CUSTOMER_FIELDS,
+    REFERENCE_ENTITIES,
+    REFERENCE_FIELDS,
+    SALES_LINE_FIELDS,
+    SALES_TRANSACTION_ENTITIES,
+    TRANSACTION_FIELDS,
+    TIME_ACTIVITY_FIELDS,
+    TRANSACTION_LINE_FIELDS,
+    TXN_QBO_ID,
+    parse_customer,
+    parse_document,
+    parse_reference,
+    parse_sales_lines,
+    parse_time_activity,
+)
 
-from app.db import engine
-
-from decimal import Decimal
 from typing import Any, Optional
 
 QBO_CLIENT_ID = os.getenv("QBO_CLIENT_ID")
@@ -37,59 +59,93 @@ TRANSACTION_ENTITIES = [
     "TimeActivity",
 ]
 
-SALES_TRANSACTION_ENTITIES = {
-    "Estimate",
-    "Invoice",
-    "SalesReceipt",
-    "CreditMemo",
-    "RefundReceipt",
-}
+# QBO throttles per realm (500 requests/minute, 10 concurrent). Stay a bit under both.
+QBO_MAX_CONCURRENCY = int(os.getenv("QBO_MAX_CONCURRENCY", "8"))
+QBO_REQUESTS_PER_MINUTE = int(os.getenv("QBO_REQUESTS_PER_MINUTE", "450"))
+
+# Sync writer: commit every N documents, retry lock-wait timeouts / deadlocks
+QBO_SYNC_COMMIT_EVERY = int(os.getenv("QBO_SYNC_COMMIT_EVERY", "200"))
+QBO_LOCK_RETRY_ATTEMPTS = int(os.getenv("QBO_LOCK_RETRY_ATTEMPTS", "5"))
+
+# MySQL: 1205 = lock wait timeout exceeded, 1213 = deadlock found
+LOCK_ERROR_CODES = {1205, 1213}
+
+# "direct" upserts documents in place; "staging" loads a batch into qbo_stg_* tables
+# and swaps it in with a few set-based statements so readers never see partial documents
+QBO_INGEST_MODE = os.getenv("QBO_INGEST_MODE", "direct").strip().lower()
+INGEST_MODES = ("direct", "staging")
+
+# Initial-load (backfill) tuning
+QBO_BACKFILL_SHARD_SIZE = int(os.getenv("QBO_BACKFILL_SHARD_SIZE", "5000"))
+QBO_BACKFILL_WORKERS = int(os.getenv("QBO_BACKFILL_WORKERS", "4"))
+QBO_BACKFILL_MAX_ATTEMPTS = int(os.getenv("QBO_BACKFILL_MAX_ATTEMPTS", "3"))
 
 def _basic_auth_header() -> str:
     raw = f"{QBO_CLIENT_ID}:{QBO_CLIENT_SECRET}".encode("utf-8")
     return "Basic " + base64.b64encode(raw).decode("utf-8")
 
-def _parse_bool(v: Any) -> Optional[int]:
-    if v is None:
-        return None
-    return 1 if bool(v) else 0
 
-def _parse_decimal(v: Any) -> Optional[Decimal]:
-    if v is None:
-        return None
-    try:
-        return Decimal(str(v))
-    except Exception:
-        return None
+class _RealmRateLimiter:
+    """
+    Shared request budget for one realm: caps in-flight calls and spaces
+    request starts so parallel fetchers stay under QBO's per-minute limit.
+    """
 
-def _parse_qbo_dt(s: Any) -> Optional[datetime]:
-    # QBO returns ISO with timezone, e.g. "2026-02-05T22:39:07-08:00"
-    if not s or not isinstance(s, str):
-        return None
-    try:
-        # Python 3.11+ handles offset with fromisoformat
-        return datetime.fromisoformat(s)
-    except Exception:
-        return None
+    def __init__(self, max_concurrency: int, per_minute: int):
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._interval = 60.0 / max(1, per_minute)
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    @contextmanager
+    def slot(self):
+        with self._slots:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._next_at - now
+                self._next_at = max(now, self._next_at) + self._interval
+            if wait > 0:
+                time.sleep(wait)
+            yield
+
+
+_rate_limiters: dict[str, _RealmRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def _rate_limiter(realm_id: str) -> _RealmRateLimiter:
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(realm_id)
+        if limiter is None:
+            limiter = _RealmRateLimiter(QBO_MAX_CONCURRENCY, QBO_REQUESTS_PER_MINUTE)
+            _rate_limiters[realm_id] = limiter
+        return limiter
 
 
 def _qbo_query(realm_id: str, access_token: str, query: str) -> dict:
     url = f"{QBO_API_BASE}/v3/company/{realm_id}/query"
     headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
+    limiter = _rate_limiter(realm_id)
 
     with httpx.Client(timeout=60) as client:
-        for attempt in (1, 2):
-            r = client.get(url, headers=headers, params={"query": query})
+        for attempt in (1, 2, 3):
+            with limiter.slot():
+                r = client.get(url, headers=headers, params={"query": query})
 
-            if r.status_code == 429 and attempt == 1:
-                # QBO rate limit hit — brief backoff
-                time.sleep(2)
+            if r.status_code == 429 and attempt < 3:
+                # QBO rate limit hit — back off a little longer each time
+                time.sleep(2 * attempt)
                 continue
 
             r.raise_for_status()
             return r.json()
 
 
+def _qbo_count(realm_id: str, access_token: str, entity: str, where: str = "") -> int:
+    data = _qbo_query(realm_id, access_token, f"SELECT COUNT(*) FROM {entity}{where}")
+    return int(data.get("QueryResponse", {}).get("totalCount") or 0)
+
+
 def _get_last_successful_sync_time(sync_type: str) -> Optional[datetime]:
     qbo_init_tables()
     with engine.connect() as conn:
@@ -104,12 +160,48 @@ def _get_last_successful_sync_time(sync_type: str) -> Optional[datetime]:
         """), {"sync_type": sync_type}).mappings().first()
     return row["finished_at"] if row else None
 
+def _get_backfill_watermark(realm_id: str) -> Optional[datetime]:
+    # Earliest shard start of the realm's latest backfill, once it is fully
+    # done: every shard fetched after this point, so incremental syncs can
+    # safely resume from it.
+    qbo_init_tables()
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT MIN(started_at) AS watermark
+            FROM qbo_backfill_shards
+            WHERE realm_id = :realm_id
+              AND backfill_id = (SELECT MAX(backfill_id) FROM qbo_backfill_shards WHERE realm_id = :realm_id)
+            GROUP BY backfill_id
+            HAVING SUM(status <> 'done') = 0
+        """), {"realm_id": realm_id}).mappings().first()
+    return row["watermark"] if row else None
+
 def _fmt_qbo_dt(dt: datetime) -> str:
     # QBO query language compares ISO-like strings
     return dt.strftime("%Y-%m-%dT%H:%M:%S")
 
 
+def _ensure_column(conn, table: str, column: str, ddl: str) -> None:
+    # CREATE TABLE IF NOT EXISTS won't add columns to tables created by older code
+    exists = conn.execute(text("""
+        SELECT 1
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+        LIMIT 1
+    """), {"table": table, "column": column}).first()
+    if not exists:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+_tables_ready = False
+
 def qbo_init_tables() -> None:
+    global _tables_ready
+    if _tables_ready:
+        return
+
+    changefeed_init_table()
+
     with engine.begin() as conn:
         conn.execute(text("""
             CREATE TABLE IF NOT EXISTS qbo_connection (
@@ -150,11 +242,17 @@ def qbo_init_tables() -> None:
               success TINYINT(1) NOT NULL DEFAULT 0,
               fetched_count INT NOT NULL DEFAULT 0,
               upserted_count INT NOT NULL DEFAULT 0,
+              write_chunks INT NOT NULL DEFAULT 0,
+              lock_retries INT NOT NULL DEFAULT 0,
+              lock_wait_ms INT NOT NULL DEFAULT 0,
               error_message TEXT NULL,
               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
               INDEX idx_sync_type_started (sync_type, started_at)
             )
         """))
+        _ensure_column(conn, "qbo_sync_runs", "write_chunks", "INT NOT NULL DEFAULT 0 AFTER upserted_count")
+        _ensure_column(conn, "qbo_sync_runs", "lock_retries", "INT NOT NULL DEFAULT 0 AFTER write_chunks")
+        _ensure_column(conn, "qbo_sync_runs", "lock_wait_ms", "INT NOT NULL DEFAULT 0 AFTER lock_retries")
 
         conn.execute(text("""
             CREATE TABLE IF NOT EXISTS qbo_transactions (
@@ -223,10 +321,13 @@ def qbo_init_tables() -> None:
               UNIQUE KEY uq_line (realm_id, transaction_id, line_key),
               INDEX idx_line_customer (realm_id, line_customer_qbo_id),
               INDEX idx_line_item (realm_id, item_qbo_id),
+              INDEX idx_line_txn_customer (transaction_id, line_customer_qbo_id, amount),
               CONSTRAINT fk_line_txn FOREIGN KEY (transaction_id) REFERENCES qbo_transactions(id)
                 ON DELETE CASCADE
             ) ENGINE=InnoDB
         """))
+        # Covering index for per-transaction line sums (project attribution)
+        ensure_index(conn, "qbo_transaction_lines", "idx_line_txn_customer", "transaction_id, line_customer_qbo_id, amount")
 
         conn.execute(text("""
             CREATE TABLE IF NOT EXISTS qbo_sales_transaction_lines (
@@ -280,6 +381,287 @@ def qbo_init_tables() -> None:
             ) ENGINE=InnoDB
         """))
 
+        # Staging tables for QBO_INGEST_MODE=staging. Rows are keyed by batch and
+        # by QBO ids (not transaction_id), and are removed once a batch is merged.
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_stg_transactions (
+              batch_id VARCHAR(32) NOT NULL,
+
+              realm_id VARCHAR(32) NOT NULL,
+              entity_type VARCHAR(40) NOT NULL,
+              qbo_id VARCHAR(32) NOT NULL,
+              customer_qbo_id VARCHAR(32) NULL,
+              vendor_qbo_id VARCHAR(32) NULL,
+              txn_date DATE NULL,
+              due_date DATE NULL,
+              doc_number VARCHAR(50) NULL,
+              currency_code VARCHAR(10) NULL,
+              total_amt DECIMAL(18,2) NULL,
+              balance_amt DECIMAL(18,2) NULL,
+              sales_term_name VARCHAR(255) NULL,
+              sync_token VARCHAR(32) NULL,
+              meta_create_time DATETIME NULL,
+              meta_last_updated_time DATETIME NULL,
+              raw_json JSON NOT NULL,
+
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              PRIMARY KEY (batch_id, realm_id, entity_type, qbo_id)
+            ) ENGINE=InnoDB
+        """))
+
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_stg_transaction_lines (
+              id BIGINT AUTO_INCREMENT PRIMARY KEY,
+              batch_id VARCHAR(32) NOT NULL,
+
+              realm_id VARCHAR(32) NOT NULL,
+              entity_type VARCHAR(40) NOT NULL,
+              transaction_qbo_id VARCHAR(32) NOT NULL,
+              line_key VARCHAR(64) NOT NULL,
+              detail_type VARCHAR(80) NULL,
+              description VARCHAR(4000) NULL,
+              amount DECIMAL(18,2) NULL,
+              cost_amount DECIMAL(18,2) NULL,
+              line_customer_qbo_id VARCHAR(32) NULL,
+              account_qbo_id VARCHAR(32) NULL,
+              item_qbo_id VARCHAR(32) NULL,
+              class_qbo_id VARCHAR(32) NULL,
+              department_qbo_id VARCHAR(32) NULL,
+              vendor_qbo_id VARCHAR(32) NULL,
+              qty DECIMAL(18,4) NULL,
+              unit_price DECIMAL(18,4) NULL,
+              billable_status VARCHAR(30) NULL,
+              raw_json JSON NOT NULL,
+
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              INDEX idx_stg_line_batch (batch_id, transaction_qbo_id)
+            ) ENGINE=InnoDB
+        """))
+
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_stg_sales_transaction_lines (
+              id BIGINT AUTO_INCREMENT PRIMARY KEY,
+              batch_id VARCHAR(32) NOT NULL,
+
+              realm_id VARCHAR(32) NOT NULL,
+              transaction_entity_type VARCHAR(40) NOT NULL,
+              transaction_qbo_id VARCHAR(32) NOT NULL,
+              project_customer_qbo_id VARCHAR(32) NULL,
+              line_num INT NULL,
+              line_key VARCHAR(64) NOT NULL,
+              parent_line_key VARCHAR(64) NULL,
+              line_level VARCHAR(20) NOT NULL,
+              detail_type VARCHAR(80) NULL,
+              description VARCHAR(4000) NULL,
+              group_item_qbo_id VARCHAR(32) NULL,
+              group_item_name VARCHAR(255) NULL,
+              item_qbo_id VARCHAR(32) NULL,
+              item_name VARCHAR(255) NULL,
+              account_qbo_id VARCHAR(32) NULL,
+              qty DECIMAL(18,4) NULL,
+              unit_price DECIMAL(18,4) NULL,
+              amount DECIMAL(18,2) NULL,
+              cost_amount DECIMAL(18,2) NULL,
+              service_date DATE NULL,
+              linked_txn_qbo_id VARCHAR(32) NULL,
+              linked_txn_type VARCHAR(40) NULL,
+              linked_txn_line_key VARCHAR(64) NULL,
+              raw_json JSON NOT NULL,
+
+              created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+              INDEX idx_stg_sales_line_batch (batch_id, transaction_qbo_id)
+            ) ENGINE=InnoDB
+        """))
+        # The merge reads staged lines one slice of documents at a time
+        ensure_index(conn, "qbo_stg_transaction_lines", "idx_stg_line_doc", "batch_id, transaction_qbo_id")
+        ensure_index(
+            conn, "qbo_stg_sales_transaction_lines", "idx_stg_sales_line_doc", "batch_id, transaction_qbo_id",
+        )
+
+        # Initial-load checkpoints: one row per (entity, TxnDate range) shard
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_backfill_shards (
+              id BIGINT AUTO_INCREMENT PRIMARY KEY,
+              backfill_id INT NOT NULL,             -- qbo_sync_runs.id of the run that planned it
+              realm_id VARCHAR(32) NOT NULL,
+              entity_type VARCHAR(40) NOT NULL,
+              date_from DATE NULL,                  -- inclusive; NULL = open
+              date_to DATE NULL,                    -- exclusive; NULL = open
+              expected_count INT NOT NULL DEFAULT 0,
+              status VARCHAR(20) NOT NULL DEFAULT 'pending',   -- pending / running / done / failed
+              attempts INT NOT NULL DEFAULT 0,
+              fetched_count INT NOT NULL DEFAULT 0,
+              upserted_count INT NOT NULL DEFAULT 0,
+              error_message TEXT NULL,
+              started_at DATETIME NULL,
+              finished_at DATETIME NULL,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              INDEX idx_backfill_status (backfill_id, status)
+            ) ENGINE=InnoDB
+        """))
+
+        # Which project(s) each transaction belongs to, resolved at ingest so
+        # per-project rollups are a plain indexed GROUP BY
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_project_attributions (
+              transaction_id BIGINT NOT NULL,
+              project_qbo_id VARCHAR(32) NOT NULL,
+              realm_id VARCHAR(32) NOT NULL,
+              entity_type VARCHAR(40) NOT NULL,
+              txn_date DATE NULL,
+              amount DECIMAL(18,2) NOT NULL DEFAULT 0,   -- header total (sales) or project's line sum (cost)
+              balance_amt DECIMAL(18,2) NULL,            -- sales docs only
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              PRIMARY KEY (transaction_id, project_qbo_id),
+              INDEX idx_attr_project (project_qbo_id, entity_type, amount, balance_amt),
+              INDEX idx_attr_type_date (realm_id, entity_type, txn_date),
+              INDEX idx_attr_project_date (project_qbo_id, txn_date, transaction_id),
+              INDEX idx_attr_project_type_date (project_qbo_id, entity_type, txn_date, transaction_id)
+            ) ENGINE=InnoDB
+        """))
+        # Keyset order for the per-project transaction drilldown
+        ensure_index(conn, "qbo_project_attributions", "idx_attr_project_date", "project_qbo_id, txn_date, transaction_id")
+        ensure_index(
+            conn, "qbo_project_attributions", "idx_attr_project_type_date",
+            "project_qbo_id, entity_type, txn_date, transaction_id",
+        )
+
+        # TimeActivity has no Line array; its labor fields are typed here
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_time_activities (
+              id BIGINT AUTO_INCREMENT PRIMARY KEY,
+              realm_id VARCHAR(32) NOT NULL,
+              qbo_id VARCHAR(32) NOT NULL,
+              txn_date DATE NULL,
+              name_of VARCHAR(20) NULL,             -- Employee / Vendor
+              employee_qbo_id VARCHAR(32) NULL,
+              vendor_qbo_id VARCHAR(32) NULL,
+              project_qbo_id VARCHAR(32) NULL,      -- CustomerRef (customer or project)
+              item_qbo_id VARCHAR(32) NULL,
+              class_qbo_id VARCHAR(32) NULL,
+              billable_status VARCHAR(30) NULL,
+              hours DECIMAL(10,2) NULL,
+              hourly_rate DECIMAL(18,4) NULL,       -- billing rate
+              cost_rate DECIMAL(18,4) NULL,
+              labor_cost DECIMAL(18,2) NULL,        -- hours * cost_rate
+              billable_amount DECIMAL(18,2) NULL,   -- hours * hourly_rate when billable
+              description TEXT NULL,
+              meta_last_updated_time DATETIME NULL,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              UNIQUE KEY uq_time_activity (realm_id, qbo_id),
+              INDEX idx_ta_project_date (project_qbo_id, txn_date),
+              INDEX idx_ta_employee_date (employee_qbo_id, txn_date),
+              INDEX idx_ta_vendor_date (vendor_qbo_id, txn_date),
+              INDEX idx_ta_date (txn_date)
+            ) ENGINE=InnoDB
+        """))
+
+        # Name lists that line *_qbo_id columns point at
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_items (
+              id INT AUTO_INCREMENT PRIMARY KEY,
+              realm_id VARCHAR(32) NOT NULL,
+              qbo_id VARCHAR(32) NOT NULL,
+              name VARCHAR(255) NULL,
+              fully_qualified_name VARCHAR(512) NULL,
+              active TINYINT(1) NULL,
+              parent_qbo_id VARCHAR(32) NULL,
+              item_type VARCHAR(40) NULL,
+              income_account_qbo_id VARCHAR(32) NULL,
+              expense_account_qbo_id VARCHAR(32) NULL,
+              unit_price DECIMAL(18,4) NULL,
+              purchase_cost DECIMAL(18,4) NULL,
+              meta_create_time DATETIME NULL,
+              meta_last_updated_time DATETIME NULL,
+              raw_json JSON NOT NULL,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              UNIQUE KEY uq_item (realm_id, qbo_id),
+              INDEX idx_item_name (realm_id, name)
+            ) ENGINE=InnoDB
+        """))
+
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_accounts (
+              id INT AUTO_INCREMENT PRIMARY KEY,
+              realm_id VARCHAR(32) NOT NULL,
+              qbo_id VARCHAR(32) NOT NULL,
+              name VARCHAR(255) NULL,
+              fully_qualified_name VARCHAR(512) NULL,
+              active TINYINT(1) NULL,
+              parent_qbo_id VARCHAR(32) NULL,
+              account_type VARCHAR(60) NULL,
+              account_sub_type VARCHAR(80) NULL,
+              classification VARCHAR(40) NULL,
+              acct_num VARCHAR(40) NULL,
+              meta_create_time DATETIME NULL,
+              meta_last_updated_time DATETIME NULL,
+              raw_json JSON NOT NULL,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              UNIQUE KEY uq_account (realm_id, qbo_id),
+              INDEX idx_account_name (realm_id, name),
+              INDEX idx_account_type (realm_id, account_type)
+            ) ENGINE=InnoDB
+        """))
+
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_vendors (
+              id INT AUTO_INCREMENT PRIMARY KEY,
+              realm_id VARCHAR(32) NOT NULL,
+              qbo_id VARCHAR(32) NOT NULL,
+              name VARCHAR(255) NULL,                 -- DisplayName
+              fully_qualified_name VARCHAR(512) NULL,
+              active TINYINT(1) NULL,
+              parent_qbo_id VARCHAR(32) NULL,
+              company_name VARCHAR(255) NULL,
+              email VARCHAR(255) NULL,
+              vendor_1099 TINYINT(1) NULL,
+              meta_create_time DATETIME NULL,
+              meta_last_updated_time DATETIME NULL,
+              raw_json JSON NOT NULL,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              UNIQUE KEY uq_vendor (realm_id, qbo_id),
+              INDEX idx_vendor_name (realm_id, name)
+            ) ENGINE=InnoDB
+        """))
+
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_classes (
+              id INT AUTO_INCREMENT PRIMARY KEY,
+              realm_id VARCHAR(32) NOT NULL,
+              qbo_id VARCHAR(32) NOT NULL,
+              name VARCHAR(255) NULL,
+              fully_qualified_name VARCHAR(512) NULL,
+              active TINYINT(1) NULL,
+              parent_qbo_id VARCHAR(32) NULL,
+              meta_create_time DATETIME NULL,
+              meta_last_updated_time DATETIME NULL,
+              raw_json JSON NOT NULL,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              UNIQUE KEY uq_class (realm_id, qbo_id),
+              INDEX idx_class_name (realm_id, name)
+            ) ENGINE=InnoDB
+        """))
+
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS qbo_departments (
+              id INT AUTO_INCREMENT PRIMARY KEY,
+              realm_id VARCHAR(32) NOT NULL,
+              qbo_id VARCHAR(32) NOT NULL,
+              name VARCHAR(255) NULL,
+              fully_qualified_name VARCHAR(512) NULL,
+              active TINYINT(1) NULL,
+              parent_qbo_id VARCHAR(32) NULL,
+              meta_create_time DATETIME NULL,
+              meta_last_updated_time DATETIME NULL,
+              raw_json JSON NOT NULL,
+              updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              UNIQUE KEY uq_department (realm_id, qbo_id),
+              INDEX idx_department_name (realm_id, name)
+            ) ENGINE=InnoDB
+        """))
+
+    _tables_ready = True
+
 
 def build_auth_url() -> str:
     if not all([QBO_CLIENT_ID, QBO_CLIENT_SECRET, QBO_REDIRECT_URI]):
@@ -365,24 +747,28 @@ def get_connection() -> dict | None:
     return dict(row) if row else None
 
 
+# Refresh tokens rotate, so parallel backfill workers must not refresh at the same time
+_token_lock = threading.Lock()
+
 def get_valid_access_token() -> tuple[str, str]:
-    c = get_connection()
-    if not c:
-        raise RuntimeError("No QBO connection saved yet. Go through /api/qbo/start first.")
+    with _token_lock:
+        c = get_connection()
+        if not c:
+            raise RuntimeError("No QBO connection saved yet. Go through /api/qbo/start first.")
 
-    realm_id = c["realm_id"]
-    access_token = c["access_token"]
-    refresh_token = c["refresh_token"]
-    expires_at = c["expires_at"]
+        realm_id = c["realm_id"]
+        access_token = c["access_token"]
+        refresh_token = c["refresh_token"]
+        expires_at = c["expires_at"]
 
-    # If not expired, use it
-    if datetime.utcnow() < expires_at:
-        return realm_id, access_token
+        # If not expired, use it
+        if datetime.utcnow() < expires_at:
+            return realm_id, access_token
 
-    # Refresh and store newest tokens
-    new_tokens = refresh_access_token(refresh_token)
-    upsert_connection(realm_id, new_tokens)
-    return realm_id, new_tokens["access_token"]
+        # Refresh and store newest tokens
+        new_tokens = refresh_access_token(refresh_token)
+        upsert_connection(realm_id, new_tokens)
+        return realm_id, new_tokens["access_token"]
 
 def log_sync_start(sync_type: str, triggered_by: str) -> int:
     qbo_init_tables()
@@ -394,7 +780,15 @@ def log_sync_start(sync_type: str, triggered_by: str) -> int:
         return int(res.lastrowid)
 
 
-def log_sync_finish(run_id: int, success: bool, fetched: int = 0, upserted: int = 0, error_message: str | None = None) -> None:
+def log_sync_finish(
+    run_id: int,
+    success: bool,
+    fetched: int = 0,
+    upserted: int = 0,
+    error_message: str | None = None,
+    stats: Optional[dict] = None,
+) -> None:
+    stats = stats or {}
     with engine.begin() as conn:
         conn.execute(text("""
             UPDATE qbo_sync_runs
@@ -402,6 +796,9 @@ def log_sync_finish(run_id: int, success: bool, fetched: int = 0, upserted: int
                 success = :success,
                 fetched_count = :fetched,
                 upserted_count = :upserted,
+                write_chunks = :write_chunks,
+                lock_retries = :lock_retries,
+                lock_wait_ms = :lock_wait_ms,
                 error_message = :error_message
             WHERE id = :id
         """), {
@@ -409,9 +806,77 @@ def log_sync_finish(run_id: int, success: bool, fetched: int = 0, upserted: int
             "success": 1 if success else 0,
             "fetched": int(fetched or 0),
             "upserted": int(upserted or 0),
+            "write_chunks": int(stats.get("chunks") or 0),
+            "lock_retries": int(stats.get("lock_retries") or 0),
+            "lock_wait_ms": int(stats.get("lock_wait_ms") or 0),
             "error_message": error_message,
         })
 
+
+def new_write_stats() -> dict:
+    return {"chunks": 0, "lock_retries": 0, "lock_wait_ms": 0}
+
+
+def merge_write_stats(into: dict, other: Optional[dict]) -> dict:
+    for k, v in (other or {}).items():
+        into[k] = into.get(k, 0) + v
+    return into
+
+
+def _is_lock_error(e: Exception) -> bool:
+    orig = getattr(e, "orig", None)
+    args = getattr(orig, "args", None) or ()
+    return bool(args) and args[0] in LOCK_ERROR_CODES
+
+
+def _run_with_lock_retry(work, stats: Optional[dict] = None):
+    """
+    Runs work(conn) in its own transaction. Lock-wait timeouts and deadlocks
+    roll it back and retry with jittered exponential backoff; the time lost to
+    them is added to stats["lock_wait_ms"].
+    """
+    stats = stats if stats is not None else new_write_stats()
+
+    for attempt in range(1, QBO_LOCK_RETRY_ATTEMPTS + 1):
+        t0 = time.monotonic()
+        try:
+            with engine.begin() as conn:
+                return work(conn)
+        except DBAPIError as e:
+            if not _is_lock_error(e) or attempt == QBO_LOCK_RETRY_ATTEMPTS:
+                raise
+            delay = min(8.0, 0.25 * (2 ** (attempt - 1))) * random.uniform(0.5, 1.5)
+            time.sleep(delay)
+            stats["lock_retries"] = stats.get("lock_retries", 0) + 1
+            stats["lock_wait_ms"] = stats.get("lock_wait_ms", 0) + int((time.monotonic() - t0) * 1000)
+
+
+def _write_in_chunks(
+    rows: list,
+    write_chunk,
+    stats: Optional[dict] = None,
+    width: int = 3,
+    chunk_size: Optional[int] = None,
+) -> list[int]:
+    """
+    Runs write_chunk(conn, chunk) in its own short transaction for every
+    chunk_size rows (default QBO_SYNC_COMMIT_EVERY) and sums the int tuples it
+    returns. A lock error only retries the chunk that hit it.
+    """
+    stats = stats if stats is not None else new_write_stats()
+    size = max(1, int(chunk_size or QBO_SYNC_COMMIT_EVERY))
+    totals = [0] * width
+
+    for offset in range(0, len(rows), size):
+        chunk = rows[offset:offset + size]
+        result = _run_with_lock_retry(lambda conn: write_chunk(conn, chunk), stats)
+
+        stats["chunks"] = stats.get("chunks", 0) + 1
+        for i, n in enumerate(result):
+            totals[i] += n
+
+    return totals
+
 # FOR CUSTOMERS INTO qbo_customers TABLE
 def fetch_customers(realm_id: str, access_token: str, page_size: int = 500) -> list[dict]:
     url = f"{QBO_API_BASE}/v3/company/{realm_id}/query"
@@ -434,91 +899,65 @@ def fetch_customers(realm_id: str, access_token: str, page_size: int = 500) -> l
 
     return all_rows
 
-def upsert_customers(customers: list[dict]) -> int:
+_CUSTOMER_UPSERT_SQL = text("""
+    INSERT INTO qbo_customers (
+      qbo_id, display_name, email, raw_json,
+      job, active, is_project, parent_qbo_id,
+      balance_with_jobs, meta_create_time, meta_last_updated_time
+    )
+    VALUES (
+      :qbo_id, :display_name, :email, :raw,
+      :job, :active, :is_project, :parent_qbo_id,
+      :balance_with_jobs, :meta_create_time, :meta_last_updated_time
+    )
+    ON DUPLICATE KEY UPDATE
+      display_name = VALUES(display_name),
+      email = VALUES(email),
+      raw_json = VALUES(raw_json),
+      job = VALUES(job),
+      active = VALUES(active),
+      is_project = VALUES(is_project),
+      parent_qbo_id = VALUES(parent_qbo_id),
+      balance_with_jobs = VALUES(balance_with_jobs),
+      meta_create_time = VALUES(meta_create_time),
+      meta_last_updated_time = VALUES(meta_last_updated_time)
+""")
+
+def upsert_customers(customers: list[dict], stats: Optional[dict] = None, run_id: Optional[int] = None) -> int:
     qbo_init_tables()
-    count = 0
-
-    with engine.begin() as conn:
-        for c in customers:
-            qbo_id = str(c.get("Id") or "")
-            if not qbo_id:
-                continue
-
-            display_name = c.get("DisplayName")
-            pe = c.get("PrimaryEmailAddr") or {}
-            email = pe.get("Address") if isinstance(pe, dict) else None
-
-            job = _parse_bool(c.get("Job"))
-            active = _parse_bool(c.get("Active"))
-            is_project = _parse_bool(c.get("IsProject"))
-
-            parent_qbo_id = None
-            pref = c.get("ParentRef") or {}
-            if isinstance(pref, dict) and pref.get("value"):
-                parent_qbo_id = str(pref.get("value"))
-
-            balance_with_jobs = _parse_decimal(c.get("BalanceWithJobs"))
-
-            md = c.get("MetaData") or {}
-            meta_create_time = _parse_qbo_dt(md.get("CreateTime")) if isinstance(md, dict) else None
-            meta_last_updated_time = _parse_qbo_dt(md.get("LastUpdatedTime")) if isinstance(md, dict) else None
-
-            conn.execute(text("""
-                INSERT INTO qbo_customers (
-                  qbo_id, display_name, email, raw_json,
-                  job, active, is_project, parent_qbo_id,
-                  balance_with_jobs, meta_create_time, meta_last_updated_time
-                )
-                VALUES (
-                  :qbo_id, :display_name, :email, CAST(:raw AS JSON),
-                  :job, :active, :is_project, :parent_qbo_id,
-                  :balance_with_jobs, :meta_create_time, :meta_last_updated_time
-                )
-                ON DUPLICATE KEY UPDATE
-                  display_name = VALUES(display_name),
-                  email = VALUES(email),
-                  raw_json = VALUES(raw_json),
-                  job = VALUES(job),
-                  active = VALUES(active),
-                  is_project = VALUES(is_project),
-                  parent_qbo_id = VALUES(parent_qbo_id),
-                  balance_with_jobs = VALUES(balance_with_jobs),
-                  meta_create_time = VALUES(meta_create_time),
-                  meta_last_updated_time = VALUES(meta_last_updated_time)
-            """), {
-                "qbo_id": qbo_id,
-                "display_name": display_name,
-                "email": email,
-                "raw": json.dumps(c),
-
-                "job": job,
-                "active": active,
-                "is_project": is_project,
-                "parent_qbo_id": parent_qbo_id,
-                "balance_with_jobs": balance_with_jobs,
-                "meta_create_time": meta_create_time,
-                "meta_last_updated_time": meta_last_updated_time,
-            })
-
-            count += 1
 
+    def write_chunk(conn, chunk: list[dict]) -> tuple[int]:
+        rows = [dict(zip(CUSTOMER_FIELDS, r)) for r in map(parse_customer, chunk) if r is not None]
+        if rows:
+            conn.execute(_CUSTOMER_UPSERT_SQL, rows)
+            emit_changes(conn, (
+                ("Customer", r["qbo_id"], r["qbo_id"] if r["is_project"] else None, run_id)
+                for r in rows
+            ))
+        return (len(rows),)
+
+    (count,) = _write_in_chunks(customers, write_chunk, stats, width=1)
     return count
 
 def run_customers_sync(triggered_by: str = "manual") -> dict:
     run_id = log_sync_start("customers", triggered_by)
+    stats = new_write_stats()
     try:
         realm_id, access_token = get_valid_access_token()
         customers = fetch_customers(realm_id, access_token)
-        upserted = upsert_customers(customers)
-        log_sync_finish(run_id, True, fetched=len(customers), upserted=upserted)
+        upserted = upsert_customers(customers, stats=stats, run_id=run_id)
+        log_sync_finish(run_id, True, fetched=len(customers), upserted=upserted, stats=stats)
+        warmed = _warm_read_caches()
         return {
+            **warmed,
             "realm_id": realm_id,
             "customers_fetched": len(customers),
             "customers_upserted": upserted,
+            "lock_wait_ms": stats["lock_wait_ms"],
             "run_id": run_id,
         }
     except Exception as e:
-        log_sync_finish(run_id, False, error_message=str(e))
+        log_sync_finish(run_id, False, error_message=str(e), stats=stats)
         raise
 
 
@@ -527,14 +966,20 @@ def fetch_entities_incremental(
     access_token: str,
     entity: str,
     page_size: int = 500,
-    since: Optional[datetime] = None
+    since: Optional[datetime] = None,
+    txn_date_from: Optional[date] = None,
+    txn_date_to: Optional[date] = None,
+    include_inactive: bool = False,
 ) -> list[dict]:
     all_rows: list[dict] = []
     start = 1
 
-    where = ""
-    if since:
-        where = f" WHERE MetaData.LastUpdatedTime > '{_fmt_qbo_dt(since)}'"
+    where = _qbo_where(
+        since=since,
+        txn_date_from=txn_date_from,
+        txn_date_to=txn_date_to,
+        include_inactive=include_inactive,
+    )
 
     while True:
         q = f"SELECT * FROM {entity}{where} STARTPOSITION {start} MAXRESULTS {int(page_size)}"
@@ -548,6 +993,149 @@ def fetch_entities_incremental(
 
     return all_rows
 
+def _qbo_where(
+    since: Optional[datetime] = None,
+    txn_date_from: Optional[date] = None,
+    txn_date_to: Optional[date] = None,
+    include_inactive: bool = False,
+) -> str:
+    conds = []
+    if include_inactive:
+        # Name-list queries only return active rows unless asked explicitly
+        conds.append("Active IN (true, false)")
+    if since:
+        conds.append(f"MetaData.LastUpdatedTime > '{_fmt_qbo_dt(since)}'")
+    if txn_date_from:
+        conds.append(f"TxnDate >= '{txn_date_from.isoformat()}'")
+    if txn_date_to:
+        conds.append(f"TxnDate < '{txn_date_to.isoformat()}'")
+    return (" WHERE " + " AND ".join(conds)) if conds else ""
+
+# Line and staging inserts run as executemany. They bind raw_json as a plain
+# JSON string (no CAST) so PyMySQL can batch them into multi-row INSERTs.
+
+# Column lists shared by the staging load and merge statements
+_TXN_COLUMNS = TRANSACTION_FIELDS[:-1]
+_TXN_LINE_COLUMNS = TRANSACTION_LINE_FIELDS[1:-1]
+_SALES_LINE_COLUMNS = SALES_LINE_FIELDS[1:-1]
+
+_SALES_LINE_UPSERT_SQL = text("""
+    INSERT INTO qbo_sales_transaction_lines (
+      realm_id, transaction_id,
+      transaction_entity_type, transaction_qbo_id, project_customer_qbo_id,
+      line_num, line_key, parent_line_key, line_level,
+      detail_type, description,
+      group_item_qbo_id, group_item_name,
+      item_qbo_id, item_name, account_qbo_id,
+      qty, unit_price, amount, cost_amount, service_date,
+      linked_txn_qbo_id, linked_txn_type, linked_txn_line_key,
+      raw_json
+    )
+    VALUES (
+      :realm_id, :transaction_id,
+      :transaction_entity_type, :transaction_qbo_id, :project_customer_qbo_id,
+      :line_num, :line_key, :parent_line_key, :line_level,
+      :detail_type, :description,
+      :group_item_qbo_id, :group_item_name,
+      :item_qbo_id, :item_name, :account_qbo_id,
+      :qty, :unit_price, :amount, :cost_amount, :service_date,
+      :linked_txn_qbo_id, :linked_txn_type, :linked_txn_line_key,
+      :raw
+    )
+    ON DUPLICATE KEY UPDATE
+      transaction_entity_type = VALUES(transaction_entity_type),
+      transaction_qbo_id = VALUES(transaction_qbo_id),
+      project_customer_qbo_id = VALUES(project_customer_qbo_id),
+      line_num = VALUES(line_num),
+      parent_line_key = VALUES(parent_line_key),
+      line_level = VALUES(line_level),
+      detail_type = VALUES(detail_type),
+      description = VALUES(description),
+      group_item_qbo_id = VALUES(group_item_qbo_id),
+      group_item_name = VALUES(group_item_name),
+      item_qbo_id = VALUES(item_qbo_id),
+      item_name = VALUES(item_name),
+      account_qbo_id = VALUES(account_qbo_id),
+      qty = VALUES(qty),
+      unit_price = VALUES(unit_price),
+      amount = VALUES(amount),
+      cost_amount = VALUES(cost_amount),
+      service_date = VALUES(service_date),
+      linked_txn_qbo_id = VALUES(linked_txn_qbo_id),
+      linked_txn_type = VALUES(linked_txn_type),
+      linked_txn_line_key = VALUES(linked_txn_line_key),
+      raw_json = VALUES(raw_json)
+""")
+
+_TXN_LINE_UPSERT_SQL = text("""
+    INSERT INTO qbo_transaction_lines (
+      realm_id, transaction_id, line_key,
+      detail_type, description, amount, cost_amount,
+      line_customer_qbo_id, account_qbo_id, item_qbo_id,
+      class_qbo_id, department_qbo_id, vendor_qbo_id,
+      qty, unit_price, billable_status,
+      raw_json
+    )
+    VALUES (
+      :realm_id, :transaction_id, :line_key,
+      :detail_type, :description, :amount, :cost_amount,
+      :line_customer_qbo_id, :account_qbo_id, :item_qbo_id,
+      :class_qbo_id, :department_qbo_id, :vendor_qbo_id,
+      :qty, :unit_price, :billable_status,
+      :raw
+    )
+    ON DUPLICATE KEY UPDATE
+      detail_type = VALUES(detail_type),
+      description = VALUES(description),
+      amount = VALUES(amount),
+      cost_amount = VALUES(cost_amount),
+      line_customer_qbo_id = VALUES(line_customer_qbo_id),
+      account_qbo_id = VALUES(account_qbo_id),
+      item_qbo_id = VALUES(item_qbo_id),
+      class_qbo_id = VALUES(class_qbo_id),
+      department_qbo_id = VALUES(department_qbo_id),
+      vendor_qbo_id = VALUES(vendor_qbo_id),
+      qty = VALUES(qty),
+      unit_price = VALUES(unit_price),
+      billable_status = VALUES(billable_status),
+      raw_json = VALUES(raw_json)
+""")
+
+_TXN_UPSERT_SQL = text("""
+    INSERT INTO qbo_transactions (
+      realm_id, entity_type, qbo_id,
+      customer_qbo_id, vendor_qbo_id,
+      txn_date, due_date, doc_number, currency_code, total_amt, balance_amt,
+      sales_term_name,
+      sync_token, meta_create_time, meta_last_updated_time,
+      raw_json
+    )
+    VALUES (
+      :realm_id, :entity_type, :qbo_id,
+      :customer_qbo_id, :vendor_qbo_id,
+      :txn_date, :due_date, :doc_number, :currency_code, :total_amt, :balance_amt,
+      :sales_term_name,
+      :sync_token, :meta_create_time, :meta_last_updated_time,
+      CAST(:raw AS JSON)
+    )
+    ON DUPLICATE KEY UPDATE
+      id = LAST_INSERT_ID(id),
+      customer_qbo_id = VALUES(customer_qbo_id),
+      vendor_qbo_id = VALUES(vendor_qbo_id),
+      txn_date = VALUES(txn_date),
+      due_date = VALUES(due_date),
+      doc_number = VALUES(doc_number),
+      currency_code = VALUES(currency_code),
+      total_amt = VALUES(total_amt),
+      balance_amt = VALUES(balance_amt),
+      sales_term_name = VALUES(sales_term_name),
+      sync_token = VALUES(sync_token),
+      meta_create_time = VALUES(meta_create_time),
+      meta_last_updated_time = VALUES(meta_last_updated_time),
+      raw_json = VALUES(raw_json)
+""")
+
+
 def upsert_sales_transaction_lines(
     conn,
     realm_id: str,
@@ -557,502 +1145,434 @@ def upsert_sales_transaction_lines(
     project_customer_qbo_id: Optional[str],
     lines: list[dict],
 ) -> int:
-    if entity not in SALES_TRANSACTION_ENTITIES:
-        return 0
-
-    upserted = 0
-
-    for idx, line in enumerate(lines):
-        if not isinstance(line, dict):
-            continue
-
-        line_key = str(line.get("Id") or f"idx:{idx}")
-        line_num = line.get("LineNum")
-        detail_type = line.get("DetailType")
-        description = line.get("Description")
-        amount = _parse_decimal(line.get("Amount"))
-        cost_amount = _parse_decimal(line.get("CostAmount"))
-
-        linked_txn_qbo_id, linked_txn_type, linked_txn_line_key = _first_linked_txn(line)
-
-        group_item_qbo_id = None
-        group_item_name = None
-        item_qbo_id = None
-        item_name = None
-        account_qbo_id = None
-        qty = None
-        unit_price = None
-        service_date = None
-
-        # top-level detail object, when present
-        detail_obj = None
-        if isinstance(detail_type, str) and detail_type:
-            detail_obj = line.get(detail_type) or {}
-
-        if detail_type == "SalesItemLineDetail" and isinstance(detail_obj, dict):
-            item_qbo_id = _ref_value(detail_obj.get("ItemRef"))
-            item_name = _ref_name(detail_obj.get("ItemRef"))
-            account_qbo_id = _ref_value(detail_obj.get("ItemAccountRef"))
-            qty = _parse_decimal(detail_obj.get("Qty"))
-            unit_price = _parse_decimal(detail_obj.get("UnitPrice"))
-            service_date = detail_obj.get("ServiceDate")
-
-        elif detail_type == "GroupLineDetail" and isinstance(detail_obj, dict):
-            group_item_qbo_id = _ref_value(detail_obj.get("GroupItemRef"))
-            group_item_name = _ref_name(detail_obj.get("GroupItemRef"))
-            qty = _parse_decimal(detail_obj.get("Quantity"))
+    rows = [
+        dict(zip(SALES_LINE_FIELDS, r), transaction_id=transaction_id)
+        for r in parse_sales_lines(realm_id, entity, transaction_qbo_id, project_customer_qbo_id, lines)
+    ]
+    if rows:
+        conn.execute(_SALES_LINE_UPSERT_SQL, rows)
+    return len(rows)
+
+
+def _upsert_transaction(conn, realm_id: str, entity: str, t: dict) -> tuple[int, int, int]:
+    parsed = parse_document(realm_id, entity, t)
+    if parsed is None:
+        return 0, 0, 0
+    header, line_rows, sales_rows = parsed
+
+    # Upsert header (and capture transaction_id without an extra SELECT)
+    res = conn.execute(_TXN_UPSERT_SQL, dict(zip(TRANSACTION_FIELDS, header)))
+    transaction_id = int(res.lastrowid)
+    if not transaction_id:
+        return 1, 0, 0
+
+    # Lines are replaced as a whole so removed QBO lines don't linger.
+    # Sales-side docs go only into qbo_sales_transaction_lines (Option A:
+    # only non-sales entities go into qbo_transaction_lines).
+    line_table = "qbo_sales_transaction_lines" if entity in SALES_TRANSACTION_ENTITIES else "qbo_transaction_lines"
+    conn.execute(text(f"""
+        DELETE FROM {line_table}
+        WHERE transaction_id = :transaction_id
+    """), {"transaction_id": transaction_id})
+
+    if sales_rows:
+        conn.execute(_SALES_LINE_UPSERT_SQL, [
+            dict(zip(SALES_LINE_FIELDS, r), transaction_id=transaction_id) for r in sales_rows
+        ])
+    if line_rows:
+        conn.execute(_TXN_LINE_UPSERT_SQL, [
+            dict(zip(TRANSACTION_LINE_FIELDS, r), transaction_id=transaction_id) for r in line_rows
+        ])
+
+    return 1, len(line_rows), len(sales_rows)
+
+
+_SALES_ENTITY_LIST = ", ".join(f"'{e}'" for e in sorted(SALES_TRANSACTION_ENTITIES))
+
+
+def _refresh_project_attributions(
+    conn,
+    where: str,
+    params: dict,
+    run_id: Optional[int] = None,
+    emit: bool = True,
+) -> None:
+    """
+    Recomputes qbo_project_attributions for the transactions matching
+    `where` (a predicate on alias t). Same rule the rollups used to apply
+    per request: the header customer wins, otherwise each distinct line
+    customer gets its own line sum. TimeActivity lives in
+    qbo_time_activities instead.
+
+    With emit, every project the documents belonged to before or after is
+    written to the changefeed.
+    """
+    stmt_params = [bindparam("qbo_ids", expanding=True)] if "qbo_ids" in params else []
+    params = dict(params, run_id=run_id)
+
+    if emit:
+        conn.execute(text(f"""
+            INSERT INTO changefeed (entity_type, entity_id, project_qbo_id, sync_run_id, created_at)
+            SELECT t.entity_type, t.qbo_id, a.project_qbo_id, :run_id, UTC_TIMESTAMP()
+            FROM qbo_project_attributions a
+            JOIN qbo_transactions t
+              ON t.id = a.transaction_id
+            WHERE {where}
+        """).bindparams(*stmt_params), params)
+
+    conn.execute(text(f"""
+        DELETE a
+        FROM qbo_project_attributions a
+        JOIN qbo_transactions t
+          ON t.id = a.transaction_id
+        WHERE {where}
+    """).bindparams(*stmt_params), params)
+
+    conn.execute(text(f"""
+        INSERT INTO qbo_project_attributions
+          (transaction_id, project_qbo_id, realm_id, entity_type, txn_date, amount, balance_amt)
+        SELECT
+          t.id,
+          COALESCE(t.customer_qbo_id, lt.project_qbo_id) AS project_qbo_id,
+          t.realm_id,
+          t.entity_type,
+          t.txn_date,
+          CASE WHEN t.entity_type IN ({_SALES_ENTITY_LIST})
+               THEN COALESCE(t.total_amt, 0)
+               ELSE COALESCE(SUM(lt.line_amt), 0) END,
+          CASE WHEN t.entity_type IN ({_SALES_ENTITY_LIST})
+               THEN t.balance_amt END
+        FROM qbo_transactions t
+        LEFT JOIN (
+          SELECT l.transaction_id, l.line_customer_qbo_id AS project_qbo_id, SUM(l.amount) AS line_amt
+          FROM qbo_transaction_lines l
+          JOIN qbo_transactions t
+            ON t.id = l.transaction_id
+          WHERE {where}
+            AND l.line_customer_qbo_id IS NOT NULL
+          GROUP BY l.transaction_id, l.line_customer_qbo_id
+        ) lt
+          ON lt.transaction_id = t.id
+        WHERE {where}
+          AND t.entity_type <> 'TimeActivity'
+        GROUP BY t.id, COALESCE(t.customer_qbo_id, lt.project_qbo_id)
+        HAVING project_qbo_id IS NOT NULL
+    """).bindparams(*stmt_params), params)
+
+    if emit:
+        # One record per (document, project); NULL project when unattributed
+        conn.execute(text(f"""
+            INSERT INTO changefeed (entity_type, entity_id, project_qbo_id, sync_run_id, created_at)
+            SELECT t.entity_type, t.qbo_id, a.project_qbo_id, :run_id, UTC_TIMESTAMP()
+            FROM qbo_transactions t
+            LEFT JOIN qbo_project_attributions a
+              ON a.transaction_id = t.id
+            WHERE {where}
+              AND t.entity_type <> 'TimeActivity'
+        """).bindparams(*stmt_params), params)
+        # Same rule as emit_changes: the version moves with this commit
+        bump_data_version(conn)
+
+
+def _refresh_document_attributions(
+    conn,
+    realm_id: str,
+    entity: str,
+    qbo_ids: list[str],
+    run_id: Optional[int] = None,
+) -> None:
+    if qbo_ids:
+        _refresh_project_attributions(
+            conn,
+            "t.realm_id = :realm_id AND t.entity_type = :entity AND t.qbo_id IN :qbo_ids",
+            {"realm_id": realm_id, "entity": entity, "qbo_ids": qbo_ids},
+            run_id=run_id,
+        )
+
+
+def _staging_insert_sql(table: str, columns: tuple[str, ...]) -> Any:
+    cols = ", ".join(("batch_id",) + columns)
+    params = ", ".join(f":{c}" for c in ("batch_id",) + columns)
+    return text(f"INSERT INTO {table} ({cols}, raw_json) VALUES ({params}, :raw)")
+
+
+_STG_TXN_INSERT_SQL = _staging_insert_sql("qbo_stg_transactions", _TXN_COLUMNS)
+_STG_TXN_LINE_INSERT_SQL = _staging_insert_sql(
+    "qbo_stg_transaction_lines", ("realm_id", "entity_type", "transaction_qbo_id") + _TXN_LINE_COLUMNS
+)
+_STG_SALES_LINE_INSERT_SQL = _staging_insert_sql("qbo_stg_sales_transaction_lines", ("realm_id",) + _SALES_LINE_COLUMNS)
+
+
+def _merge_staged_batch(conn, batch_id: str, qbo_ids: list[str]) -> None:
+    """
+    Swaps the staged documents `qbo_ids` of a batch into the live tables:
+    upsert headers, drop the documents' old lines, insert the new ones. All
+    set-based, in one transaction, so readers see each document either
+    before or after.
+    """
+    params = {"batch_id": batch_id, "qbo_ids": qbo_ids}
+    ids = bindparam("qbo_ids", expanding=True)
+
+    txn_cols = ", ".join(_TXN_COLUMNS)
+    txn_updates = ",\n          ".join(f"{c} = VALUES({c})" for c in _TXN_COLUMNS[3:] + ("raw_json",))
+    conn.execute(text(f"""
+        INSERT INTO qbo_transactions ({txn_cols}, raw_json)
+        SELECT {txn_cols}, raw_json
+        FROM qbo_stg_transactions
+        WHERE batch_id = :batch_id AND qbo_id IN :qbo_ids
+        ON DUPLICATE KEY UPDATE
+          {txn_updates}
+    """).bindparams(ids), params)
+
+    conn.execute(text("""
+        DELETE l
+        FROM qbo_transaction_lines l
+        JOIN qbo_transactions t
+          ON t.id = l.transaction_id
+        JOIN qbo_stg_transactions s
+          ON s.realm_id = t.realm_id AND s.entity_type = t.entity_type AND s.qbo_id = t.qbo_id
+        WHERE s.batch_id = :batch_id AND s.qbo_id IN :qbo_ids
+    """).bindparams(ids), params)
+
+    conn.execute(text("""
+        DELETE l
+        FROM qbo_sales_transaction_lines l
+        JOIN qbo_transactions t
+          ON t.id = l.transaction_id
+        JOIN qbo_stg_transactions s
+          ON s.realm_id = t.realm_id AND s.entity_type = t.entity_type AND s.qbo_id = t.qbo_id
+        WHERE s.batch_id = :batch_id AND s.qbo_id IN :qbo_ids
+    """).bindparams(ids), params)
+
+    line_cols = ", ".join(_TXN_LINE_COLUMNS)
+    line_select = ", ".join(f"sl.{c}" for c in _TXN_LINE_COLUMNS)
+    line_updates = ",\n          ".join(f"{c} = VALUES({c})" for c in _TXN_LINE_COLUMNS[1:] + ("raw_json",))
+    conn.execute(text(f"""
+        INSERT INTO qbo_transaction_lines (realm_id, transaction_id, {line_cols}, raw_json)
+        SELECT sl.realm_id, t.id, {line_select}, sl.raw_json
+        FROM qbo_stg_transaction_lines sl
+        JOIN qbo_transactions t
+          ON t.realm_id = sl.realm_id AND t.entity_type = sl.entity_type AND t.qbo_id = sl.transaction_qbo_id
+        WHERE sl.batch_id = :batch_id AND sl.transaction_qbo_id IN :qbo_ids
+        ORDER BY sl.id
+        ON DUPLICATE KEY UPDATE
+          {line_updates}
+    """).bindparams(ids), params)
+
+    sales_cols = ", ".join(_SALES_LINE_COLUMNS)
+    sales_select = ", ".join(f"sl.{c}" for c in _SALES_LINE_COLUMNS)
+    sales_updates = ",\n          ".join(
+        f"{c} = VALUES({c})" for c in _SALES_LINE_COLUMNS if c != "line_key"
+    ) + ",\n          raw_json = VALUES(raw_json)"
+    conn.execute(text(f"""
+        INSERT INTO qbo_sales_transaction_lines (realm_id, transaction_id, {sales_cols}, raw_json)
+        SELECT sl.realm_id, t.id, {sales_select}, sl.raw_json
+        FROM qbo_stg_sales_transaction_lines sl
+        JOIN qbo_transactions t
+          ON t.realm_id = sl.realm_id AND t.entity_type = sl.transaction_entity_type AND t.qbo_id = sl.transaction_qbo_id
+        WHERE sl.batch_id = :batch_id AND sl.transaction_qbo_id IN :qbo_ids
+        ORDER BY sl.id
+        ON DUPLICATE KEY UPDATE
+          {sales_updates}
+    """).bindparams(ids), params)
+
+
+def _discard_staged_batch(batch_id: str) -> None:
+    # Also sweeps batches orphaned by a crashed sync
+    with engine.begin() as conn:
+        for table in ("qbo_stg_transactions", "qbo_stg_transaction_lines", "qbo_stg_sales_transaction_lines"):
+            conn.execute(text(f"""
+                DELETE FROM {table}
+                WHERE batch_id = :batch_id
+                   OR created_at < NOW() - INTERVAL 1 DAY
+            """), {"batch_id": batch_id})
 
-        conn.execute(text("""
-            INSERT INTO qbo_sales_transaction_lines (
-              realm_id, transaction_id,
-              transaction_entity_type, transaction_qbo_id, project_customer_qbo_id,
-              line_num, line_key, parent_line_key, line_level,
-              detail_type, description,
-              group_item_qbo_id, group_item_name,
-              item_qbo_id, item_name, account_qbo_id,
-              qty, unit_price, amount, cost_amount, service_date,
-              linked_txn_qbo_id, linked_txn_type, linked_txn_line_key,
-              raw_json
-            )
-            VALUES (
-              :realm_id, :transaction_id,
-              :transaction_entity_type, :transaction_qbo_id, :project_customer_qbo_id,
-              :line_num, :line_key, :parent_line_key, :line_level,
-              :detail_type, :description,
-              :group_item_qbo_id, :group_item_name,
-              :item_qbo_id, :item_name, :account_qbo_id,
-              :qty, :unit_price, :amount, :cost_amount, :service_date,
-              :linked_txn_qbo_id, :linked_txn_type, :linked_txn_line_key,
-              CAST(:raw AS JSON)
-            )
-            ON DUPLICATE KEY UPDATE
-              transaction_entity_type = VALUES(transaction_entity_type),
-              transaction_qbo_id = VALUES(transaction_qbo_id),
-              project_customer_qbo_id = VALUES(project_customer_qbo_id),
-              line_num = VALUES(line_num),
-              parent_line_key = VALUES(parent_line_key),
-              line_level = VALUES(line_level),
-              detail_type = VALUES(detail_type),
-              description = VALUES(description),
-              group_item_qbo_id = VALUES(group_item_qbo_id),
-              group_item_name = VALUES(group_item_name),
-              item_qbo_id = VALUES(item_qbo_id),
-              item_name = VALUES(item_name),
-              account_qbo_id = VALUES(account_qbo_id),
-              qty = VALUES(qty),
-              unit_price = VALUES(unit_price),
-              amount = VALUES(amount),
-              cost_amount = VALUES(cost_amount),
-              service_date = VALUES(service_date),
-              linked_txn_qbo_id = VALUES(linked_txn_qbo_id),
-              linked_txn_type = VALUES(linked_txn_type),
-              linked_txn_line_key = VALUES(linked_txn_line_key),
-              raw_json = VALUES(raw_json)
-        """), {
-            "realm_id": realm_id,
-            "transaction_id": transaction_id,
-            "transaction_entity_type": entity,
-            "transaction_qbo_id": transaction_qbo_id,
-            "project_customer_qbo_id": project_customer_qbo_id,
-            "line_num": line_num,
-            "line_key": line_key,
-            "parent_line_key": None,
-            "line_level": "parent",
-            "detail_type": detail_type,
-            "description": description,
-            "group_item_qbo_id": group_item_qbo_id,
-            "group_item_name": group_item_name,
-            "item_qbo_id": item_qbo_id,
-            "item_name": item_name,
-            "account_qbo_id": account_qbo_id,
-            "qty": qty,
-            "unit_price": unit_price,
-            "amount": amount,
-            "cost_amount": cost_amount,
-            "service_date": service_date,
-            "linked_txn_qbo_id": linked_txn_qbo_id,
-            "linked_txn_type": linked_txn_type,
-            "linked_txn_line_key": linked_txn_line_key,
-            "raw": json.dumps(line),
-        })
-        upserted += 1
 
-        # Flatten child lines under GroupLineDetail.Line[]
-        if detail_type == "GroupLineDetail" and isinstance(detail_obj, dict):
-            child_lines = detail_obj.get("Line") or []
-            for child_idx, child in enumerate(child_lines):
-                if not isinstance(child, dict):
-                    continue
+def _stage_and_merge_transactions(
+    realm_id: str,
+    entity: str,
+    txns: list[dict],
+    stats: Optional[dict] = None,
+    run_id: Optional[int] = None,
+) -> tuple[int, int, int]:
+    batch_id = secrets.token_hex(16)
+
+    # Later pages win if QBO returns a document twice
+    docs: dict[str, tuple] = {}
+    for t in txns:
+        parsed = parse_document(realm_id, entity, t)
+        if parsed is not None:
+            docs[parsed[0][TXN_QBO_ID]] = parsed
+    items = list(docs.values())
+
+    # Loading commits in chunks but stays invisible until the merge
+    def load_chunk(conn, chunk: list[tuple]) -> tuple[int, int, int]:
+        headers = []
+        line_rows = []
+        sales_rows = []
+        for header, lines, sales_lines in chunk:
+            headers.append(dict(zip(TRANSACTION_FIELDS, header), batch_id=batch_id))
+            for r in lines:
+                line_rows.append(dict(
+                    zip(TRANSACTION_LINE_FIELDS, r),
+                    batch_id=batch_id,
+                    entity_type=entity,
+                    transaction_qbo_id=header[TXN_QBO_ID],
+                ))
+            for r in sales_lines:
+                sales_rows.append(dict(zip(SALES_LINE_FIELDS, r), batch_id=batch_id))
+
+        conn.execute(_STG_TXN_INSERT_SQL, headers)
+        if line_rows:
+            conn.execute(_STG_TXN_LINE_INSERT_SQL, line_rows)
+        if sales_rows:
+            conn.execute(_STG_SALES_LINE_INSERT_SQL, sales_rows)
+        return len(headers), len(line_rows), len(sales_rows)
+
+    # Merging commits per slice of documents too, so a large load or backfill
+    # shard never holds the live tables' row locks for the whole batch. A
+    # document's header and lines always share a slice.
+    def merge_chunk(conn, qbo_ids: list[str]) -> tuple[int]:
+        _merge_staged_batch(conn, batch_id, qbo_ids)
+        _refresh_document_attributions(conn, realm_id, entity, qbo_ids, run_id)
+        return (len(qbo_ids),)
+
+    try:
+        up_txn, up_line, up_sales_line = _write_in_chunks(items, load_chunk, stats)
+        _write_in_chunks(list(docs), merge_chunk, stats, width=1)
+    finally:
+        _discard_staged_batch(batch_id)
+
+    return up_txn, up_line, up_sales_line
+
+
+_TIME_ACTIVITY_UPSERT_SQL = text(f"""
+    INSERT INTO qbo_time_activities ({", ".join(TIME_ACTIVITY_FIELDS)})
+    VALUES ({", ".join(f":{c}" for c in TIME_ACTIVITY_FIELDS)})
+    ON DUPLICATE KEY UPDATE
+      {", ".join(f"{c} = VALUES({c})" for c in TIME_ACTIVITY_FIELDS[2:])}
+""")
+
+_TIME_ACTIVITY_PROJECTS_SQL = text("""
+    SELECT qbo_id, project_qbo_id
+    FROM qbo_time_activities
+    WHERE realm_id = :realm_id AND qbo_id IN :qbo_ids
+    FOR UPDATE
+""").bindparams(bindparam("qbo_ids", expanding=True))
+
+
+def upsert_time_activities(
+    realm_id: str,
+    docs: list[dict],
+    stats: Optional[dict] = None,
+    run_id: Optional[int] = None,
+) -> int:
+    qbo_init_tables()
 
-                child_key = str(child.get("Id") or f"{line_key}:child:{child_idx}")
-                child_line_num = child.get("LineNum")
-                child_detail_type = child.get("DetailType")
-                child_description = child.get("Description")
-                child_amount = _parse_decimal(child.get("Amount"))
-                child_cost_amount = _parse_decimal(child.get("CostAmount"))
-
-                c_linked_txn_qbo_id, c_linked_txn_type, c_linked_txn_line_key = _first_linked_txn(child)
-
-                child_item_qbo_id = None
-                child_item_name = None
-                child_account_qbo_id = None
-                child_qty = None
-                child_unit_price = None
-                child_service_date = None
-
-                child_detail_obj = None
-                if isinstance(child_detail_type, str) and child_detail_type:
-                    child_detail_obj = child.get(child_detail_type) or {}
-
-                if child_detail_type == "SalesItemLineDetail" and isinstance(child_detail_obj, dict):
-                    child_item_qbo_id = _ref_value(child_detail_obj.get("ItemRef"))
-                    child_item_name = _ref_name(child_detail_obj.get("ItemRef"))
-                    child_account_qbo_id = _ref_value(child_detail_obj.get("ItemAccountRef"))
-                    child_qty = _parse_decimal(child_detail_obj.get("Qty"))
-                    child_unit_price = _parse_decimal(child_detail_obj.get("UnitPrice"))
-                    child_service_date = child_detail_obj.get("ServiceDate")
-
-                conn.execute(text("""
-                    INSERT INTO qbo_sales_transaction_lines (
-                      realm_id, transaction_id,
-                      transaction_entity_type, transaction_qbo_id, project_customer_qbo_id,
-                      line_num, line_key, parent_line_key, line_level,
-                      detail_type, description,
-                      group_item_qbo_id, group_item_name,
-                      item_qbo_id, item_name, account_qbo_id,
-                      qty, unit_price, amount, cost_amount, service_date,
-                      linked_txn_qbo_id, linked_txn_type, linked_txn_line_key,
-                      raw_json
-                    )
-                    VALUES (
-                      :realm_id, :transaction_id,
-                      :transaction_entity_type, :transaction_qbo_id, :project_customer_qbo_id,
-                      :line_num, :line_key, :parent_line_key, :line_level,
-                      :detail_type, :description,
-                      :group_item_qbo_id, :group_item_name,
-                      :item_qbo_id, :item_name, :account_qbo_id,
-                      :qty, :unit_price, :amount, :cost_amount, :service_date,
-                      :linked_txn_qbo_id, :linked_txn_type, :linked_txn_line_key,
-                      CAST(:raw AS JSON)
-                    )
-                    ON DUPLICATE KEY UPDATE
-                      transaction_entity_type = VALUES(transaction_entity_type),
-                      transaction_qbo_id = VALUES(transaction_qbo_id),
-                      project_customer_qbo_id = VALUES(project_customer_qbo_id),
-                      line_num = VALUES(line_num),
-                      parent_line_key = VALUES(parent_line_key),
-                      line_level = VALUES(line_level),
-                      detail_type = VALUES(detail_type),
-                      description = VALUES(description),
-                      group_item_qbo_id = VALUES(group_item_qbo_id),
-                      group_item_name = VALUES(group_item_name),
-                      item_qbo_id = VALUES(item_qbo_id),
-                      item_name = VALUES(item_name),
-                      account_qbo_id = VALUES(account_qbo_id),
-                      qty = VALUES(qty),
-                      unit_price = VALUES(unit_price),
-                      amount = VALUES(amount),
-                      cost_amount = VALUES(cost_amount),
-                      service_date = VALUES(service_date),
-                      linked_txn_qbo_id = VALUES(linked_txn_qbo_id),
-                      linked_txn_type = VALUES(linked_txn_type),
-                      linked_txn_line_key = VALUES(linked_txn_line_key),
-                      raw_json = VALUES(raw_json)
-                """), {
+    def write_chunk(conn, chunk: list[dict]) -> tuple[int]:
+        rows = [
+            dict(zip(TIME_ACTIVITY_FIELDS, r))
+            for r in (parse_time_activity(realm_id, t) for t in chunk)
+            if r is not None
+        ]
+        if rows:
+            # A TimeActivity moved to another project changes both projects' labor
+            before = {
+                a["qbo_id"]: a["project_qbo_id"]
+                for a in conn.execute(_TIME_ACTIVITY_PROJECTS_SQL, {
                     "realm_id": realm_id,
-                    "transaction_id": transaction_id,
-                    "transaction_entity_type": entity,
-                    "transaction_qbo_id": transaction_qbo_id,
-                    "project_customer_qbo_id": project_customer_qbo_id,
-                    "line_num": child_line_num,
-                    "line_key": child_key,
-                    "parent_line_key": line_key,
-                    "line_level": "child",
-                    "detail_type": child_detail_type,
-                    "description": child_description,
-                    "group_item_qbo_id": group_item_qbo_id,
-                    "group_item_name": group_item_name,
-                    "item_qbo_id": child_item_qbo_id,
-                    "item_name": child_item_name,
-                    "account_qbo_id": child_account_qbo_id,
-                    "qty": child_qty,
-                    "unit_price": child_unit_price,
-                    "amount": child_amount,
-                    "cost_amount": child_cost_amount,
-                    "service_date": child_service_date,
-                    "linked_txn_qbo_id": c_linked_txn_qbo_id,
-                    "linked_txn_type": c_linked_txn_type,
-                    "linked_txn_line_key": c_linked_txn_line_key,
-                    "raw": json.dumps(child),
-                })
-                upserted += 1
-
-    return upserted
-
-def _ref_value(obj: Any) -> Optional[str]:
-    if isinstance(obj, dict) and obj.get("value"):
-        return str(obj.get("value"))
-    return None
-
-
-def _ref_name(obj: Any) -> Optional[str]:
-    if isinstance(obj, dict) and obj.get("name"):
-        return str(obj.get("name"))
-    return None
-
-
-def _first_linked_txn(line: dict) -> tuple[Optional[str], Optional[str], Optional[str]]:
-    linked = line.get("LinkedTxn") or []
-    if isinstance(linked, list) and linked:
-        first = linked[0]
-        if isinstance(first, dict):
-            return (
-                str(first.get("TxnId")) if first.get("TxnId") else None,
-                str(first.get("TxnType")) if first.get("TxnType") else None,
-                str(first.get("TxnLineId")) if first.get("TxnLineId") else None,
-            )
-    return None, None, None
+                    "qbo_ids": [r["qbo_id"] for r in rows],
+                }).mappings()
+            }
+            conn.execute(_TIME_ACTIVITY_UPSERT_SQL, rows)
+            changes = [("TimeActivity", r["qbo_id"], r["project_qbo_id"], run_id) for r in rows]
+            changes += [
+                ("TimeActivity", r["qbo_id"], before[r["qbo_id"]], run_id)
+                for r in rows
+                if before.get(r["qbo_id"]) is not None and before[r["qbo_id"]] != r["project_qbo_id"]
+            ]
+            emit_changes(conn, changes)
+        return (len(rows),)
+
+    (count,) = _write_in_chunks(docs, write_chunk, stats, width=1)
+    return count
+
 
-def upsert_transactions_and_lines(realm_id: str, entity: str, txns: list[dict]) -> tuple[int, int, int]:
+def upsert_transactions_and_lines(
+    realm_id: str,
+    entity: str,
+    txns: list[dict],
+    stats: Optional[dict] = None,
+    mode: Optional[str] = None,
+    run_id: Optional[int] = None,
+) -> tuple[int, int, int]:
     qbo_init_tables()
-    upserted_txns = 0
-    upserted_lines = 0
-    upserted_sales_lines = 0
 
-    with engine.begin() as conn:
-        for t in txns:
-            qbo_id = str(t.get("Id") or "")
-            if not qbo_id:
-                continue
+    mode = (mode or QBO_INGEST_MODE).lower()
+    if mode not in INGEST_MODES:
+        raise ValueError(f"Unknown ingest mode: {mode}")
+
+    if mode == "staging":
+        up_txn, up_line, up_sales_line = _stage_and_merge_transactions(realm_id, entity, txns, stats, run_id)
+    else:
+        # One short transaction per chunk of documents; a document's header and
+        # lines always land in the same chunk.
+        def write_chunk(conn, chunk: list[dict]) -> tuple[int, int, int]:
+            totals = [0, 0, 0]
+            for t in chunk:
+                for i, n in enumerate(_upsert_transaction(conn, realm_id, entity, t)):
+                    totals[i] += n
+            _refresh_document_attributions(
+                conn, realm_id, entity, [str(t.get("Id")) for t in chunk if t.get("Id")], run_id
+            )
+            return totals[0], totals[1], totals[2]
 
-            # Header CustomerRef (may be absent for some types)
-            customer_qbo_id = None
-            cref = t.get("CustomerRef") or {}
-            if isinstance(cref, dict) and cref.get("value"):
-                customer_qbo_id = str(cref["value"])
-
-            # Header VendorRef
-            vendor_qbo_id = None
-            vref = t.get("VendorRef") or {}
-            if isinstance(vref, dict) and vref.get("value"):
-                vendor_qbo_id = str(vref["value"])
-
-            txn_date = t.get("TxnDate")
-            doc_number = t.get("DocNumber")
-
-            # NEW: DueDate + SalesTermRef.name
-            due_date = t.get("DueDate")  # "YYYY-MM-DD" or None
-            sales_term_name = None
-            st = t.get("SalesTermRef") or {}
-            if isinstance(st, dict):
-                sales_term_name = st.get("name")
-
-            currency_code = None
-            cur = t.get("CurrencyRef") or {}
-            if isinstance(cur, dict):
-                currency_code = cur.get("value")
-
-            total_amt = _parse_decimal(t.get("TotalAmt"))
-            balance_amt = _parse_decimal(t.get("Balance"))
-            sync_token = t.get("SyncToken")
-
-            md = t.get("MetaData") or {}
-            meta_create_time = _parse_qbo_dt(md.get("CreateTime")) if isinstance(md, dict) else None
-            meta_last_updated_time = _parse_qbo_dt(md.get("LastUpdatedTime")) if isinstance(md, dict) else None
-
-            # Upsert header (and capture transaction_id without an extra SELECT)
-            res = conn.execute(text("""
-                INSERT INTO qbo_transactions (
-                  realm_id, entity_type, qbo_id,
-                  customer_qbo_id, vendor_qbo_id,
-                  txn_date, due_date, doc_number, currency_code, total_amt, balance_amt,
-                  sales_term_name,
-                  sync_token, meta_create_time, meta_last_updated_time,
-                  raw_json
-                )
-                VALUES (
-                  :realm_id, :entity_type, :qbo_id,
-                  :customer_qbo_id, :vendor_qbo_id,
-                  :txn_date, :due_date, :doc_number, :currency_code, :total_amt, :balance_amt,
-                  :sales_term_name,
-                  :sync_token, :meta_create_time, :meta_last_updated_time,
-                  CAST(:raw AS JSON)
-                )
-                ON DUPLICATE KEY UPDATE
-                  id = LAST_INSERT_ID(id),
-                  customer_qbo_id = VALUES(customer_qbo_id),
-                  vendor_qbo_id = VALUES(vendor_qbo_id),
-                  txn_date = VALUES(txn_date),
-                  due_date = VALUES(due_date),
-                  doc_number = VALUES(doc_number),
-                  currency_code = VALUES(currency_code),
-                  total_amt = VALUES(total_amt),
-                  balance_amt = VALUES(balance_amt),
-                  sales_term_name = VALUES(sales_term_name),
-                  sync_token = VALUES(sync_token),
-                  meta_create_time = VALUES(meta_create_time),
-                  meta_last_updated_time = VALUES(meta_last_updated_time),
-                  raw_json = VALUES(raw_json)
-            """), {
-                "realm_id": realm_id,
-                "entity_type": entity,
-                "qbo_id": qbo_id,
-                "customer_qbo_id": customer_qbo_id,
-                "vendor_qbo_id": vendor_qbo_id,
-                "txn_date": txn_date,
-                "due_date": due_date,
-                "doc_number": doc_number,
-                "currency_code": currency_code,
-                "total_amt": total_amt,
-                "balance_amt": balance_amt,
-                "sales_term_name": sales_term_name,
-                "sync_token": sync_token,
-                "meta_create_time": meta_create_time,
-                "meta_last_updated_time": meta_last_updated_time,
-                "raw": json.dumps(t),
-            })
-            upserted_txns += 1
-
-            transaction_id = int(res.lastrowid)
-            if not transaction_id:
-                continue
+        up_txn, up_line, up_sales_line = _write_in_chunks(txns, write_chunk, stats)
 
-            lines = t.get("Line", []) or []
+    if entity == "TimeActivity":
+        upsert_time_activities(realm_id, txns, stats, run_id)
 
-            if entity in SALES_TRANSACTION_ENTITIES:
-                conn.execute(text("""
-                    DELETE FROM qbo_sales_transaction_lines
-                    WHERE transaction_id = :transaction_id
-                """), {"transaction_id": transaction_id})
+    return up_txn, up_line, up_sales_line
 
-            # Sales-side docs go only into qbo_sales_transaction_lines
-            upserted_sales_lines += upsert_sales_transaction_lines(
-                conn=conn,
-                realm_id=realm_id,
-                entity=entity,
-                transaction_id=transaction_id,
-                transaction_qbo_id=qbo_id,
-                project_customer_qbo_id=customer_qbo_id,
-                lines=lines,
-            )
+def _refresh_financials_for_run(run_id: int) -> dict:
+    # The sync's own writes are already committed; a failure here only leaves
+    # project_financials stale until the next run or a full rebuild.
+    from app.projects.financials import refresh_project_financials_for_run
+    try:
+        return {"financials_refreshed": refresh_project_financials_for_run(run_id)}
+    except Exception as e:
+        return {"financials_refreshed": 0, "financials_error": str(e)}
 
-            # Option A:
-            # Only non-sales entities go into qbo_transaction_lines
-            if entity not in SALES_TRANSACTION_ENTITIES:
-                for idx, line in enumerate(lines):
-                    if not isinstance(line, dict):
-                        continue
-
-                    line_key = str(line.get("Id") or f"idx:{idx}")
-                    detail_type = line.get("DetailType")
-                    description = line.get("Description")
-                    amount = _parse_decimal(line.get("Amount"))
-                    cost_amount = _parse_decimal(line.get("CostAmount"))
-
-                    line_customer_qbo_id = None
-                    account_qbo_id = None
-                    item_qbo_id = None
-                    class_qbo_id = None
-                    department_qbo_id = None
-                    vendor_qbo_id_line = None
-                    qty = None
-                    unit_price = None
-                    billable_status = None
-
-                    detail_obj = None
-                    if isinstance(detail_type, str) and detail_type:
-                        detail_obj = line.get(detail_type) or {}
-
-                    if isinstance(detail_obj, dict):
-                        cref2 = detail_obj.get("CustomerRef") or {}
-                        if isinstance(cref2, dict) and cref2.get("value"):
-                            line_customer_qbo_id = str(cref2["value"])
-
-                        aref = detail_obj.get("AccountRef") or {}
-                        if isinstance(aref, dict) and aref.get("value"):
-                            account_qbo_id = str(aref["value"])
-
-                        iref = detail_obj.get("ItemRef") or {}
-                        if isinstance(iref, dict) and iref.get("value"):
-                            item_qbo_id = str(iref["value"])
-
-                        clref = detail_obj.get("ClassRef") or {}
-                        if isinstance(clref, dict) and clref.get("value"):
-                            class_qbo_id = str(clref["value"])
-
-                        dref = detail_obj.get("DepartmentRef") or {}
-                        if isinstance(dref, dict) and dref.get("value"):
-                            department_qbo_id = str(dref["value"])
-
-                        vref2 = detail_obj.get("VendorRef") or {}
-                        if isinstance(vref2, dict) and vref2.get("value"):
-                            vendor_qbo_id_line = str(vref2["value"])
-
-                        qty = _parse_decimal(detail_obj.get("Qty"))
-                        unit_price = _parse_decimal(detail_obj.get("UnitPrice"))
-                        billable_status = detail_obj.get("BillableStatus")
-
-                    conn.execute(text("""
-                        INSERT INTO qbo_transaction_lines (
-                          realm_id, transaction_id, line_key,
-                          detail_type, description, amount, cost_amount,
-                          line_customer_qbo_id, account_qbo_id, item_qbo_id,
-                          class_qbo_id, department_qbo_id, vendor_qbo_id,
-                          qty, unit_price, billable_status,
-                          raw_json
-                        )
-                        VALUES (
-                          :realm_id, :transaction_id, :line_key,
-                          :detail_type, :description, :amount, :cost_amount,
-                          :line_customer_qbo_id, :account_qbo_id, :item_qbo_id,
-                          :class_qbo_id, :department_qbo_id, :vendor_qbo_id,
-                          :qty, :unit_price, :billable_status,
-                          CAST(:raw AS JSON)
-                        )
-                        ON DUPLICATE KEY UPDATE
-                          detail_type = VALUES(detail_type),
-                          description = VALUES(description),
-                          amount = VALUES(amount),
-                          cost_amount = VALUES(cost_amount),
-                          line_customer_qbo_id = VALUES(line_customer_qbo_id),
-                          account_qbo_id = VALUES(account_qbo_id),
-                          item_qbo_id = VALUES(item_qbo_id),
-                          class_qbo_id = VALUES(class_qbo_id),
-                          department_qbo_id = VALUES(department_qbo_id),
-                          vendor_qbo_id = VALUES(vendor_qbo_id),
-                          qty = VALUES(qty),
-                          unit_price = VALUES(unit_price),
-                          billable_status = VALUES(billable_status),
-                          raw_json = VALUES(raw_json)
-                    """), {
-                        "realm_id": realm_id,
-                        "transaction_id": transaction_id,
-                        "line_key": line_key,
-                        "detail_type": detail_type,
-                        "description": description,
-                        "amount": amount,
-                        "cost_amount": cost_amount,
-                        "line_customer_qbo_id": line_customer_qbo_id,
-                        "account_qbo_id": account_qbo_id,
-                        "item_qbo_id": item_qbo_id,
-                        "class_qbo_id": class_qbo_id,
-                        "department_qbo_id": department_qbo_id,
-                        "vendor_qbo_id": vendor_qbo_id_line,
-                        "qty": qty,
-                        "unit_price": unit_price,
-                        "billable_status": billable_status,
-                        "raw": json.dumps(line),
-                    })
-                    upserted_lines += 1
-
-    return upserted_txns, upserted_lines, upserted_sales_lines
-
-def run_transactions_sync(triggered_by: str = "manual") -> dict:
+def _warm_read_caches() -> dict:
+    # Best effort, like the financials refresh: readers fall back to building
+    # responses on demand if warming fails
+    from app.projects.rollup import warm_read_caches
+    try:
+        warm_read_caches()
+        return {"caches_warmed": True}
+    except Exception as e:
+        return {"caches_warmed": False, "cache_warm_error": str(e)}
+
+def _prune_changefeed() -> None:
+    # Best effort: a failed prune must not fail the sync that just committed
+    try:
+        prune_changes()
+    except Exception:
+        pass
+
+def run_transactions_sync(triggered_by: str = "manual", ingest_mode: Optional[str] = None) -> dict:
     run_id = log_sync_start("transactions", triggered_by)
+    stats = new_write_stats()
     try:
         realm_id, access_token = get_valid_access_token()
+        _ensure_project_attributions()
         since = _get_last_successful_sync_time("transactions")
 
+        # After an initial load, pick up everything changed since the backfill began
+        backfill_watermark = _get_backfill_watermark(realm_id)
+        if backfill_watermark and (not since or backfill_watermark > since):
+            since = backfill_watermark
+
         # Safety overlap to avoid missing edge updates
         if since:
             since = since - timedelta(minutes=5)
@@ -1066,13 +1586,20 @@ def run_transactions_sync(triggered_by: str = "manual") -> dict:
             rows = fetch_entities_incremental(realm_id, access_token, entity=entity, since=since)
             fetched_total += len(rows)
 
-            up_txn, up_line, up_sales_line = upsert_transactions_and_lines(realm_id, entity, rows)
+            up_txn, up_line, up_sales_line = upsert_transactions_and_lines(
+                realm_id, entity, rows, stats=stats, mode=ingest_mode, run_id=run_id
+            )
             upserted_txns_total += up_txn
             upserted_lines_total += up_line
             upserted_sales_lines_total += up_sales_line
 
-        log_sync_finish(run_id, True, fetched=fetched_total, upserted=upserted_txns_total)
+        log_sync_finish(run_id, True, fetched=fetched_total, upserted=upserted_txns_total, stats=stats)
+        financials = _refresh_financials_for_run(run_id)
+        _prune_changefeed()
+        warmed = _warm_read_caches()
         return {
+            **financials,
+            **warmed,
             "realm_id": realm_id,
             "entities": TRANSACTION_ENTITIES,
             "since": since.isoformat() if since else None,
@@ -1080,12 +1607,426 @@ def run_transactions_sync(triggered_by: str = "manual") -> dict:
             "transactions_upserted": upserted_txns_total,
             "lines_upserted": upserted_lines_total,
             "sales_lines_upserted": upserted_sales_lines_total,
+            "write_chunks": stats["chunks"],
+            "lock_retries": stats["lock_retries"],
+            "lock_wait_ms": stats["lock_wait_ms"],
             "run_id": run_id,
         }
     except Exception as e:
-        log_sync_finish(run_id, False, error_message=str(e))
+        log_sync_finish(run_id, False, error_message=str(e), stats=stats)
         raise
 
+# -----------------------------
+# Reference entities: Item / Account / Vendor / Class / Department
+# -----------------------------
+
+REFERENCE_TABLES = {
+    "Item": "qbo_items",
+    "Account": "qbo_accounts",
+    "Vendor": "qbo_vendors",
+    "Class": "qbo_classes",
+    "Department": "qbo_departments",
+}
+
+
+def _reference_upsert_sql(entity: str) -> Any:
+    columns = ("realm_id",) + REFERENCE_FIELDS[entity][:-1]
+    updates = list(columns[2:]) + ["raw_json"]
+    return text(f"""
+        INSERT INTO {REFERENCE_TABLES[entity]} ({", ".join(columns)}, raw_json)
+        VALUES ({", ".join(f":{c}" for c in columns)}, :raw)
+        ON DUPLICATE KEY UPDATE
+          {", ".join(f"{c} = VALUES({c})" for c in updates)}
+    """)
+
+
+_REFERENCE_UPSERT_SQL = {entity: _reference_upsert_sql(entity) for entity in REFERENCE_ENTITIES}
+
+
+def upsert_reference_entities(realm_id: str, entity: str, docs: list[dict], stats: Optional[dict] = None) -> int:
+    qbo_init_tables()
+    if entity not in REFERENCE_TABLES:
+        raise ValueError(f"Unknown reference entity: {entity}")
+
+    fields = ("realm_id",) + REFERENCE_FIELDS[entity]
+
+    def write_chunk(conn, chunk: list[dict]) -> tuple[int]:
+        rows = [
+            dict(zip(fields, (realm_id,) + r))
+            for r in (parse_reference(entity, d) for d in chunk)
+            if r is not None
+        ]
+        if rows:
+            conn.execute(_REFERENCE_UPSERT_SQL[entity], rows)
+        return (len(rows),)
+
+    (count,) = _write_in_chunks(docs, write_chunk, stats, width=1)
+    return count
+
+
+class _ReferenceCache:
+    """
+    In-process qbo_id -> name maps for the reference tables, so callers can
+    label line rows without a join. Loaded lazily and reloaded after each
+    reference sync.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._realm_id: Optional[str] = None
+        self._names: Optional[dict[str, dict[str, str]]] = None
+
+    def refresh(self, realm_id: Optional[str] = None) -> None:
+        qbo_init_tables()
+        if realm_id is None:
+            conn_row = get_connection()
+            realm_id = conn_row["realm_id"] if conn_row else None
+
+        names: dict[str, dict[str, str]] = {entity: {} for entity in REFERENCE_TABLES}
+        if realm_id:
+            with engine.connect() as conn:
+                for entity, table in REFERENCE_TABLES.items():
+                    rows = conn.execute(text(f"""
+                        SELECT qbo_id, COALESCE(fully_qualified_name, name) AS label
+                        FROM {table}
+                        WHERE realm_id = :realm_id
+                    """), {"realm_id": realm_id}).all()
+                    names[entity] = {r[0]: r[1] for r in rows if r[1] is not None}
+
+        with self._lock:
+            self._realm_id = realm_id
+            self._names = names
+
+    def _maps(self) -> dict[str, dict[str, str]]:
+        if self._names is None:
+            self.refresh()
+        return self._names or {}
+
+    def name(self, entity: str, qbo_id: Optional[str]) -> Optional[str]:
+        if not qbo_id:
+            return None
+        return self._maps().get(entity, {}).get(str(qbo_id))
+
+    def names(self, entity: str, qbo_ids) -> dict[str, Optional[str]]:
+        m = self._maps().get(entity, {})
+        return {str(i): m.get(str(i)) for i in qbo_ids if i}
+
+
+reference_cache = _ReferenceCache()
+
+
+def resolve_reference_name(entity: str, qbo_id: Optional[str]) -> Optional[str]:
+    return reference_cache.name(entity, qbo_id)
+
+
+def resolve_reference_names(entity: str, qbo_ids) -> dict[str, Optional[str]]:
+    return reference_cache.names(entity, qbo_ids)
+
+
+def run_reference_sync(triggered_by: str = "manual") -> dict:
+    run_id = log_sync_start("reference", triggered_by)
+    stats = new_write_stats()
+    try:
+        realm_id, access_token = get_valid_access_token()
+        since = _get_last_successful_sync_time("reference")
+        if since:
+            since = since - timedelta(minutes=5)
+
+        fetched_total = 0
+        upserted_total = 0
+        per_entity: dict[str, int] = {}
+
+        for entity in REFERENCE_ENTITIES:
+            rows = fetch_entities_incremental(
+                realm_id, access_token, entity=entity, since=since, include_inactive=True
+            )
+            fetched_total += len(rows)
+            upserted = upsert_reference_entities(realm_id, entity, rows, stats=stats)
+            upserted_total += upserted
+            per_entity[entity] = upserted
+
+        reference_cache.refresh(realm_id)
+
+        log_sync_finish(run_id, True, fetched=fetched_total, upserted=upserted_total, stats=stats)
+        return {
+            "realm_id": realm_id,
+            "since": since.isoformat() if since else None,
+            "fetched_total": fetched_total,
+            "upserted": per_entity,
+            "lock_wait_ms": stats["lock_wait_ms"],
+            "run_id": run_id,
+        }
+    except Exception as e:
+        log_sync_finish(run_id, False, error_message=str(e), stats=stats)
+        raise
+
+# -----------------------------
+# Initial load: TxnDate-sharded, parallel, checkpointed per shard
+# -----------------------------
+
+def _txn_date_bounds(realm_id: str, access_token: str, entity: str) -> tuple[Optional[date], Optional[date]]:
+    bounds = []
+    for order in ("ASC", "DESC"):
+        data = _qbo_query(realm_id, access_token, f"SELECT * FROM {entity} ORDERBY TxnDate {order} MAXRESULTS 1")
+        rows = data.get("QueryResponse", {}).get(entity, []) or []
+        try:
+            bounds.append(date.fromisoformat(rows[0]["TxnDate"]) if rows else None)
+        except Exception:
+            bounds.append(None)
+    return bounds[0], bounds[1]
+
+
+def _plan_entity_shards(realm_id: str, access_token: str, entity: str, shard_size: int) -> list[dict]:
+    total = _qbo_count(realm_id, access_token, entity)
+    if total == 0:
+        return []
+
+    whole = [{"date_from": None, "date_to": None, "expected_count": total}]
+    if total <= shard_size:
+        return whole
+
+    lo, hi = _txn_date_bounds(realm_id, access_token, entity)
+    if not lo or not hi:
+        return whole
+
+    # Bisect the TxnDate range until every shard fits the target size (COUNT(*) preflight)
+    shards: list[dict] = []
+    stack = [(lo, hi + timedelta(days=1))]
+    while stack:
+        a, b = stack.pop()
+        n = _qbo_count(realm_id, access_token, entity, _qbo_where(txn_date_from=a, txn_date_to=b))
+        if n > shard_size and (b - a).days > 1:
+            mid = a + timedelta(days=(b - a).days // 2)
+            stack.append((mid, b))
+            stack.append((a, mid))
+        elif n:
+            shards.append({"date_from": a, "date_to": b, "expected_count": n})
+
+    if not shards:
+        return whole
+
+    # Open the outer edges so documents re-dated outside the planned range are still covered
+    shards[0]["date_from"] = None
+    shards[-1]["date_to"] = None
+    return shards
+
+
+def _save_backfill_shards(backfill_id: int, realm_id: str, entity: str, shards: list[dict]) -> None:
+    if not shards:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO qbo_backfill_shards (backfill_id, realm_id, entity_type, date_from, date_to, expected_count)
+            VALUES (:backfill_id, :realm_id, :entity_type, :date_from, :date_to, :expected_count)
+        """), [
+            {
+                "backfill_id": backfill_id,
+                "realm_id": realm_id,
+                "entity_type": entity,
+                "date_from": s["date_from"],
+                "date_to": s["date_to"],
+                "expected_count": int(s["expected_count"]),
+            }
+            for s in shards
+        ])
+
+
+def _find_resumable_backfill(realm_id: str) -> Optional[int]:
+    # Only the realm's latest backfill resumes; shards left over from an older
+    # one are superseded once a newer backfill exists
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT backfill_id
+            FROM qbo_backfill_shards
+            WHERE realm_id = :realm_id
+              AND backfill_id = (SELECT MAX(backfill_id) FROM qbo_backfill_shards WHERE realm_id = :realm_id)
+              AND status <> 'done'
+            LIMIT 1
+        """), {"realm_id": realm_id}).mappings().first()
+    return int(row["backfill_id"]) if row else None
+
+
+def _load_pending_backfill_shards(backfill_id: int) -> list[dict]:
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT id, backfill_id, entity_type, date_from, date_to, expected_count
+            FROM qbo_backfill_shards
+            WHERE backfill_id = :backfill_id AND status <> 'done'
+            ORDER BY id
+        """), {"backfill_id": backfill_id}).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def _mark_shard_running(shard_id: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE qbo_backfill_shards
+            SET status = 'running',
+                attempts = attempts + 1,
+                started_at = UTC_TIMESTAMP(),
+                finished_at = NULL,
+                error_message = NULL
+            WHERE id = :id
+        """), {"id": shard_id})
+
+
+def _mark_shard_finished(shard_id: int, success: bool, fetched: int = 0, upserted: int = 0, error_message: str | None = None) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE qbo_backfill_shards
+            SET status = :status,
+                finished_at = UTC_TIMESTAMP(),
+                fetched_count = :fetched,
+                upserted_count = :upserted,
+                error_message = :error_message
+            WHERE id = :id
+        """), {
+            "id": shard_id,
+            "status": "done" if success else "failed",
+            "fetched": int(fetched or 0),
+            "upserted": int(upserted or 0),
+            "error_message": error_message,
+        })
+
+
+def _run_backfill_shard(realm_id: str, shard: dict, ingest_mode: Optional[str] = None) -> dict:
+    entity = shard["entity_type"]
+    stats = new_write_stats()
+    error_message = None
+
+    for attempt in range(1, QBO_BACKFILL_MAX_ATTEMPTS + 1):
+        _mark_shard_running(shard["id"])
+        try:
+            _, access_token = get_valid_access_token()
+            rows = fetch_entities_incremental(
+                realm_id,
+                access_token,
+                entity=entity,
+                txn_date_from=shard["date_from"],
+                txn_date_to=shard["date_to"],
+            )
+            up_txn, up_line, up_sales_line = upsert_transactions_and_lines(
+                realm_id, entity, rows, stats=stats, mode=ingest_mode, run_id=shard["backfill_id"]
+            )
+            _mark_shard_finished(shard["id"], True, fetched=len(rows), upserted=up_txn)
+            return {
+                "ok": True,
+                "stats": stats,
+                "fetched": len(rows),
+                "transactions": up_txn,
+                "lines": up_line,
+                "sales_lines": up_sales_line,
+            }
+        except Exception as e:
+            error_message = str(e)
+            _mark_shard_finished(shard["id"], False, error_message=error_message)
+            if attempt < QBO_BACKFILL_MAX_ATTEMPTS:
+                time.sleep(2 * attempt)
+
+    return {"ok": False, "stats": stats, "error": error_message}
+
+
+def run_transactions_backfill(
+    triggered_by: str = "manual",
+    resume: bool = True,
+    ingest_mode: Optional[str] = None,
+) -> dict:
+    """
+    Initial load. Each entity's history is split into TxnDate shards sized by a
+    COUNT(*) preflight; shards are fetched in parallel (sharing the realm's rate
+    budget) and written independently. Each shard is checkpointed, so a rerun
+    only retries the shards that did not finish.
+    """
+    run_id = log_sync_start("transactions_backfill", triggered_by)
+    stats = new_write_stats()
+    try:
+        realm_id, access_token = get_valid_access_token()
+        _ensure_project_attributions()
+
+        backfill_id = _find_resumable_backfill(realm_id) if resume else None
+        resumed = backfill_id is not None
+        if not resumed:
+            backfill_id = run_id
+            for entity in TRANSACTION_ENTITIES:
+                shards = _plan_entity_shards(realm_id, access_token, entity, QBO_BACKFILL_SHARD_SIZE)
+                _save_backfill_shards(backfill_id, realm_id, entity, shards)
+
+        pending = _load_pending_backfill_shards(backfill_id)
+
+        fetched_total = 0
+        upserted_txns_total = 0
+        upserted_lines_total = 0
+        upserted_sales_lines_total = 0
+        failed = []
+
+        with ThreadPoolExecutor(max_workers=max(1, QBO_BACKFILL_WORKERS)) as pool:
+            futures = {pool.submit(_run_backfill_shard, realm_id, s, ingest_mode): s for s in pending}
+            for fut in as_completed(futures):
+                result = fut.result()
+                merge_write_stats(stats, result["stats"])
+                if not result["ok"]:
+                    failed.append(futures[fut]["id"])
+                    continue
+                fetched_total += result["fetched"]
+                upserted_txns_total += result["transactions"]
+                upserted_lines_total += result["lines"]
+                upserted_sales_lines_total += result["sales_lines"]
+
+        success = not failed
+        log_sync_finish(
+            run_id,
+            success,
+            fetched=fetched_total,
+            upserted=upserted_txns_total,
+            error_message=None if success else f"{len(failed)} shard(s) failed; run the backfill again to retry them",
+            stats=stats,
+        )
+        financials = _refresh_financials_for_run(backfill_id)
+        warmed = _warm_read_caches()
+        return {
+            **financials,
+            **warmed,
+            "realm_id": realm_id,
+            "backfill_id": backfill_id,
+            "resumed": resumed,
+            "shards_run": len(pending),
+            "shards_failed": failed,
+            "fetched_total": fetched_total,
+            "transactions_upserted": upserted_txns_total,
+            "lines_upserted": upserted_lines_total,
+            "sales_lines_upserted": upserted_sales_lines_total,
+            "lock_wait_ms": stats["lock_wait_ms"],
+            "run_id": run_id,
+        }
+    except Exception as e:
+        log_sync_finish(run_id, False, error_message=str(e), stats=stats)
+        raise
+
+
+def backfill_status(realm_id: str) -> dict | None:
+    # The realm's latest backfill, same scope as _find_resumable_backfill
+    qbo_init_tables()
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT backfill_id, entity_type, status,
+                   COUNT(*) AS shard_ct,
+                   SUM(expected_count) AS expected_count,
+                   SUM(fetched_count) AS fetched_count
+            FROM qbo_backfill_shards
+            WHERE realm_id = :realm_id
+              AND backfill_id = (SELECT MAX(backfill_id) FROM qbo_backfill_shards WHERE realm_id = :realm_id)
+            GROUP BY backfill_id, entity_type, status
+            ORDER BY entity_type, status
+        """), {"realm_id": realm_id}).mappings().all()
+
+    if not rows:
+        return None
+    return {
+        "backfill_id": int(rows[0]["backfill_id"]),
+        "shards": [dict(r) for r in rows],
+    }
+
+
 def backfill_sales_lines_from_existing():
     qbo_init_tables()
 
@@ -1136,4 +2077,76 @@ def backfill_sales_lines_from_existing():
 
             total += inserted
 
-    return {"sales_lines_backfilled": total}
\ No newline at end of file
+    return {"sales_lines_backfilled": total}
+
+
+def backfill_time_activities_from_existing():
+    qbo_init_tables()
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT realm_id, raw_json
+            FROM qbo_transactions
+            WHERE entity_type = 'TimeActivity'
+        """)).mappings().all()
+
+    docs_by_realm: dict[str, list[dict]] = {}
+    for r in rows:
+        raw = r["raw_json"]
+        if isinstance(raw, (str, bytes, bytearray)):
+            raw = json.loads(raw)
+        if isinstance(raw, dict):
+            docs_by_realm.setdefault(r["realm_id"], []).append(raw)
+
+    total = 0
+    for realm_id, docs in docs_by_realm.items():
+        total += upsert_time_activities(realm_id, docs)
+
+    # These rows carry no sync run, so the per-run refresh never sees them
+    return {"time_activities_backfilled": total, **_rebuild_financials()}
+
+
+ATTRIBUTION_REBUILD_CHUNK = 5000    # transactions per commit
+
+def rebuild_project_attributions():
+    qbo_init_tables()
+    with engine.connect() as conn:
+        lo, hi = conn.execute(text("SELECT MIN(id), MAX(id) FROM qbo_transactions")).one()
+
+    # Short transactions over id ranges so writers are never blocked for the
+    # whole history. No changefeed rows: this touches every project, and the
+    # financials rebuild below bumps the data version once at the end.
+    start = int(lo or 0)
+    while hi is not None and start <= hi:
+        with engine.begin() as conn:
+            _refresh_project_attributions(
+                conn,
+                "t.id >= :lo AND t.id < :hi",
+                {"lo": start, "hi": start + ATTRIBUTION_REBUILD_CHUNK},
+                emit=False,
+            )
+        start += ATTRIBUTION_REBUILD_CHUNK
+
+    with engine.connect() as conn:
+        total = conn.execute(text("SELECT COUNT(*) FROM qbo_project_attributions")).scalar()
+    return {"project_attributions": int(total or 0), **_rebuild_financials()}
+
+
+def _ensure_project_attributions() -> None:
+    # Transactions synced before attribution existed get filled once, on the
+    # first sync after deploy, by the chunked rebuild rather than in the DDL
+    # transaction of qbo_init_tables. Same as python -m app.qbo.backfill_project_attributions.
+    with engine.connect() as conn:
+        filled = conn.execute(text("SELECT 1 FROM qbo_project_attributions LIMIT 1")).first()
+        pending = conn.execute(text("""
+            SELECT 1 FROM qbo_transactions WHERE entity_type <> 'TimeActivity' LIMIT 1
+        """)).first()
+    if pending and not filled:
+        rebuild_project_attributions()
+
+
+def _rebuild_financials() -> dict:
+    # Backfills rewrite what project_financials is computed from; the full
+    # rebuild also bumps the data version so cached responses move on
+    from app.projects.financials import rebuild_project_financials
+    return rebuild_project_financials()
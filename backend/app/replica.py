@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy.engine import Engine
+
+from app.data_version import read_data_version, read_data_version_async
+from app.db import engine, get_async_engine, replica_engine
+
+# Read routing. GET endpoints behind conditional_get already know the
+# primary's data version for this request; the replica serves the read only
+# once it has replayed at least that version, which also gives
+# read-your-writes right after assignment/save or a sync. Otherwise, or
+# when the replica is unreachable, the read goes to the primary.
+DB_READ_RECHECK_SECONDS = float(os.getenv("DB_READ_RECHECK_SECONDS", "1"))
+DB_READ_RETRY_SECONDS = float(os.getenv("DB_READ_RETRY_SECONDS", "30"))
+
+
+class _ReplicaState:
+    """
+    Last data version seen on the replica. Versions only move forward, so a
+    cached value that already covers the wanted one needs no probe; a
+    lagging replica is re-probed at most once per DB_READ_RECHECK_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version: Optional[tuple] = None
+        self.checked_at = 0.0
+        self.down_until = 0.0
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def _covers(self, wanted: tuple) -> bool:
+        return self.version is not None and all(r >= w for r, w in zip(self.version, wanted))
+
+    def caught_up(self, wanted: tuple) -> bool:
+        if time.monotonic() < self.down_until:
+            return False
+        if self._covers(wanted):
+            return True
+
+        with self._lock:
+            if self._covers(wanted):
+                return True
+            now = time.monotonic()
+            if now - self.checked_at < DB_READ_RECHECK_SECONDS:
+                return False
+            self.checked_at = now
+            try:
+                with replica_engine.connect() as conn:
+                    self.version = read_data_version(conn)
+            except Exception:
+                self.down_until = now + DB_READ_RETRY_SECONDS
+                return False
+            return self._covers(wanted)
+
+    async def caught_up_async(self, wanted: tuple) -> bool:
+        # Runs on the event loop, so claiming checked_at before the await is
+        # enough to keep concurrent requests from all probing at once
+        now = time.monotonic()
+        if now < self.down_until:
+            return False
+        if self._covers(wanted):
+            return True
+        if now - self.checked_at < DB_READ_RECHECK_SECONDS:
+            return False
+        self.checked_at = now
+        try:
+            async with get_async_engine(replica=True).connect() as conn:
+                self.version = await read_data_version_async(conn)
+        except Exception:
+            self.down_until = now + DB_READ_RETRY_SECONDS
+            return False
+        return self._covers(wanted)
+
+    def stats(self) -> dict:
+        return {
+            "configured": replica_engine is not None,
+            "version": list(self.version) if self.version else None,
+            "down": time.monotonic() < self.down_until,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+_state = _ReplicaState()
+
+
+def reader_for(version: Optional[tuple]) -> Engine:
+    """
+    Engine for a read that must reflect at least `version` (from
+    current_version()). No version, or no replica configured: the primary.
+    """
+    if replica_engine is None or version is None:
+        return engine
+    if _state.caught_up(tuple(version[:2])):
+        _state.replica_reads += 1
+        return replica_engine
+    _state.primary_reads += 1
+    return engine
+
+
+async def async_reader_for(version: Optional[tuple]):
+    """reader_for for the async endpoints: an AsyncEngine, same rules."""
+    if replica_engine is None or version is None:
+        return get_async_engine()
+    if await _state.caught_up_async(tuple(version[:2])):
+        _state.replica_reads += 1
+        return get_async_engine(replica=True)
+    _state.primary_reads += 1
+    return get_async_engine()
+
+
+_routed: ContextVar[Optional[Engine]] = ContextVar("read_engine", default=None)
+
+
+def read_engine() -> Engine:
+    """Engine for report queries: routed inside reading_from(), else the primary."""
+    return _routed.get() or engine
+
+
+@contextmanager
+def reading_from(version: Optional[tuple]):
+    token = _routed.set(reader_for(version))
+    try:
+        yield
+    finally:
+        _routed.reset(token)
+
+
+def replica_stats() -> dict:
+    return _state.stats()
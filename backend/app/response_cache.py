@@ -0,0 +1,173 @@
+import gzip
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.data_version import GZIP_ETAG_SUFFIX
+from app.fast_json import dumps
+from app.replica import async_reader_for, reading_from
+
+# Serialized (and gzipped) JSON bodies of the heavy read endpoints, keyed by
+# endpoint, canonical query string and data version. A version bump makes
+# old entries unreachable; clear() on sync/assignment writes frees them.
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+# Bodies smaller than this aren't worth a gzip copy
+GZIP_MIN_BYTES = 1024
+
+
+def canonical_query(query: str) -> str:
+    return urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def serialize(payload: Any) -> bytes:
+    return dumps(payload)
+
+
+class _Entry:
+    __slots__ = ("body", "gz", "created_at")
+
+    def __init__(self, body: bytes, gz: Optional[bytes]):
+        self.body = body
+        self.gz = gz
+        self.created_at = time.monotonic()
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gz or b"")
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at >= self.ttl_seconds:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, payload: Any) -> _Entry:
+        body = serialize(payload)
+        gz = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+        entry = _Entry(body, gz)
+        if entry.size > self.max_bytes:
+            return entry
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return entry
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+
+
+def cache_key(name: str, query: str, version: tuple) -> tuple:
+    return (name, canonical_query(query), version)
+
+
+def cached_json(request: Request, name: str, build: Callable[[], Any]) -> Response:
+    """
+    Returns the endpoint's JSON from the cache, building it on a miss.
+    Expects conditional_get to have run, which leaves the data version and
+    ETag headers on request.state. build() runs with read_engine() routed to
+    the replica when it has caught up with that version.
+    """
+    version = request.state.data_version
+    key = cache_key(name, request.url.query, version)
+
+    entry = response_cache.get(key)
+    if entry is None:
+        with reading_from(version):
+            payload = build()
+        entry = response_cache.put(key, payload)
+    return _respond(request, entry)
+
+
+async def cached_json_async(request: Request, name: str, build: Callable[[Any], Awaitable[Any]]) -> Response:
+    """
+    cached_json for async def endpoints: build(async_engine) is awaited on
+    a miss, with the engine picked by async_reader_for. Serializing and
+    gzipping a large body is CPU work, so that part goes to the threadpool.
+    """
+    version = request.state.data_version
+    key = cache_key(name, request.url.query, version)
+
+    entry = response_cache.get(key)
+    if entry is None:
+        payload = await build(await async_reader_for(version))
+        entry = await run_in_threadpool(response_cache.put, key, payload)
+    return _respond(request, entry)
+
+
+def _respond(request: Request, entry: _Entry) -> Response:
+    headers = dict(getattr(request.state, "etag_headers", {}))
+    headers["Vary"] = "Accept, Accept-Encoding"
+    if entry.gz is not None and "gzip" in (request.headers.get("accept-encoding") or ""):
+        headers["Content-Encoding"] = "gzip"
+        if "ETag" in headers:
+            headers["ETag"] = headers["ETag"][:-1] + f'{GZIP_ETAG_SUFFIX}"'
+        return Response(entry.gz, media_type="application/json", headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def warm(name: str, query: str, version: tuple, build: Callable[[], Any]) -> None:
+    response_cache.put(cache_key(name, query, version), build())
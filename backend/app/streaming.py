@@ -0,0 +1,68 @@
+import os
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.fast_json import dumps
+
+# Opt-in line-delimited output for the big list endpoints: one JSON object
+# per row, written as the server-side cursor yields them, then one trailer
+# line {"_meta": {...}}. A stream without the trailer was cut short.
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows PyMySQL's unbuffered cursor hands over per fetch
+STREAM_YIELD_PER = int(os.getenv("STREAM_YIELD_PER", "200"))
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in (request.headers.get("accept") or "")
+
+
+def stream_rows(conn, stmt, params: Optional[dict] = None) -> Iterator[dict]:
+    """
+    Yields rows one at a time without buffering the result set. The result
+    must be read to the end before `conn` runs another statement.
+    """
+    result = conn.execute(
+        stmt,
+        params or {},
+        execution_options={"stream_results": True, "yield_per": STREAM_YIELD_PER},
+    )
+    for row in result.mappings():
+        yield dict(row)
+
+
+def ndjson_response(request: Request, lines: Callable[[Any], Iterable[dict]]) -> StreamingResponse:
+    """
+    Streams `lines(conn)` as NDJSON on a connection held for the duration
+    of the response. Validate inputs before calling this: once the first
+    line is out the status code can't change. Keeps the ETag from
+    conditional_get when it ran, and reads from the replica when it has
+    caught up with that version.
+    """
+    # Lazy: app.replica -> app.data_version -> app.streaming
+    from app.replica import reader_for
+
+    bind = reader_for(getattr(request.state, "data_version", None))
+    headers = dict(getattr(request.state, "etag_headers", {}))
+    headers["Vary"] = "Accept, Accept-Encoding"
+
+    def body():
+        with bind.connect() as conn:
+            for obj in lines(conn):
+                yield dumps(obj) + b"\n"
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def stream_table(stmt, params: Optional[dict] = None) -> Callable[[Any], Iterator[dict]]:
+    # Every row of one query, then the row count
+    def lines(conn):
+        n = 0
+        for row in stream_rows(conn, stmt, params):
+            n += 1
+            yield row
+        yield {"_meta": {"row_count": n}}
+
+    return lines
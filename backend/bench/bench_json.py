@@ -0,0 +1,112 @@
+"""
+Response serialization benchmark on a synthetic project rollup.
+
+Run from backend/:
+
+    python -m bench.bench_json                 # 5000 rows, best of 5
+    python -m bench.bench_json --rows 2000
+
+Compares FastAPI's default path (jsonable_encoder + JSONResponse.render)
+with app.fast_json.dumps on rows shaped like build_rollup_sql output:
+Decimal amounts, datetimes, dates, ints and short strings. No database
+needed. Also checks both paths decode to the same JSON.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.fast_json import dumps
+
+AMOUNT_COLUMNS = (
+    "project_balance", "estimate_amt", "invoice_amt", "invoice_bal", "bill_amt", "expense_amt",
+    "vendorcredit_amt", "creditmemo_amt", "creditmemo_bal", "labor_hours", "labor_cost",
+    "total_income", "total_cost", "total_profit",
+)
+COUNT_COLUMNS = (
+    "file_count", "estimate_ct", "invoice_ct", "bill_ct", "expense_ct", "vendorcredit_ct",
+    "creditmemo_ct", "total_transaction_ct", "age_days",
+)
+STATUSES = ("not_started", "scheduled", "in_progress", "completed", "on_hold")
+
+
+def make_rows(n: int, seed: int = 7) -> list[dict]:
+    rnd = random.Random(seed)
+    base = datetime(2024, 1, 1, 8, 0, 0)
+    rows = []
+    for i in range(n):
+        created = base + timedelta(days=rnd.randint(0, 900), seconds=rnd.randint(0, 86400))
+        start = created.date() + timedelta(days=rnd.randint(0, 60))
+        row = {
+            "qbo_customer_id": i + 1,
+            "start_date": start if rnd.random() < 0.8 else None,
+            "end_date": start + timedelta(days=rnd.randint(1, 30)) if rnd.random() < 0.7 else None,
+            "primary_project_manager": rnd.choice(("Dana Reyes", "Sam Ortiz", "Lee Park", None)),
+            "primary_work_crew": rnd.choice(("Crew A1", "Crew B2", "Crew C1", None)),
+            "project_qbo_id": str(5000 + i),
+            "project_name": f"Customer {i // 3}:Project {i}",
+            "project_create_dttm": created,
+            "project_lastupdate_dttm": created + timedelta(days=rnd.randint(0, 200)),
+            "needs_assignment": rnd.randint(0, 1),
+            "project_status": rnd.choice(STATUSES),
+        }
+        for c in AMOUNT_COLUMNS:
+            row[c] = Decimal(rnd.randint(0, 25_000_000)).scaleb(-2)
+        for c in COUNT_COLUMNS:
+            row[c] = rnd.randint(0, 40)
+        row["profit_margin"] = Decimal(rnd.randint(-5000, 9000)).scaleb(-4)
+        rows.append(row)
+    return rows
+
+
+def payload(rows: list[dict]) -> dict:
+    return {"summary": {"total_projects": len(rows), "avg_age_days": 41.5}, "projects": rows, "next_cursor": None}
+
+
+def default_path(content) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_path(content) -> bytes:
+    return dumps(content)
+
+
+def best_of(fn, content, repeat: int) -> tuple[float, bytes]:
+    best, body = None, b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(content)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best or 1e-9, body
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--rows", type=int, default=5000)
+    p.add_argument("--repeat", type=int, default=5, help="rounds per path; best round is reported")
+    args = p.parse_args(argv)
+
+    content = payload(make_rows(args.rows))
+    before, before_body = best_of(default_path, content, args.repeat)
+    after, after_body = best_of(fast_path, content, args.repeat)
+
+    if json.loads(before_body) != json.loads(after_body):
+        print("fast_json output differs from jsonable_encoder", file=sys.stderr)
+        return 1
+
+    print(f"{'path':<28}{'ms':>10}{'bytes':>12}")
+    print(f"{'jsonable_encoder + json':<28}{before * 1000:>10.1f}{len(before_body):>12,}")
+    print(f"{'fast_json (orjson)':<28}{after * 1000:>10.1f}{len(after_body):>12,}")
+    print(f"speedup: {before / after:.1f}x on {args.rows} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+Parser micro-benchmark over the recorded QBO payloads in bench/qbo_payloads.
+
+Run from backend/:
+
+    python -m bench.bench_parsers                      # print docs/sec per entity
+    python -m bench.bench_parsers --save-baseline      # record current numbers
+    python -m bench.bench_parsers --check              # fail on output drift or slowdown
+    python -m bench.bench_parsers --save-expected      # record current parser output
+
+--check first runs every parser over each recorded payload and compares
+the row tuples with bench/parser_expected.json, then compares speed with
+the saved baseline. Exit code is 1 when any row differs or an entity is
+more than --tolerance slower, so it can gate a deploy script.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+from app.qbo.parsers import (
+    SALES_LINE_FIELDS,
+    TIME_ACTIVITY_FIELDS,
+    TRANSACTION_FIELDS,
+    TRANSACTION_LINE_FIELDS,
+    TXN_CUSTOMER_QBO_ID,
+    parse_document,
+    parse_sales_lines,
+    parse_time_activity,
+    parse_transaction,
+    parse_transaction_lines,
+)
+
+PAYLOAD_DIR = Path(__file__).parent / "qbo_payloads"
+BASELINE_PATH = Path(__file__).parent / "parser_baseline.json"
+EXPECTED_PATH = Path(__file__).parent / "parser_expected.json"
+REALM_ID = "9130350000000000"
+
+
+def load_corpus() -> dict[str, list[dict]]:
+    corpus: dict[str, list[dict]] = {}
+    for path in sorted(PAYLOAD_DIR.glob("*.json")):
+        qr = json.loads(path.read_text()).get("QueryResponse") or {}
+        for entity, docs in qr.items():
+            if isinstance(docs, list) and docs:
+                corpus.setdefault(entity, []).extend(docs)
+    return corpus
+
+
+def _plain(fields: tuple[str, ...], row) -> list:
+    # JSON-comparable row; the raw column is just json.dumps of the input
+    out = []
+    for name, v in zip(fields, row):
+        if name == "raw":
+            continue
+        if isinstance(v, Decimal):
+            v = str(v)
+        elif isinstance(v, (date, datetime)):
+            v = v.isoformat()
+        out.append(v)
+    return out
+
+
+def parse_outputs(corpus: dict[str, list[dict]]) -> dict:
+    """entity -> doc Id -> every parser's rows for that document."""
+    out: dict[str, dict] = {}
+    for entity, docs in sorted(corpus.items()):
+        for t in docs:
+            header = parse_transaction(REALM_ID, entity, t)
+            if header is None:
+                continue
+            lines = t.get("Line", []) or []
+            doc = {
+                "header": _plain(TRANSACTION_FIELDS, header),
+                "lines": [_plain(TRANSACTION_LINE_FIELDS, r) for r in parse_transaction_lines(REALM_ID, lines)],
+                "sales_lines": [
+                    _plain(SALES_LINE_FIELDS, r)
+                    for r in parse_sales_lines(REALM_ID, entity, str(t["Id"]), header[TXN_CUSTOMER_QBO_ID], lines)
+                ],
+            }
+            if entity == "TimeActivity":
+                doc["time_activity"] = _plain(TIME_ACTIVITY_FIELDS, parse_time_activity(REALM_ID, t))
+            out.setdefault(entity, {})[str(t["Id"])] = doc
+    return out
+
+
+def diff_outputs(expected: dict, actual: dict) -> list[str]:
+    problems = []
+    for entity in sorted(set(expected) | set(actual)):
+        exp_docs = expected.get(entity) or {}
+        act_docs = actual.get(entity) or {}
+        for doc_id in sorted(set(exp_docs) | set(act_docs)):
+            exp = exp_docs.get(doc_id)
+            act = act_docs.get(doc_id)
+            if exp is None or act is None:
+                problems.append(f"{entity} {doc_id}: {'unexpected' if exp is None else 'missing'} document")
+                continue
+            for part in sorted(set(exp) | set(act)):
+                want, got = exp.get(part), act.get(part)
+                if want == got:
+                    continue
+                if part in ("lines", "sales_lines") and want is not None and got is not None and len(want) == len(got):
+                    # Point at the rows that moved rather than the whole list
+                    problems.extend(
+                        f"{entity} {doc_id} {part}[{i}]: expected {w!r}, got {g!r}"
+                        for i, (w, g) in enumerate(zip(want, got))
+                        if w != g
+                    )
+                else:
+                    problems.append(f"{entity} {doc_id} {part}: expected {want!r}, got {got!r}")
+    return problems
+
+
+def _expand(docs: list[dict], n: int) -> list[dict]:
+    # Cycle the recorded docs up to n, giving each copy its own Id
+    out = []
+    for i in range(n):
+        d = dict(docs[i % len(docs)])
+        d["Id"] = str(100000 + i)
+        out.append(d)
+    return out
+
+
+def bench_entity(entity: str, docs: list[dict], n: int, repeat: int) -> dict:
+    batch = _expand(docs, n)
+
+    def parse_all():
+        count = lines = 0
+        for t in batch:
+            parsed = parse_document(REALM_ID, entity, t)
+            if parsed is None:
+                continue
+            count += 1
+            lines += len(parsed[1]) + len(parsed[2])
+        return count, lines
+
+    best = None
+    parsed_docs = parsed_lines = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parsed_docs, parsed_lines = parse_all()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    best = best or 1e-9
+    return {
+        "docs": parsed_docs,
+        "lines": parsed_lines,
+        "seconds": round(best, 6),
+        "docs_per_sec": round(parsed_docs / best, 1),
+    }
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--docs", type=int, default=5000, help="documents parsed per entity per round")
+    p.add_argument("--repeat", type=int, default=5, help="rounds per entity; best round is reported")
+    p.add_argument("--entity", action="append", help="limit to one or more entity types")
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--check", action="store_true", help="compare output and speed against the saved files")
+    p.add_argument("--save-expected", action="store_true", help="record current parser output")
+    p.add_argument("--tolerance", type=float, default=0.20, help="allowed slowdown fraction for --check")
+    p.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    p.add_argument("--expected", type=Path, default=EXPECTED_PATH)
+    args = p.parse_args(argv)
+
+    corpus = load_corpus()
+    if args.entity:
+        corpus = {e: d for e, d in corpus.items() if e in set(args.entity)}
+    if not corpus:
+        print("no payloads found", file=sys.stderr)
+        return 2
+
+    outputs = parse_outputs(corpus)
+    if args.save_expected:
+        args.expected.write_text(json.dumps(outputs, indent=2) + "\n")
+        print(f"expected output saved to {args.expected}")
+    if args.check:
+        if not args.expected.exists():
+            print(f"no expected output at {args.expected}; run with --save-expected first", file=sys.stderr)
+            return 2
+        expected = json.loads(args.expected.read_text())
+        if args.entity:
+            expected = {e: d for e, d in expected.items() if e in set(args.entity)}
+        drift = diff_outputs(expected, outputs)
+        for line in drift:
+            print(line, file=sys.stderr)
+        if drift:
+            print(f"parser output differs from {args.expected} in {len(drift)} place(s)", file=sys.stderr)
+            return 1
+        print(f"parser output matches {args.expected.name}")
+
+    results = {e: bench_entity(e, docs, args.docs, args.repeat) for e, docs in sorted(corpus.items())}
+
+    baseline = {}
+    if args.check:
+        if not args.baseline.exists():
+            print(f"no baseline at {args.baseline}; run with --save-baseline first", file=sys.stderr)
+            return 2
+        baseline = json.loads(args.baseline.read_text())
+
+    failed = []
+    print(f"{'entity':<14}{'docs/sec':>12}{'lines':>10}{'baseline':>12}{'delta':>9}")
+    for entity, r in results.items():
+        base = (baseline.get(entity) or {}).get("docs_per_sec")
+        delta = ""
+        if base:
+            change = r["docs_per_sec"] / base - 1
+            delta = f"{change:+.1%}"
+            if change < -args.tolerance:
+                failed.append(entity)
+        print(f"{entity:<14}{r['docs_per_sec']:>12,.0f}{r['lines']:>10}{base or '':>12}{delta:>9}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"baseline saved to {args.baseline}")
+
+    if failed:
+        print(f"slower than baseline by more than {args.tolerance:.0%}: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Typeahead search timing on a synthetic customer/project list.
+
+Run from backend/:
+
+    python -m bench.bench_search                      # 20000 projects
+    python -m bench.bench_search --projects 100000 --budget-ms 5
+
+Reports the one-off index build (paid on the first search and on the
+hourly rebuild), an incremental refresh of --changed entries (what a sync
+or an assignment save costs) and the best per-query time over --repeat
+rounds for short, mid-word and multi-word queries. Exit code is 1 when a
+query takes longer than --budget-ms. No database needed.
+"""
+import argparse
+import random
+import sys
+import time
+
+from app.projects.search import SearchSnapshot
+
+WORDS = (
+    "kitchen bath remodel roof deck fence basement addition garage patio siding window "
+    "porch attic flooring paint drywall plumbing electrical hvac landscape driveway pool"
+).split()
+STREETS = "oak maple cedar pine elm birch willow aspen spruce walnut hickory chestnut".split()
+SURNAMES = (
+    "smith johnson williams brown jones garcia miller davis rodriguez martinez hernandez "
+    "lopez gonzalez wilson anderson thomas taylor moore jackson martin lee perez thompson"
+).split()
+QUERIES = ("sm", "kit", "ki ba", "smith kitchen", "mapl", "hernandez roof deck", "zzzz")
+
+
+def make_rows(n_projects: int, seed: int = 7) -> tuple[list[dict], dict, dict]:
+    rnd = random.Random(seed)
+    pm_names = {i: f"{rnd.choice(SURNAMES).title()} {rnd.choice(SURNAMES).title()}" for i in range(1, 21)}
+    crew_names = {i: f"Crew {rnd.choice(STREETS).title()} {i}" for i in range(1, 31)}
+
+    rows = []
+    n_customers = max(1, n_projects // 4)
+    for c in range(1, n_customers + 1):
+        rows.append({
+            "id": c, "qbo_id": str(c), "display_name": f"{rnd.choice(SURNAMES).title()}, {rnd.choice(SURNAMES).title()}",
+            "active": 1, "is_project": 0, "customer_name": None, "status": None, "pm_ids": [], "crew_ids": [],
+        })
+    customers = rows[:]
+    for p in range(n_customers + 1, n_customers + n_projects + 1):
+        parent = rnd.choice(customers)
+        rows.append({
+            "id": p,
+            "qbo_id": str(p),
+            "display_name": f"{rnd.randint(100, 9999)} {rnd.choice(STREETS).title()} St "
+                            f"{rnd.choice(WORDS).title()} {rnd.choice(WORDS).title()}",
+            "active": int(rnd.random() > 0.2),
+            "is_project": 1,
+            "customer_name": parent["display_name"],
+            "status": rnd.choice(["not_started", "in_progress", "completed"]),
+            "pm_ids": rnd.sample(sorted(pm_names), rnd.randint(0, 2)),
+            "crew_ids": rnd.sample(sorted(crew_names), rnd.randint(0, 2)),
+        })
+    return rows, pm_names, crew_names
+
+
+def best_ms(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return (best or 0.0) * 1000
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--projects", type=int, default=20000)
+    p.add_argument("--changed", type=int, default=200, help="entries touched by one incremental refresh")
+    p.add_argument("--repeat", type=int, default=20, help="rounds; best round is reported")
+    p.add_argument("--budget-ms", type=float, default=10.0)
+    args = p.parse_args(argv)
+
+    rows, pm_names, crew_names = make_rows(args.projects)
+    build_ms = best_ms(lambda: SearchSnapshot.build(rows, pm_names, crew_names), 3)
+    snap = SearchSnapshot.build(rows, pm_names, crew_names)
+
+    changed = [dict(r, display_name=r["display_name"] + " Phase 2") for r in rows[-args.changed:]]
+    refresh_ms = best_ms(lambda: snap.replace(changed, set(), snap.pm_names, snap.crew_names), 3)
+
+    print(f"entries:                 {len(snap.docs):,} ({len(snap.words):,} words)")
+    print(f"full build:              {build_ms:8.1f} ms")
+    print(f"refresh {args.changed:>5} entries:   {refresh_ms:8.1f} ms")
+
+    worst = 0.0
+    for q in QUERIES:
+        ms = best_ms(lambda: snap.search(q, "all"), args.repeat)
+        worst = max(worst, ms)
+        hits = snap.search(q, "all")["total_matches"]
+        print(f"query {q!r:<24} {ms:8.2f} ms  {hits:>6} matches")
+
+    if worst > args.budget_ms:
+        print(f"over budget ({args.budget_ms:.0f} ms)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
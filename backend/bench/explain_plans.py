@@ -0,0 +1,439 @@
+"""
+EXPLAIN-plan regression check for the hot read queries (projects rollup
+and pages, dashboard KPIs, assignment table and bundle, schedule, project
+transaction drilldown).
+
+Runs against the database in DB_HOST/DB_NAME/... -- point it at a local
+MySQL, never production. Run from backend/:
+
+    python -m bench.explain_plans --seed 20000     # load synthetic projects
+    python -m bench.explain_plans                  # check the plans
+    python -m bench.explain_plans --show           # also print failing plans
+    python -m bench.explain_plans --unseed         # remove the synthetic rows
+
+A plan fails when it table-scans (access_type ALL) or filesorts a table
+estimated at --min-rows rows or more. Materialized derived tables are
+judged by the tables inside them. Exit code is 1 on any failure, so it can
+gate a deploy script the same way bench.bench_parsers --check does.
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import bindparam, text
+
+from app.db import engine
+from app.projects.financials import project_financials_init_table
+from app.projects.indexes import project_indexes_init
+from app.projects.rollup import (
+    build_aggregate_query,
+    build_kpi_month_names_query,
+    build_kpi_query,
+    build_page_query,
+    build_rollup_sql,
+)
+from app.projects.routes import ASSIGNMENT_TABLE_SQL, SCHEDULE_ASSIGNMENTS_SQL, SCHEDULE_CREWS_SQL
+from app.projects.service import (
+    BUNDLE_ACTIVE_CREWS_SQL,
+    BUNDLE_ACTIVE_PMS_SQL,
+    BUNDLE_PROJECT_SQL,
+    PROJECT_TRANSACTION_LINES_SQL,
+    build_transactions_page_query,
+    build_transactions_totals_query,
+)
+from app.qbo.service import qbo_init_tables
+
+SEED_PREFIX = "seed-"
+SEED_CHUNK = 1000
+
+ANALYZE_TABLES = (
+    "qbo_customers", "projects", "project_project_managers", "project_work_crews",
+    "project_managers", "work_crews", "project_files", "project_events", "project_financials",
+    "qbo_project_attributions",
+)
+
+
+# -----------------------------
+# Queries under test
+# -----------------------------
+
+def _sample_ids(conn) -> dict:
+    row = conn.execute(text("""
+        SELECT
+          (SELECT MIN(project_manager_id) FROM project_project_managers WHERE unassigned_at IS NULL) AS pm_id,
+          (SELECT MIN(work_crew_id) FROM project_work_crews WHERE unassigned_at IS NULL) AS crew_id,
+          (SELECT MAX(qbo_customer_id) FROM projects) AS qbo_customer_id,
+          (SELECT MAX(id) FROM projects) AS project_id
+    """)).mappings().first()
+    return {k: int(v or 0) for k, v in row.items()}
+
+
+def hot_queries(conn) -> list[tuple[str, object, dict, dict]]:
+    """(name, statement, params, allowed) where allowed maps check -> reason."""
+    ids = _sample_ids(conn)
+    week_start = date.today() - timedelta(days=date.today().weekday())
+
+    queries = [
+        ("projects.rollup", build_rollup_sql(), {}, {}),
+        ("projects.page.status", *build_page_query({"status": ["in_progress"]}, limit=101), {}),
+        ("projects.page.pm", *build_page_query({"pm_id": ids["pm_id"]}, limit=101), {}),
+        ("projects.page.crew_dates", *build_page_query(
+            {"crew_id": ids["crew_id"], "end_from": date.today() - timedelta(days=365)}, limit=101,
+        ), {}),
+        ("projects.aggregate", *build_aggregate_query({"status": ["in_progress"]}), {}),
+        ("dashboard.kpi_totals", *build_kpi_query({"status": ["completed"]}), {}),
+        ("dashboard.kpi_month", *build_kpi_query({"status": ["completed"]}, "month"), {}),
+        ("dashboard.kpi_pm", *build_kpi_query({}, "pm"), {}),
+        ("dashboard.kpi_crew", *build_kpi_query({}, "crew"), {}),
+        ("dashboard.kpi_month_names", *build_kpi_month_names_query({"status": ["completed"]}), {
+            "filesort": "ROW_NUMBER() orders each month's projects by name; no index spans the join",
+        }),
+        ("assignment.table", ASSIGNMENT_TABLE_SQL, {}, {}),
+        ("assignment.bundle.project", BUNDLE_PROJECT_SQL, {"cid": ids["qbo_customer_id"]}, {}),
+        ("assignment.bundle.pms", BUNDLE_ACTIVE_PMS_SQL, {"pid": ids["project_id"]}, {}),
+        ("assignment.bundle.crews", BUNDLE_ACTIVE_CREWS_SQL, {"pid": ids["project_id"]}, {}),
+        ("schedule.crews", SCHEDULE_CREWS_SQL, {}, {}),
+        ("schedule.assignments", SCHEDULE_ASSIGNMENTS_SQL, {
+            "week_start": week_start.isoformat(),
+            "week_end": (week_start + timedelta(days=6)).isoformat(),
+        }, {}),
+    ]
+
+    # Transaction drilldown, for the project with the most attributed documents
+    busiest = conn.execute(text("""
+        SELECT project_qbo_id, MAX(transaction_id) AS transaction_id
+        FROM qbo_project_attributions
+        GROUP BY project_qbo_id
+        ORDER BY COUNT(*) DESC
+        LIMIT 1
+    """)).first()
+    if busiest:
+        pqid, txn_id = busiest
+        queries += [
+            ("transactions.totals", *build_transactions_totals_query(pqid), {}),
+            ("transactions.page", *build_transactions_page_query(pqid, limit=101), {}),
+            ("transactions.page.type_after", *build_transactions_page_query(
+                pqid, ["Bill"], after=(date.today(), txn_id), limit=101,
+            ), {}),
+            ("transactions.lines", PROJECT_TRANSACTION_LINES_SQL, {
+                "pqid": pqid, "txn_ids": [txn_id], "header_ids": [txn_id],
+            }, {}),
+        ]
+    return queries
+
+
+# -----------------------------
+# Plan inspection
+# -----------------------------
+
+def _tables_in(node, out: list) -> list:
+    # Table nodes of this query block, not of subqueries or derived tables
+    if isinstance(node, dict):
+        if "table_name" in node:
+            out.append(node)
+            return out
+        for k, v in node.items():
+            if k != "query_block":
+                _tables_in(v, out)
+    elif isinstance(node, list):
+        for v in node:
+            _tables_in(v, out)
+    return out
+
+
+def _rows(table: dict) -> int:
+    return int(table.get("rows_examined_per_scan") or 0)
+
+
+def inspect_plan(plan: dict, min_rows: int) -> list[tuple[str, str]]:
+    """(kind, detail) for each problem; kind is "scan" or "filesort"."""
+    problems: list[tuple[str, str]] = []
+
+    def walk(node, block_rows: int):
+        if isinstance(node, list):
+            for v in node:
+                walk(v, block_rows)
+            return
+        if not isinstance(node, dict):
+            return
+
+        if "query_block" in node:
+            block = node["query_block"]
+            rows = max((_rows(t) for t in _tables_in(block, [])), default=0)
+            walk(block, rows)
+            return
+
+        if "table_name" in node and "materialized_from_subquery" not in node:
+            if node.get("access_type") == "ALL" and _rows(node) >= min_rows:
+                problems.append(("scan", f"full scan of {node['table_name']} (~{_rows(node)} rows)"))
+
+        if node.get("using_filesort"):
+            # Sorting grouped output sorts groups, not the table underneath
+            if "grouping_operation" not in node:
+                below = max((_rows(t) for t in _tables_in(node, [])), default=block_rows)
+                if below >= min_rows:
+                    problems.append(("filesort", f"filesort over ~{below} rows"))
+
+        for key, v in node.items():
+            if key != "table_name":
+                walk(v, block_rows)
+
+    walk(plan, 0)
+    return problems
+
+
+def explain(conn, stmt, params: dict) -> dict:
+    expanding = [bindparam(k, expanding=True) for k, v in params.items() if isinstance(v, (list, tuple))]
+    row = conn.execute(text("EXPLAIN FORMAT=JSON " + stmt.text).bindparams(*expanding), params).first()
+    return json.loads(row[0])
+
+
+# -----------------------------
+# Synthetic data
+# -----------------------------
+
+def seed(n_projects: int) -> dict:
+    rnd = random.Random(42)
+    now = datetime(2026, 1, 1)
+
+    with engine.begin() as conn:
+        user_id = conn.execute(text("SELECT MIN(id) FROM users")).scalar()
+        if user_id is None:
+            raise RuntimeError("seeding needs at least one row in users")
+
+        conn.execute(text("""
+            INSERT INTO project_managers (first_name, last_name, email, phone, color, is_active)
+            VALUES (:first_name, :last_name, :email, NULL, NULL, 1)
+        """), [
+            {"first_name": "Seed", "last_name": f"PM {i}", "email": f"{SEED_PREFIX}pm{i}@example.invalid"}
+            for i in range(20)
+        ])
+        for parent in range(4):
+            conn.execute(text("""
+                INSERT INTO work_crews (name, code, parent_id, color, is_active, sort_order)
+                VALUES (:name, :code, NULL, NULL, 1, :sort_order)
+            """), {"name": f"Seed Crew {parent}", "code": f"SEED{parent}", "sort_order": parent})
+            parent_id = conn.execute(text("SELECT LAST_INSERT_ID()")).scalar()
+            conn.execute(text("""
+                INSERT INTO work_crews (name, code, parent_id, color, is_active, sort_order)
+                VALUES (:name, :code, :parent_id, NULL, 1, :sort_order)
+            """), [
+                {"name": f"Seed Crew {parent}.{i}", "code": f"SEED{parent}_{i}", "parent_id": parent_id, "sort_order": i}
+                for i in range(5)
+            ])
+
+        pm_ids = [r[0] for r in conn.execute(text(
+            "SELECT id FROM project_managers WHERE email LIKE :p"), {"p": f"{SEED_PREFIX}pm%"})]
+        crew_ids = [r[0] for r in conn.execute(text(
+            "SELECT id FROM work_crews WHERE code LIKE 'SEED%' AND parent_id IS NOT NULL"))]
+
+    # Customers: one parent per three projects, as in a real QBO file
+    customers = []
+    for i in range(n_projects // 3 + 1):
+        customers.append(_customer(f"{SEED_PREFIX}c{i}", f"Seed Customer {i}", 0, None, rnd, now))
+    for i in range(n_projects):
+        customers.append(_customer(f"{SEED_PREFIX}p{i}", f"Seed Project {i}", 1, f"{SEED_PREFIX}c{i // 3}", rnd, now))
+    _insert_chunks("""
+        INSERT INTO qbo_customers (
+          qbo_id, display_name, job, active, is_project, parent_qbo_id, balance_with_jobs,
+          meta_create_time, meta_last_updated_time, raw_json
+        ) VALUES (
+          :qbo_id, :display_name, :job, 1, :is_project, :parent_qbo_id, :balance,
+          :created, :updated, '{}'
+        )
+    """, customers)
+
+    with engine.connect() as conn:
+        project_customers = conn.execute(text("""
+            SELECT id, qbo_id, meta_create_time FROM qbo_customers
+            WHERE qbo_id LIKE :p AND is_project = 1
+        """), {"p": f"{SEED_PREFIX}p%"}).all()
+
+    # ~80% of projects have been assigned at least once
+    projects = []
+    for cid, _, created in project_customers:
+        if rnd.random() < 0.8:
+            start = created.date() + timedelta(days=rnd.randint(0, 60))
+            projects.append({
+                "cid": cid,
+                "sd": start,
+                "ed": start + timedelta(days=rnd.randint(1, 45)),
+                "st": rnd.choice(("not_started", "in_progress", "completed", "completed")),
+            })
+    _insert_chunks("""
+        INSERT INTO projects (qbo_customer_id, start_date, end_date, status)
+        VALUES (:cid, :sd, :ed, :st)
+    """, projects)
+
+    with engine.connect() as conn:
+        project_rows = conn.execute(text("""
+            SELECT ip.id, ip.qbo_customer_id
+            FROM projects ip
+            JOIN qbo_customers p ON p.id = ip.qbo_customer_id
+            WHERE p.qbo_id LIKE :p
+        """), {"p": f"{SEED_PREFIX}p%"}).all()
+
+    ppm, pwc, files, events = [], [], [], []
+    for pid, cid in project_rows:
+        for j, pm in enumerate(rnd.sample(pm_ids, rnd.randint(1, 2))):
+            ppm.append({"pid": pid, "x": pm, "prim": 1 if j == 0 else 0, "uid": user_id, "gone": None})
+        # some reassignment history
+        if rnd.random() < 0.3:
+            ppm.append({"pid": pid, "x": rnd.choice(pm_ids), "prim": 0, "uid": user_id, "gone": now})
+        for j, crew in enumerate(rnd.sample(crew_ids, rnd.randint(1, 2))):
+            pwc.append({"pid": pid, "x": crew, "prim": 1 if j == 0 else 0, "uid": user_id, "gone": None})
+        for k in range(rnd.randint(0, 3)):
+            files.append({
+                "pid": pid, "cid": cid, "key": f"{SEED_PREFIX}{pid}/{k}.pdf",
+                "name": f"{k}.pdf", "size": rnd.randint(1000, 900000), "uid": user_id,
+            })
+        events.append({"pid": pid, "uid": user_id})
+
+    _insert_chunks("""
+        INSERT INTO project_project_managers (project_id, project_manager_id, is_primary, assigned_by_user_id, unassigned_at)
+        VALUES (:pid, :x, :prim, :uid, :gone)
+    """, ppm)
+    _insert_chunks("""
+        INSERT INTO project_work_crews (project_id, work_crew_id, is_primary, assigned_by_user_id, unassigned_at)
+        VALUES (:pid, :x, :prim, :uid, :gone)
+    """, pwc)
+    _insert_chunks("""
+        INSERT INTO project_files (
+          project_id, qbo_customer_id, s3_bucket, s3_key, original_filename, content_type, size_bytes, uploaded_by_user_id
+        ) VALUES (:pid, :cid, 'seed', :key, :name, 'application/pdf', :size, :uid)
+    """, files)
+    _insert_chunks("""
+        INSERT INTO project_events (project_id, event_type, actor_user_id, old_value, new_value)
+        VALUES (:pid, 'status_changed', :uid, NULL, NULL)
+    """, events)
+
+    financials = []
+    for _, qbo_id, _ in project_customers:
+        invoice = round(rnd.uniform(0, 250000), 2)
+        financials.append({
+            "pid": qbo_id,
+            "est": round(invoice * rnd.uniform(0.9, 1.2), 2),
+            "inv": invoice,
+            "bal": round(invoice * rnd.choice((0, 0, 0.5, 1)), 2),
+            "bill": round(invoice * rnd.uniform(0.2, 0.6), 2),
+            "exp": round(invoice * rnd.uniform(0, 0.2), 2),
+            "ct": rnd.randint(1, 40),
+        })
+    _insert_chunks("""
+        INSERT INTO project_financials (
+          project_qbo_id, estimate_amt, estimate_ct, invoice_amt, invoice_bal, invoice_ct,
+          bill_amt, bill_ct, expense_amt, expense_ct, total_transaction_ct, refreshed_at
+        ) VALUES (
+          :pid, :est, 1, :inv, :bal, 1, :bill, 1, :exp, 1, :ct, UTC_TIMESTAMP()
+        )
+        ON DUPLICATE KEY UPDATE refreshed_at = VALUES(refreshed_at)
+    """, financials)
+
+    return {
+        "customers": len(customers),
+        "projects": len(projects),
+        "project_managers": len(ppm),
+        "work_crews": len(pwc),
+        "files": len(files),
+    }
+
+
+def _customer(qbo_id, name, is_project, parent, rnd, now) -> dict:
+    created = now - timedelta(days=rnd.randint(0, 3 * 365), seconds=rnd.randint(0, 86400))
+    return {
+        "qbo_id": qbo_id,
+        "display_name": name,
+        "job": is_project,
+        "is_project": is_project,
+        "parent_qbo_id": parent,
+        "balance": round(rnd.uniform(0, 50000), 2),
+        "created": created,
+        "updated": created + timedelta(days=rnd.randint(0, 200)),
+    }
+
+
+def _insert_chunks(sql: str, rows: list[dict]) -> None:
+    stmt = text(sql)
+    for i in range(0, len(rows), SEED_CHUNK):
+        with engine.begin() as conn:
+            conn.execute(stmt, rows[i:i + SEED_CHUNK])
+
+
+def unseed() -> None:
+    like = {"p": f"{SEED_PREFIX}%"}
+    with engine.begin() as conn:
+        project_ids = """
+            SELECT ip.id FROM projects ip
+            JOIN qbo_customers p ON p.id = ip.qbo_customer_id
+            WHERE p.qbo_id LIKE :p
+        """
+        for table in ("project_files", "project_events", "project_project_managers", "project_work_crews"):
+            conn.execute(text(f"""
+                DELETE t FROM {table} t JOIN ({project_ids}) x ON x.id = t.project_id
+            """), like)
+        conn.execute(text(f"DELETE ip FROM projects ip JOIN ({project_ids}) x ON x.id = ip.id"), like)
+        conn.execute(text("DELETE FROM project_financials WHERE project_qbo_id LIKE :p"), like)
+        conn.execute(text("DELETE FROM qbo_customers WHERE qbo_id LIKE :p"), like)
+        conn.execute(text("DELETE FROM project_managers WHERE email LIKE :p"), like)
+        conn.execute(text("DELETE FROM work_crews WHERE code LIKE 'SEED%' AND parent_id IS NOT NULL"))
+        conn.execute(text("DELETE FROM work_crews WHERE code LIKE 'SEED%'"))
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--seed", type=int, metavar="N", help="insert N synthetic projects first")
+    p.add_argument("--unseed", action="store_true", help="delete the synthetic rows and exit")
+    p.add_argument("--min-rows", type=int, default=1000, help="tables smaller than this may be scanned/sorted")
+    p.add_argument("--query", action="append", help="limit to queries whose name starts with this")
+    p.add_argument("--show", action="store_true", help="print the JSON plan of failing queries")
+    args = p.parse_args(argv)
+
+    qbo_init_tables()
+    project_financials_init_table()
+    project_indexes_init()
+
+    if args.unseed:
+        unseed()
+        print("synthetic rows removed")
+        return 0
+    if args.seed:
+        print(f"seeded: {seed(args.seed)}")
+
+    with engine.connect() as conn:
+        for table in ANALYZE_TABLES:
+            conn.execute(text(f"ANALYZE TABLE {table}")).all()
+
+        queries = hot_queries(conn)
+        if args.query:
+            queries = [q for q in queries if any(q[0].startswith(prefix) for prefix in args.query)]
+
+        failed = []
+        print(f"{'query':<30}{'result':<8}details")
+        for name, stmt, params, allowed in queries:
+            plan = explain(conn, stmt, params)
+            found = inspect_plan(plan, args.min_rows)
+            problems = [detail for kind, detail in found if kind not in allowed]
+            ignored = [f"{detail} (allowed: {allowed[kind]})" for kind, detail in found if kind in allowed]
+
+            status = "FAIL" if problems else "ok"
+            detail = "; ".join(problems or ignored)
+            print(f"{name:<30}{status:<8}{detail}")
+            if problems:
+                failed.append(name)
+                if args.show:
+                    print(json.dumps(plan, indent=2))
+
+    if failed:
+        print(f"{len(failed)} plan(s) scan or sort large tables: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
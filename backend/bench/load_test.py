@@ -0,0 +1,131 @@
+"""
+Concurrent load test against a running API.
+
+Run from backend/ (server started separately, e.g. uvicorn app.main:app):
+
+    API_TOKEN=... python -m bench.load_test --url http://localhost:8000
+    API_TOKEN=... python -m bench.load_test --path "/api/dashboard" --concurrency 200
+    API_TOKEN=... python -m bench.load_test --bust     # defeat the response cache
+
+Fires --requests GETs at each --path from --concurrency workers while a
+side task polls /api/health every 100ms, then prints throughput, latency
+percentiles and status counts per path plus the health-check latencies.
+With the defaults it loads the async /api/projects and
+/api/dashboard/summary next to the sync /api/dashboard, so the two
+paths can be compared on one server; health latency shows whether the
+threadpool is starving the event loop.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+DEFAULT_PATHS = (
+    "/api/projects",
+    "/api/dashboard/summary?status=completed&group_by=month",
+    "/api/dashboard",
+)
+
+
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+async def _load(client: httpx.AsyncClient, path: str, total: int, concurrency: int, bust: bool) -> dict:
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            url = path
+            if bust:
+                url += ("&" if "?" in url else "?") + f"_bust={time.time_ns()}-{i}"
+            started = time.perf_counter()
+            try:
+                r = await client.get(url)
+                statuses[r.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "path": path,
+        "seconds": elapsed,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50": _pct(latencies, 0.50),
+        "p95": _pct(latencies, 0.95),
+        "p99": _pct(latencies, 0.99),
+        "statuses": dict(statuses),
+    }
+
+
+async def _health_probe(client: httpx.AsyncClient, stop: asyncio.Event, out: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get("/api/health")
+        except httpx.HTTPError:
+            pass
+        out.append(time.perf_counter() - started)
+        await asyncio.sleep(0.1)
+
+
+async def run(args) -> int:
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=args.concurrency + 5, max_keepalive_connections=args.concurrency + 5)
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=args.timeout) as client:
+        health: list[float] = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_health_probe(client, stop, health))
+
+        results = []
+        for path in args.path or DEFAULT_PATHS:
+            results.append(await _load(client, path, args.requests, args.concurrency, args.bust))
+
+        stop.set()
+        await probe
+
+    print(f"{'path':<60}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for r in results:
+        print(
+            f"{r['path'][:59]:<60}{r['rps']:>9.1f}{r['p50'] * 1000:>9.1f}"
+            f"{r['p95'] * 1000:>9.1f}{r['p99'] * 1000:>9.1f}  {r['statuses']}"
+        )
+    if health:
+        print(
+            f"/api/health during load: n={len(health)} "
+            f"median {statistics.median(health) * 1000:.1f} ms, p95 {_pct(health, 0.95) * 1000:.1f} ms, "
+            f"max {max(health) * 1000:.1f} ms"
+        )
+
+    failed = any(k != 200 for r in results for k in r["statuses"])
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--url", default=os.getenv("API_URL", "http://localhost:8000"))
+    p.add_argument("--token", default=os.getenv("API_TOKEN"), help="bearer token (default $API_TOKEN)")
+    p.add_argument("--path", action="append", help="path to load; repeatable")
+    p.add_argument("--requests", type=int, default=1000, help="requests per path")
+    p.add_argument("--concurrency", type=int, default=100)
+    p.add_argument("--timeout", type=float, default=60.0)
+    p.add_argument("--bust", action="store_true", help="unique query param per request to miss the response cache")
+    args = p.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -31,4 +31,53 @@ export async function api(path, opts = {}) {
   const body = ct.includes("application/json") ? await res.json() : await res.text();
   if (!res.ok) throw new Error(typeof body === "string" ? body : JSON.stringify(body));
   return body;
-}
\ No newline at end of file
+}
+
+/** ?format=columns tables -> row objects; cents columns back to dollars. */
+export function fromColumns(table) {
+  const { columns = [], cents = [], rows = [] } = table || {};
+  const money = new Set(cents);
+  return rows.map((values) => {
+    const row = {};
+    columns.forEach((c, i) => {
+      const v = values[i];
+      row[c] = money.has(c) && v != null ? v / 100 : v;
+    });
+    return row;
+  });
+}
+
+/** NDJSON list endpoints: calls onRow(row) as each line arrives and
+ * resolves with the trailing {_meta} object (summary, next_cursor, ...).
+ */
+export async function apiStream(path, onRow, opts = {}) {
+  const token = getToken();
+  const headers = Object.assign({ Accept: "application/x-ndjson" }, opts.headers || {});
+  if (token) headers["Authorization"] = `Bearer ${token}`;
+
+  const res = await fetch(`${API_BASE}${path}`, { ...opts, headers });
+  if (!res.ok) throw new Error(await res.text());
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+  let meta = null;
+  const handle = (line) => {
+    if (!line) return;
+    const obj = JSON.parse(line);
+    if (obj._meta) meta = obj._meta;
+    else onRow(obj);
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    const lines = buf.split("\n");
+    buf = lines.pop();
+    lines.forEach(handle);
+  }
+  handle(buf + decoder.decode());
+  if (!meta) throw new Error("Stream ended early");
+  return meta;
+}
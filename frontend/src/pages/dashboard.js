@@ -4,43 +4,23 @@ import { fmtMoney, fmtPct } from "../utils/format.js";
 import { escapeHtml } from "../utils/html.js";
 
 export async function dashboardPage(routeFn) {
-  const data = await api("/dashboard");
-  const rows = data.projects || [];
-
-  function normalize(v) {
-    return (v ?? "").toString().toLowerCase();
-  }
-
-  function isCompleted(r) {
-    return normalize(r.project_status) === "completed";
-  }
+  // Completed-only KPIs, aggregated server-side
+  const data = await api("/dashboard/summary?status=completed&group_by=month");
+  const totals = data.totals || {};
+  const months = (data.groups && data.groups.month) || [];
 
   function n(v) {
     const x = Number(v);
     return Number.isFinite(x) ? x : 0;
   }
 
-  function parseYmd(v) {
-    // expects "YYYY-MM-DD" (end_date), tolerates ISO strings
-    if (!v) return null;
-    const s = String(v).slice(0, 10);
-    const m = /^(\d{4})-(\d{2})-(\d{2})$/.exec(s);
-    if (!m) return null;
-    const yyyy = Number(m[1]);
-    const mm = Number(m[2]);
-    const dd = Number(m[3]);
-    const d = new Date(Date.UTC(yyyy, mm - 1, dd));
-    return Number.isFinite(d.getTime()) ? d : null;
-  }
-
-  // Completed-only totals
-  const completed = rows.filter(isCompleted);
-  const totalIncome = completed.reduce((acc, r) => acc + n(r.total_income), 0);
-  const totalCost = completed.reduce((acc, r) => acc + n(r.total_cost), 0);
-  const totalProfit = completed.reduce((acc, r) => acc + n(r.total_profit), 0);
+  const completedCount = n(totals.project_ct);
+  const totalIncome = n(totals.income);
+  const totalCost = n(totals.cost);
+  const totalProfit = n(totals.profit);
 
   // Weighted margin across completed projects
-  const margin = totalIncome === 0 ? null : totalProfit / totalIncome;
+  const margin = totals.margin ?? null;
 
   const bodyHtml = `
     <div class="grid grid-cols-1 gap-4">
@@ -53,7 +33,7 @@ export async function dashboardPage(routeFn) {
             <div class="text-sm text-black/60">Completed projects totals</div>
           </div>
           <div class="text-xs text-black/50 whitespace-nowrap">
-            ${completed.length} completed
+            ${completedCount} completed
           </div>
         </div>
 
@@ -150,61 +130,28 @@ export async function dashboardPage(routeFn) {
   }
 
   function buildMonthlySeries(list) {
-    const byMonth = new Map();
-
-    for (const r of list) {
-      const d = parseYmd(r.end_date);
-      if (!d) continue;
-
-      const y = d.getUTCFullYear();
-      const m = d.getUTCMonth() + 1;
-      const key = `${y}-${String(m).padStart(2, "0")}`;
-
-      const income = n(r.total_income);
-      const cost = n(r.total_cost);
-      const profit = income - cost;
-
-      if (!byMonth.has(key)) {
-        byMonth.set(key, {
-          key,
-          year: y,
-          month: m,
-          income: 0,
-          cost: 0,
-          profit: 0,
-          count: 0,
-          projects: [],
-        });
-      }
-
-      const agg = byMonth.get(key);
-      agg.income += income;
-      agg.cost += cost;
-      agg.profit += profit;
-      agg.count += 1;
-
-      agg.projects.push({
-        name: (r.project_name || r.project_qbo_id || "—").toString(),
-        qbo: r.project_qbo_id ?? null,
-      });
-    }
-
-    const arr = Array.from(byMonth.values()).sort((a, b) => {
-      if (a.year !== b.year) return a.year - b.year;
-      return a.month - b.month;
+    // groups come back sorted by "YYYY-MM"
+    return list.map((g) => {
+      const [y, m] = String(g.key).split("-").map(Number);
+      const income = n(g.income);
+      const cost = n(g.cost);
+      return {
+        key: g.key,
+        year: y,
+        month: m,
+        income,
+        cost,
+        profit: income - cost,
+        count: n(g.project_ct),
+        projects: (g.projects || []).map((name) => ({ name: (name || "—").toString() })),
+        margin: g.margin ?? null,
+        label: g.key, // "YYYY-MM"
+        dt: new Date(Date.UTC(y, m - 1, 1)),
+      };
     });
-
-    for (const x of arr) {
-      x.margin = x.income === 0 ? null : x.profit / x.income;
-      x.label = x.key; // "YYYY-MM"
-      x.dt = new Date(Date.UTC(x.year, x.month - 1, 1));
-      x.projects.sort((a, b) => a.name.localeCompare(b.name));
-    }
-
-    return arr;
   }
 
-  const series = buildMonthlySeries(completed);
+  const series = buildMonthlySeries(months);
 
   // range label
   const rangeEl = document.getElementById("chartRange");
@@ -225,11 +172,12 @@ export async function dashboardPage(routeFn) {
   document.body.appendChild(tooltip);
 
   function projectsHtml(d, limit = 8) {
+    // server sends the first few names per month; count has the full total
     const items = d.projects || [];
     if (!items.length) return `<div class="text-black/50">No projects</div>`;
 
     const shown = items.slice(0, limit);
-    const rest = items.length - shown.length;
+    const rest = Math.max(d.count, items.length) - shown.length;
 
     return `
       <div class="mt-2 text-black/60">Projects</div>
@@ -1,11 +1,17 @@
-import { api } from "../api.js";
+import { api, fromColumns } from "../api.js";
 import { setShell } from "../shell.js";
 import { fmtDate, fmtMoney, fmtPct } from "../utils/format.js";
 import { escapeHtml } from "../utils/html.js";
 
 export async function projectsPage(routeFn) {
-  const data = await api("/projects");
-  const rows = data.projects || [];
+  // The API pages at 1000 rows; follow next_cursor so the table has them all
+  let data = await api("/projects?format=columns");
+  const summary = data.summary;
+  const rows = fromColumns(data.projects);
+  while (data.next_cursor) {
+    data = await api(`/projects?format=columns&cursor=${encodeURIComponent(data.next_cursor)}`);
+    rows.push(...fromColumns(data.projects));
+  }
 
   const state = {
     q: "",
@@ -337,7 +343,7 @@ export async function projectsPage(routeFn) {
   }
 
   function renderKpis(list) {
-    const total = rows.length;
+    const total = summary?.total_projects ?? rows.length;
 
     const counts = {
       needs_assignment: 0,